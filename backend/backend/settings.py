@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ibovespa.middleware.CompressaoMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -150,3 +151,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR,'media')
 AUTH_USER_MODEL = 'user.Usuario'
 
 CORS_ORIGIN_ALLOW_ALL = True
+
+# Processos do pool de cálculo (backtest com muitas variantes e Monte Carlo) de cada processo
+# do servidor web: com N workers no servidor são N x este valor interpretadores.
+IBOVESPA_PROCESSOS_CALCULO = int(os.environ.get('IBOVESPA_PROCESSOS_CALCULO', '2'))
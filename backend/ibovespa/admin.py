@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .cache import registrar_alteracao
 from .models import (
     Ativo,
     Setor,
@@ -8,30 +9,52 @@ from .models import (
     FIIHistoricoPreco,
     FIIRendimento,
     FIIDividendYield,
+    FIIIndicadorMensal,
+    RodadaIngestao,
+    RegistroIngestao,
+    ConcessaoIngestao,
+    ExecucaoIngestao,
 )
 
+
+class VersionaDadosAdmin(admin.ModelAdmin):
+    """Edições e exclusões pelo admin também invalidam o cache versionado (ver ibovespa.cache)."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        registrar_alteracao()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        registrar_alteracao()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        registrar_alteracao()
+
+
 @admin.register(Setor)
-class SetorAdmin(admin.ModelAdmin):
+class SetorAdmin(VersionaDadosAdmin):
     list_display = ('nome',)
     search_fields = ('nome',)
 
 @admin.register(Segmento)
-class SegmentoAdmin(admin.ModelAdmin):
+class SegmentoAdmin(VersionaDadosAdmin):
     list_display = ('nome',)
     search_fields = ('nome',)
 
 @admin.register(Ativo)
-class AtivoAdmin(admin.ModelAdmin):
+class AtivoAdmin(VersionaDadosAdmin):
     list_display = ('codigo', 'nome', 'preco_atual', 'variacao', 'tipo', 'setor', 'segmento')
     search_fields = ('codigo', 'nome')
     list_filter = ('tipo', 'setor', 'segmento')
     ordering = ('codigo',)
 
-admin.site.register(HistoricoAtivo)
+admin.site.register(HistoricoAtivo, VersionaDadosAdmin)
 
 
 @admin.register(FundoImobiliario)
-class FundoImobiliarioAdmin(admin.ModelAdmin):
+class FundoImobiliarioAdmin(VersionaDadosAdmin):
     list_display = (
         'codigo',
         'nome',
@@ -54,7 +77,7 @@ class FundoImobiliarioAdmin(admin.ModelAdmin):
 
 
 @admin.register(FIIHistoricoPreco)
-class FIIHistoricoPrecoAdmin(admin.ModelAdmin):
+class FIIHistoricoPrecoAdmin(VersionaDadosAdmin):
     list_display = ('fii', 'data', 'preco_fechamento', 'volume')
     search_fields = ('fii__codigo',)
     list_filter = ('fii',)
@@ -63,7 +86,7 @@ class FIIHistoricoPrecoAdmin(admin.ModelAdmin):
 
 
 @admin.register(FIIRendimento)
-class FIIRendimentoAdmin(admin.ModelAdmin):
+class FIIRendimentoAdmin(VersionaDadosAdmin):
     list_display = ('fii', 'data', 'valor_rendimento')
     search_fields = ('fii__codigo',)
     list_filter = ('fii',)
@@ -72,9 +95,51 @@ class FIIRendimentoAdmin(admin.ModelAdmin):
 
 
 @admin.register(FIIDividendYield)
-class FIIDividendYieldAdmin(admin.ModelAdmin):
+class FIIDividendYieldAdmin(VersionaDadosAdmin):
     list_display = ('fii', 'data', 'dy')
     search_fields = ('fii__codigo',)
     list_filter = ('fii',)
     date_hierarchy = 'data'
-    ordering = ('-data',)
\ No newline at end of file
+    ordering = ('-data',)
+
+
+@admin.register(FIIIndicadorMensal)
+class FIIIndicadorMensalAdmin(VersionaDadosAdmin):
+    list_display = ('fii', 'data', 'rendimento', 'rendimento_12m', 'dy_12m', 'yield_on_cost', 'crescimento_rendimento')
+    search_fields = ('fii__codigo',)
+    list_filter = ('fii',)
+    date_hierarchy = 'data'
+    ordering = ('-data',)
+
+
+@admin.register(RodadaIngestao)
+class RodadaIngestaoAdmin(admin.ModelAdmin):
+    list_display = ('comando', 'particao', 'inicio', 'fim')
+    list_filter = ('comando',)
+    date_hierarchy = 'inicio'
+    ordering = ('-inicio',)
+
+
+@admin.register(RegistroIngestao)
+class RegistroIngestaoAdmin(admin.ModelAdmin):
+    list_display = ('comando', 'codigo', 'status', 'rodada', 'data_execucao', 'assinatura', 'mensagem')
+    list_select_related = ('rodada',)
+    search_fields = ('codigo', 'mensagem')
+    list_filter = ('comando', 'status')
+    date_hierarchy = 'data_execucao'
+    ordering = ('-data_execucao',)
+
+
+@admin.register(ConcessaoIngestao)
+class ConcessaoIngestaoAdmin(admin.ModelAdmin):
+    list_display = ('comando', 'rodada', 'codigo', 'dono', 'expira_em', 'finalizado_em')
+    search_fields = ('codigo', 'dono')
+    list_filter = ('comando', 'rodada')
+
+
+@admin.register(ExecucaoIngestao)
+class ExecucaoIngestaoAdmin(admin.ModelAdmin):
+    list_display = ('comando', 'inicio', 'duracao_segundos', 'status', 'codigos', 'contadores')
+    list_filter = ('comando', 'status')
+    date_hierarchy = 'inicio'
+    ordering = ('-inicio',)
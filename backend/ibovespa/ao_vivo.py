@@ -0,0 +1,165 @@
+"""
+Cotações ao vivo: um hub por processo que distribui as mudanças de cotação aos clientes SSE.
+
+As ingestões rodam em outros processos, então o hub descobre os commits consultando, a cada
+INTERVALO_CONSULTA, só as linhas com data_atualizacao a partir da última vista; é uma consulta por
+intervalo para o processo inteiro, não importa quantos clientes estejam conectados. Cada linha é
+montada pelo plano de `renderizacao` do serializer de cotação (mesmo JSON de ativos/cotacoes/ e
+fiis/cotacoes/) e só segue adiante se algo além da data_atualizacao mudou.
+
+Cada assinante guarda as cotações pendentes num dict por código: se o cliente atrasar, as
+atualizações de um mesmo código se fundem e ele recebe só a mais recente.
+
+O EventSource do navegador não envia cabeçalhos, então o stream também aceita ?ticket=: uma
+assinatura curta (VALIDADE_TICKET) do id do usuário, obtida com o token em POST
+cotacoes/stream/ticket/. O token em si nunca vai na URL (acabaria em logs de acesso e proxies).
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+
+from . import renderizacao
+from .models import Ativo, FundoImobiliario
+from .serializer import AtivoCotacaoSerializer, FIICotacaoSerializer
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre as consultas de mudanças e entre os comentários de keep-alive do SSE
+INTERVALO_CONSULTA = 2.0
+INTERVALO_KEEPALIVE = 15.0
+# Códigos aceitos por conexão (somando ações e FIIs)
+MAX_CODIGOS_AO_VIVO = 200
+
+# Segundos para abrir o stream com um ticket; a reconexão depois disso pede um ticket novo
+VALIDADE_TICKET = 60
+SAL_TICKET = 'ibovespa.ao_vivo.ticket'
+
+FONTES = {
+    'ativos': (Ativo, AtivoCotacaoSerializer),
+    'fiis': (FundoImobiliario, FIICotacaoSerializer),
+}
+
+
+def emitir_ticket(usuario) -> str:
+    return signing.dumps(usuario.pk, salt=SAL_TICKET)
+
+
+def usuario_do_ticket(ticket: str) -> Optional[int]:
+    """id do usuário do ticket; None se inválido ou vencido."""
+    try:
+        return signing.loads(ticket, salt=SAL_TICKET, max_age=VALIDADE_TICKET)
+    except signing.BadSignature:  # SignatureExpired é subclasse
+        return None
+
+
+def _sem_data(linha: dict) -> dict:
+    return {campo: valor for campo, valor in linha.items() if campo != 'data_atualizacao'}
+
+
+class Assinante:
+    def __init__(self, codigos: Dict[str, FrozenSet[str]]):
+        # {'ativos': {...}, 'fiis': {...}}
+        self.codigos = codigos
+        self.pendentes: Dict[Tuple[str, str], dict] = {}
+        self.evento = asyncio.Event()
+
+    def entregar(self, tipo: str, linhas: List[dict]) -> None:
+        codigos = self.codigos.get(tipo, ())
+        for linha in linhas:
+            if linha['codigo'] in codigos:
+                self.pendentes[tipo, linha['codigo']] = linha
+        if self.pendentes:
+            self.evento.set()
+
+    def retirar(self) -> Dict[str, List[dict]]:
+        lote: Dict[str, List[dict]] = {tipo: [] for tipo in self.codigos}
+        for (tipo, _), linha in self.pendentes.items():
+            lote[tipo].append(linha)
+        self.pendentes.clear()
+        self.evento.clear()
+        return lote
+
+
+class Hub:
+    def __init__(self, intervalo: float = INTERVALO_CONSULTA):
+        self.intervalo = intervalo
+        self.assinantes: Set[Assinante] = set()
+        # última linha publicada de cada código e maior data_atualizacao vista, por tipo
+        self.ultimas: Dict[str, Dict[str, dict]] = {tipo: {} for tipo in FONTES}
+        self.marcas: Dict[str, Optional[datetime]] = {tipo: None for tipo in FONTES}
+        self.planos = {tipo: renderizacao.compilar(serializer()) for tipo, (_, serializer) in FONTES.items()}
+        self._tarefa: Optional[asyncio.Task] = None
+        self._carga: Optional[asyncio.Future] = None
+
+    async def assinar(self, codigos: Dict[str, FrozenSet[str]]) -> Assinante:
+        """Registra o assinante já com a cotação atual de cada código pedido."""
+        self._garantir_tarefa()
+        await asyncio.shield(self._carga)
+        assinante = Assinante(codigos)
+        for tipo, linhas in self.ultimas.items():
+            assinante.entregar(tipo, list(linhas.values()))
+        self.assinantes.add(assinante)
+        return assinante
+
+    def cancelar(self, assinante: Assinante) -> None:
+        self.assinantes.discard(assinante)
+        if not self.assinantes and self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = self._carga = None
+
+    def _garantir_tarefa(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._tarefa is not None and not self._tarefa.done() and self._tarefa.get_loop() is loop:
+            return
+        # primeiro assinante (ou loop novo): reinicia a consulta periódica neste loop
+        self._carga = loop.create_future()
+        self._tarefa = loop.create_task(self._laco(self._carga))
+
+    async def _laco(self, carga: asyncio.Future) -> None:
+        while True:
+            try:
+                mudancas = await sync_to_async(self.consultar, thread_sensitive=False)()
+            except Exception:
+                logger.exception('Falha ao consultar as cotações ao vivo')
+            else:
+                for assinante in list(self.assinantes):
+                    for tipo, linhas in mudancas.items():
+                        assinante.entregar(tipo, linhas)
+            if not carga.done():
+                carga.set_result(None)
+            await asyncio.sleep(self.intervalo)
+
+    def consultar(self) -> Dict[str, List[dict]]:
+        """Linhas que mudaram desde a última consulta, por tipo (síncrono, roda numa thread)."""
+        try:
+            mudancas = {}
+            for tipo, (modelo, _) in FONTES.items():
+                marca = self.marcas[tipo]
+                queryset = modelo.objects.all()
+                if marca is not None:
+                    # >= e não >: um commit com a mesma data_atualizacao pode chegar depois da consulta
+                    queryset = queryset.filter(data_atualizacao__gte=marca)
+                # cópia trocada no fim: o loop lê `ultimas` enquanto esta thread consulta
+                ultimas = dict(self.ultimas[tipo])
+                mudancas[tipo] = []
+                for linha in self.planos[tipo].linhas(queryset):
+                    anterior = ultimas.get(linha['codigo'])
+                    if anterior is None or _sem_data(anterior) != _sem_data(linha):
+                        mudancas[tipo].append(linha)
+                    ultimas[linha['codigo']] = linha
+                    data = parse_datetime(linha['data_atualizacao'] or '')
+                    if data is not None and (marca is None or data > marca):
+                        marca = data
+                self.ultimas[tipo], self.marcas[tipo] = ultimas, marca
+            return mudancas
+        finally:
+            close_old_connections()
+
+
+HUB = Hub()
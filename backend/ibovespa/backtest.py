@@ -0,0 +1,151 @@
+"""
+Motor vetorizado de backtest de carteiras sobre uma matriz de retornos (data x ativo).
+
+Entre dois rebalanceamentos a carteira é buy-and-hold, então o valor em cada data é
+sum(w_i * G[t, i] / G[s, i]) vezes o valor no início do segmento s, onde G é o
+crescimento acumulado de cada ativo. Os valores de início de segmento saem de um cumprod
+sobre os fatores de fim de segmento, sem laço em Python sobre as datas.
+
+Este módulo não importa Django, para que os workers do ProcessPoolExecutor usados nas
+varreduras de parâmetros possam importá-lo sem configurar o projeto.
+"""
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DIAS_UTEIS_ANO = 252
+
+# Unidade numpy usada para detectar a troca de período de cada regra de rebalanceamento
+REBALANCEAMENTOS = {
+    'nenhum': None,
+    'mensal': ('M', 1),
+    'trimestral': ('M', 3),
+    'semestral': ('M', 6),
+    'anual': ('Y', 1),
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_tamanho_pool = 0
+
+
+def mascara_rebalanceamento(datas: np.ndarray, regra: str) -> np.ndarray:
+    """Marca as datas que iniciam um novo segmento (a primeira data sempre inicia)."""
+    if regra not in REBALANCEAMENTOS:
+        raise ValueError(f"Rebalanceamento inválido: {regra!r}. Use um de {', '.join(REBALANCEAMENTOS)}.")
+    mascara = np.zeros(len(datas), dtype=bool)
+    if len(datas):
+        mascara[0] = True
+    unidade = REBALANCEAMENTOS[regra]
+    if unidade is None or len(datas) < 2:
+        return mascara
+    codigo, passo = unidade
+    periodo = datas.astype(f'datetime64[{codigo}]').astype(np.int64) // passo
+    mascara[1:] = periodo[1:] != periodo[:-1]
+    return mascara
+
+
+def simular(retornos: np.ndarray, pesos: np.ndarray, inicios: np.ndarray, custo_bps: float = 0.0) -> np.ndarray:
+    """Valor da carteira (base 1.0) em cada data.
+
+    `retornos` é T x N (retorno simples do dia, 0 na primeira linha), `pesos` soma 1 e
+    `inicios` marca as datas em que a carteira volta aos pesos-alvo antes do retorno do dia.
+    """
+    T = retornos.shape[0]
+    crescimento = np.empty((T + 1, retornos.shape[1]))
+    crescimento[0] = 1.0
+    np.cumprod(1.0 + retornos, axis=0, out=crescimento[1:])
+
+    starts = np.flatnonzero(inicios)
+    segmento = np.cumsum(inicios) - 1
+    base = crescimento[starts][segmento]  # crescimento acumulado até o início do segmento
+    posicoes = pesos * (crescimento[1:] / base)  # valor de cada ativo por unidade investida no segmento
+    fator = posicoes.sum(axis=1)
+
+    fins = np.append(starts[1:] - 1, T - 1)
+    fatores_fim = fator[fins]
+    if custo_bps and len(starts) > 1:
+        # giro de cada rebalanceamento = distância entre os pesos à deriva e os pesos-alvo
+        deriva = posicoes[fins[:-1]] / fatores_fim[:-1, None]
+        giro = np.abs(deriva - pesos).sum(axis=1)
+        fatores_fim = fatores_fim.copy()
+        fatores_fim[:-1] *= 1.0 - giro * custo_bps / 10_000.0
+    acumulado = np.concatenate(([1.0], np.cumprod(fatores_fim[:-1])))
+    return acumulado[segmento] * fator
+
+
+def metricas(valores: np.ndarray, taxa_livre: float = 0.0) -> Dict[str, Optional[float]]:
+    if len(valores) < 2:
+        return {'retorno_total': None, 'cagr': None, 'volatilidade': None, 'sharpe': None, 'max_drawdown': None}
+    diarios = valores[1:] / valores[:-1] - 1.0
+    anos = len(diarios) / DIAS_UTEIS_ANO
+    cagr = valores[-1] ** (1.0 / anos) - 1.0 if valores[-1] > 0 else -1.0
+    vol = float(diarios.std(ddof=1) * math.sqrt(DIAS_UTEIS_ANO)) if len(diarios) > 1 else 0.0
+    drawdown = valores / np.maximum.accumulate(valores) - 1.0
+
+    def r(x):
+        return None if x is None or not np.isfinite(x) else round(float(x), 6)
+
+    return {
+        'retorno_total': r(valores[-1] - 1.0),
+        'cagr': r(cagr),
+        'volatilidade': r(vol),
+        'sharpe': r((cagr - taxa_livre) / vol) if vol else None,
+        'max_drawdown': r(drawdown.min()),
+    }
+
+
+def _executar_lote(retornos: np.ndarray, datas: np.ndarray, variantes: List[Dict[str, Any]],
+                   incluir_serie: bool) -> List[Dict[str, Any]]:
+    resultados = []
+    mascaras: Dict[str, np.ndarray] = {}
+    for variante in variantes:
+        regra = variante['rebalanceamento']
+        if regra not in mascaras:
+            mascaras[regra] = mascara_rebalanceamento(datas, regra)
+        valores = simular(retornos, variante['pesos'], mascaras[regra], variante.get('custo_bps', 0.0))
+        resultado = {'metricas': metricas(valores, variante.get('taxa_livre', 0.0))}
+        if incluir_serie:
+            resultado['valores'] = np.round(valores, 6).tolist()
+        resultados.append(resultado)
+    return resultados
+
+
+def obter_pool(processos: int) -> ProcessPoolExecutor:
+    """Pool de processos compartilhado com `processos` workers, criado na primeira utilização.
+
+    Cada processo do servidor web tem o seu pool, então quem chama decide o tamanho (nas views,
+    settings.IBOVESPA_PROCESSOS_CALCULO); um pedido maior que o pool atual o recria.
+    """
+    global _pool, _tamanho_pool
+    if _pool is None or processos > _tamanho_pool:
+        if _pool is not None:
+            # as tarefas já enviadas terminam no pool antigo
+            _pool.shutdown(wait=False)
+        # spawn: o servidor web costuma ter threads vivas, onde fork não é seguro
+        _pool = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'))
+        _tamanho_pool = processos
+    return _pool
+
+
+def executar_variantes(retornos: np.ndarray, datas: np.ndarray, variantes: Sequence[Dict[str, Any]],
+                       processos: int = 1, incluir_serie: bool = False) -> List[Dict[str, Any]]:
+    """Executa cada variante (pesos, rebalanceamento, custo_bps) sobre a mesma matriz de retornos.
+
+    Com `processos` > 1 as variantes são divididas em um lote por processo; a matriz é
+    enviada uma vez por lote e não uma vez por variante.
+    """
+    variantes = list(variantes)
+    processos = max(1, min(processos, len(variantes)))
+    if processos == 1:
+        return _executar_lote(retornos, datas, variantes, incluir_serie)
+    tamanho = math.ceil(len(variantes) / processos)
+    lotes = [variantes[i:i + tamanho] for i in range(0, len(variantes), tamanho)]
+    pool = obter_pool(processos)
+    futuros = [pool.submit(_executar_lote, retornos, datas, lote, incluir_serie) for lote in lotes]
+    resultados: List[Dict[str, Any]] = []
+    for futuro in futuros:
+        resultados.extend(futuro.result())
+    return resultados
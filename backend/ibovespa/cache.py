@@ -0,0 +1,62 @@
+"""
+Versão dos dados e chaves de cache para respostas calculadas do app ibovespa.
+
+A versão combina agregados baratos (maior id das séries históricas e maior data_atualizacao dos
+cadastros) com o contador VersaoDados. Os agregados não enxergam atualizações no lugar
+(update_or_create, upserts, bulk_update) nem exclusões, por isso todo comando de ingestão e toda
+edição no admin chamam `registrar_alteracao()`, que sobe o contador no banco e vale para todos os
+processos (o cache local de cada um guarda a versão por até VERSAO_TTL segundos).
+"""
+import hashlib
+from typing import Any, Callable
+
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import (
+    Ativo, HistoricoAtivo, FundoImobiliario, FIIHistoricoPreco, FIIRendimento, FIIDividendYield,
+    FIIIndicadorMensal, VersaoDados,
+)
+
+CHAVE_VERSAO = 'ibovespa:versao_dados'
+# Por quanto tempo a versão calculada é reaproveitada antes de consultar o banco de novo
+VERSAO_TTL = 30
+# Validade das entradas versionadas (a troca de versão já as torna obsoletas)
+CACHE_TTL = 60 * 60 * 24
+
+
+def versao_dados() -> str:
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        partes = [
+            VersaoDados.objects.aggregate(v=Max('numero'))['v'],
+            Ativo.objects.aggregate(v=Max('data_atualizacao'))['v'],
+            FundoImobiliario.objects.aggregate(v=Max('data_atualizacao'))['v'],
+        ]
+        for model in (HistoricoAtivo, FIIHistoricoPreco, FIIRendimento, FIIDividendYield, FIIIndicadorMensal):
+            partes.append(model.objects.aggregate(v=Max('id'))['v'])
+        versao = hashlib.sha1('|'.join(str(p) for p in partes).encode('utf-8')).hexdigest()[:16]
+        cache.set(CHAVE_VERSAO, versao, VERSAO_TTL)
+    return versao
+
+
+def invalidar_versao() -> None:
+    """Força o recálculo da versão na próxima consulta deste processo."""
+    cache.delete(CHAVE_VERSAO)
+
+
+def registrar_alteracao() -> None:
+    """Sobe o contador de versão no banco, invalidando o cache calculado em todos os processos."""
+    if not VersaoDados.objects.filter(pk=1).update(numero=F('numero') + 1, data_atualizacao=timezone.now()):
+        VersaoDados.objects.get_or_create(pk=1, defaults={'numero': 1})
+    invalidar_versao()
+
+
+def chave_versionada(prefixo: str, *partes: Any) -> str:
+    resumo = hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()[:20]
+    return f'ibovespa:{prefixo}:{versao_dados()}:{resumo}'
+
+
+def obter_ou_calcular(prefixo: str, partes: tuple, calcular: Callable[[], Any], timeout: int = CACHE_TTL) -> Any:
+    return cache.get_or_set(chave_versionada(prefixo, *partes), calcular, timeout)
@@ -0,0 +1,117 @@
+"""
+Coleta concorrente e educada de fontes externas (yfinance, Fundamentus).
+
+Um pool limitado de threads faz as requisições e um `LimitadorTaxa` compartilhado espaça todas
+elas em no máximo `taxa` por segundo. Quando a fonte sinaliza limitação (HTTP 429 /
+YFRateLimitError), o intervalo dobra e todas as threads pausam; cada sucesso o reduz aos poucos
+de volta ao normal. Os resultados saem na ordem em que terminam, para serem gravados já.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+# Teto do multiplicador do intervalo e fator de recuperação a cada sucesso
+FATOR_MAXIMO = 32.0
+RECUPERACAO = 0.9
+
+
+def eh_limite_taxa(exc: BaseException) -> bool:
+    """Se a exceção indica que a fonte está limitando as requisições (pelo tipo ou pelo status HTTP)."""
+    if type(exc).__name__ == 'YFRateLimitError':
+        return True
+    resposta = getattr(exc, 'response', None)
+    return getattr(resposta, 'status_code', None) == 429
+
+
+class LimitadorTaxa:
+    def __init__(self, taxa: float):
+        self.intervalo = 1.0 / taxa if taxa > 0 else 0.0
+        self.fator = 1.0
+        self._proxima = 0.0
+        self._trava = threading.Lock()
+
+    def aguardar(self) -> None:
+        """Reserva o próximo horário livre e dorme até ele (fora da trava)."""
+        with self._trava:
+            agora = time.monotonic()
+            horario = max(agora, self._proxima)
+            self._proxima = horario + self.intervalo * self.fator
+        if horario > agora:
+            time.sleep(horario - agora)
+
+    def penalizar(self) -> float:
+        """Limitação detectada: dobra o intervalo e pausa todas as threads por `fator` segundos."""
+        with self._trava:
+            self.fator = min(self.fator * 2, FATOR_MAXIMO)
+            self._proxima = max(self._proxima, time.monotonic() + self.fator)
+            return self.fator
+
+    def aliviar(self) -> None:
+        with self._trava:
+            self.fator = max(1.0, self.fator * RECUPERACAO)
+
+
+class Progresso:
+    def __init__(self, total: int):
+        self.total = total
+        self.feitos = 0
+        self.inicio = time.monotonic()
+
+    def avancar(self) -> str:
+        """Conta mais um item e devolve '[feitos/total] ETA mm:ss'."""
+        self.feitos += 1
+        decorrido = time.monotonic() - self.inicio
+        restante = int(decorrido / self.feitos * (self.total - self.feitos))
+        return f'[{self.feitos}/{self.total}] ETA {restante // 60:02d}:{restante % 60:02d}'
+
+
+def coletar_em_paralelo(
+    funcao: Callable[[Any], Any],
+    itens: Iterable[Any],
+    limitador: LimitadorTaxa,
+    workers: int = 8,
+    tentativas: int = 4,
+    ao_limitar: Optional[Callable[[Any, float], None]] = None,
+) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+    """(item, resultado, erro) de `funcao(item)` para cada item, na ordem de conclusão.
+
+    Erros de limitação são repetidos até `tentativas` vezes, depois de `limitador.penalizar()`;
+    os demais saem como `erro` sem interromper os outros itens. `ao_limitar(item, pausa)` é
+    chamado na thread que consome os resultados, não nas threads do pool.
+    """
+    limitacoes: queue.SimpleQueue = queue.SimpleQueue()
+
+    def avisar_limitacoes():
+        while not limitacoes.empty():
+            item, pausa = limitacoes.get()
+            if ao_limitar is not None:
+                ao_limitar(item, pausa)
+
+    def tarefa(item):
+        for tentativa in range(tentativas):
+            limitador.aguardar()
+            try:
+                resultado = funcao(item)
+            except Exception as exc:
+                if not eh_limite_taxa(exc) or tentativa == tentativas - 1:
+                    raise
+                limitacoes.put((item, limitador.penalizar()))
+                continue
+            limitador.aliviar()
+            return resultado
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        futuros = {executor.submit(tarefa, item): item for item in itens}
+        for futuro in as_completed(futuros):
+            avisar_limitacoes()
+            try:
+                yield futuros[futuro], futuro.result(), None
+            except Exception as exc:
+                yield futuros[futuro], None, exc
+        avisar_limitacoes()
+    finally:
+        # interrupção (Ctrl+C) ou consumidor que parou antes: não espera a fila pendente
+        executor.shutdown(wait=True, cancel_futures=True)
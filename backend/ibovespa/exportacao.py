@@ -0,0 +1,162 @@
+"""
+Exportação em streaming (NDJSON ou CSV) dos cadastros e das séries históricas.
+
+As linhas vêm de `values_list(...).iterator(chunk_size=...)`, são serializadas e agrupadas em
+blocos de ~64 KB; opcionalmente cada bloco passa por um compressor gzip incremental. Nada é
+acumulado além do bloco corrente, então a memória não cresce com o tamanho da exportação; o
+cabeçalho CSV sai antes mesmo da consulta e a primeira linha assim que a primeira leva do banco chega.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from .models import (
+    Ativo, HistoricoAtivo, FundoImobiliario, FIIHistoricoPreco, FIIRendimento, FIIDividendYield,
+    FIIIndicadorMensal,
+)
+
+FORMATOS = ('ndjson', 'csv')
+TIPOS_CONTEUDO = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+# com gzip o corpo é o próprio arquivo .gz (não Content-Encoding, que o cliente descompactaria)
+TIPO_GZIP = 'application/gzip'
+CHUNK_SIZE = 2000
+TAMANHO_BLOCO = 64 * 1024
+
+
+class Tabela(NamedTuple):
+    modelo: type
+    # (nome na saída, caminho no ORM)
+    campos: Tuple[Tuple[str, str], ...]
+    # campo usado no filtro por código e, nas séries, o de data
+    campo_codigo: str
+    campo_data: Optional[str] = None
+
+
+def _campos(*nomes: str) -> Tuple[Tuple[str, str], ...]:
+    # 'setor__nome' sai como 'setor'
+    return tuple((n.split('__')[0], n) for n in nomes)
+
+
+TABELAS: Dict[str, Tabela] = {
+    'ativos': Tabela(
+        Ativo,
+        _campos('codigo', 'nome', 'tipo', 'setor__nome', 'segmento__nome', 'preco_atual', 'variacao',
+                'fechamento_anterior', 'volume', 'menor_preco_52s', 'maior_preco_52s', 'dividendo_valor',
+                'dividendo_percentual', 'risco_mercado_beta', 'preco_alvo_media', 'data_atualizacao'),
+        'codigo',
+    ),
+    'fiis': Tabela(
+        FundoImobiliario,
+        _campos('codigo', 'nome', 'segmento__nome', 'administrador', 'cnpj', 'cotacao_atual',
+                'dividend_yield_percent', 'p_vp', 'valor_patrimonial_cota', 'valor_mercado',
+                'patrimonio_liquido', 'liquidez_media_diaria', 'vacancia_media_percent', 'quantidade_imoveis',
+                'data_atualizacao'),
+        'codigo',
+    ),
+    'historico_ativos': Tabela(
+        HistoricoAtivo, (('codigo', 'ativo__codigo'),) + _campos('data', 'preco_fechamento', 'volume'),
+        'ativo__codigo', 'data',
+    ),
+    'historico_fiis': Tabela(
+        FIIHistoricoPreco, (('codigo', 'fii__codigo'),) + _campos('data', 'preco_fechamento', 'volume'),
+        'fii__codigo', 'data',
+    ),
+    'rendimentos_fiis': Tabela(
+        FIIRendimento, (('codigo', 'fii__codigo'),) + _campos('data', 'valor_rendimento'),
+        'fii__codigo', 'data',
+    ),
+    'dy_fiis': Tabela(
+        FIIDividendYield, (('codigo', 'fii__codigo'),) + _campos('data', 'dy'),
+        'fii__codigo', 'data',
+    ),
+    'indicadores_fiis': Tabela(
+        FIIIndicadorMensal,
+        (('codigo', 'fii__codigo'),) + _campos('data', 'rendimento', 'rendimento_12m', 'preco_fechamento',
+                                              'dy_12m', 'yield_on_cost', 'crescimento_rendimento'),
+        'fii__codigo', 'data',
+    ),
+}
+
+
+def consulta(nome: str, codigos: Optional[List[str]] = None, data_inicio: Optional[date] = None,
+             data_fim: Optional[date] = None) -> QuerySet:
+    """values_list da tabela, ordenado por (código, data) e com os filtros aplicados."""
+    tabela = TABELAS[nome]
+    qs = tabela.modelo.objects.all()
+    if codigos:
+        qs = qs.filter(**{f'{tabela.campo_codigo}__in': codigos})
+    if tabela.campo_data:
+        if data_inicio:
+            qs = qs.filter(**{f'{tabela.campo_data}__gte': data_inicio})
+        if data_fim:
+            qs = qs.filter(**{f'{tabela.campo_data}__lte': data_fim})
+        ordem = [tabela.campo_codigo, tabela.campo_data]
+    else:
+        ordem = [tabela.campo_codigo]
+    return qs.order_by(*ordem).values_list(*(caminho for _, caminho in tabela.campos))
+
+
+def _texto(valor: Any) -> Any:
+    # mesma representação do DRF: decimais como string, datas em ISO 8601
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _linhas_ndjson(nomes: List[str], linhas: Iterable[tuple]) -> Iterator[str]:
+    codificar = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for linha in linhas:
+        yield codificar(dict(zip(nomes, map(_texto, linha)))) + '\n'
+
+
+def _linhas_csv(nomes: List[str], linhas: Iterable[tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(nomes)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for linha in linhas:
+        escritor.writerow(['' if v is None else _texto(v) for v in linha])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def gerar(nome: str, linhas_qs: QuerySet, formato: str, compactar: bool = False) -> Iterator[bytes]:
+    """Blocos de bytes da exportação da tabela `nome` (linhas de `consulta`) no `formato` pedido."""
+    tabela = TABELAS[nome]
+    nomes = [saida for saida, _ in tabela.campos]
+    linhas = linhas_qs.iterator(chunk_size=CHUNK_SIZE)
+    textos = _linhas_ndjson(nomes, linhas) if formato == 'ndjson' else _linhas_csv(nomes, linhas)
+    # wbits=31: formato gzip (cabeçalho + CRC), não zlib cru
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compactar else None
+
+    bloco: List[str] = []
+    tamanho = 0
+    primeiro = True
+    for texto in textos:
+        bloco.append(texto)
+        tamanho += len(texto)
+        # o primeiro bloco (cabeçalho CSV ou primeira linha) sai sozinho, para o cliente receber dados de imediato
+        if primeiro or tamanho >= TAMANHO_BLOCO:
+            dados = ''.join(bloco).encode()
+            yield compressor.compress(dados) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else dados
+            bloco, tamanho, primeiro = [], 0, False
+    dados = ''.join(bloco).encode()
+    if compressor:
+        yield compressor.compress(dados) + compressor.flush()
+    elif dados:
+        yield dados
+
+
+def nome_arquivo(nome: str, formato: str, compactar: bool) -> str:
+    return f'{nome}.{formato}' + ('.gz' if compactar else '')
@@ -0,0 +1,159 @@
+"""
+Séries dos gráficos do Fundamentus (fii_graficos.php) extraídas numa única varredura do HTML.
+
+A página monta os gráficos em JavaScript de três jeitos: `nome.push(valor);` repetido (rendimentos e
+os rótulos deles), blocos `var nome = [[ts_ms, valor], ...];` (dividend yield) e pares
+`[Date.UTC(ano, mes, dia), valor]` (Highcharts). `extrair_series` percorre o texto uma vez com um
+padrão pré-compilado cujas alternativas começam por caracteres raros no HTML ('.', '=' e 'D'), então
+a busca salta direto entre os pontos de interesse. Um "= [" só abre bloco quando há um nome antes
+(não em "==", ">=" etc.); o fim do bloco é o "]" que fecha o colchete de abertura, contado por
+equilíbrio (e não o próximo "];", que num array sem ";" seria o de outro bloco), e o conteúdo é
+lido com findall só nesse trecho. Cada série sai como arrays NumPy tipados.
+
+Sem dependência do Django: também serve ao script baixa_dados_fii.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_NUMERO = r"-?\d+(?:\.\d+)?"
+# Pontos de ancoragem: valor de um .push(), início de bloco "= [" e série de pares Date.UTC fora de
+# bloco. O conjunto [.=D] na frente deixa o re pular por ele antes de tentar as alternativas.
+_ANCORAS = re.compile(
+    r"[.=D](?:"
+    r"(?<=\.)push\(\s*(?P<push>" + _NUMERO + r")\s*\)\s*;"
+    r"|(?<==)(?P<bloco>)\s*\["
+    r"|(?<=D)(?P<date_utc>)ate\.UTC\("
+    r")"
+)
+# colchetes e começos de string, para achar o fim de um bloco por equilíbrio
+_COLCHETE_OU_ASPA = re.compile(r"[\[\]\"']")
+# resto de uma string JavaScript depois da aspa de abertura (com escapes)
+_RESTO_STRING = {aspa: re.compile(r"(?:[^%s\\\n]|\\.)*%s" % (aspa, aspa)) for aspa in "\"'"}
+# fim de um array de pares: o "]" do último par seguido do "]" do array
+_FIM_PARES = re.compile(r"\]\s*\]")
+_PAR_EPOCH = re.compile(r"\[\s*(\d+)\s*,\s*(" + _NUMERO + r")\s*\]")
+_PAR_DATE_UTC = re.compile(
+    r"Date\.UTC\(\s*(\d{4})\s*,\s*(\d{1,2})\s*,\s*(\d{1,2})\s*\)\s*,\s*(-?\d[\d.,]*)"
+)
+
+# Nome da série dos pares Date.UTC que não estão dentro de um bloco "var nome = [...]"
+SERIE_DATE_UTC = "Date.UTC"
+
+
+@dataclass
+class Serie:
+    valores: np.ndarray  # float64
+    datas: Optional[np.ndarray] = None  # datetime64[D]; None nas séries de .push()
+    # os números como vieram da página (com ponto decimal): Decimal exato sem passar por float
+    textos: List[str] = field(default_factory=list)
+
+
+def _nome_antes(texto: str, fim: int) -> str:
+    """Identificador JavaScript que termina em `fim` (ignorando espaços antes dele)."""
+    while fim > 0 and texto[fim - 1].isspace():
+        fim -= 1
+    inicio = fim
+    while inicio > 0 and (texto[inicio - 1].isalnum() or texto[inicio - 1] in "_$"):
+        inicio -= 1
+    return texto[inicio:fim]
+
+
+def _fim_colchetes(texto: str, inicio: int) -> int:
+    """Posição logo depois do "]" que fecha o "[" em `inicio` (len(texto) se não fecha); pula strings."""
+    nivel = 0
+    pos = inicio
+    while True:
+        achado = _COLCHETE_OU_ASPA.search(texto, pos)
+        if achado is None:
+            return len(texto)
+        pos = achado.end()
+        caractere = achado.group()
+        if caractere == "[":
+            nivel += 1
+        elif caractere == "]":
+            nivel -= 1
+            if nivel == 0:
+                return pos
+        else:
+            string = _RESTO_STRING[caractere].match(texto, pos)
+            if string:
+                pos = string.end()
+
+
+def _normalizados(textos: List[str]) -> List[str]:
+    """Números com ponto decimal; aceita vírgula decimal e ponto de milhar (1.234,56)."""
+    if not any("," in t for t in textos):
+        return list(textos)
+    normalizados = []
+    for texto in textos:
+        texto = texto.rstrip(",")
+        if "," in texto:
+            texto = texto.replace(".", "").replace(",", ".")
+        normalizados.append(texto)
+    return normalizados
+
+
+def _serie(textos: List[str], datas: Optional[np.ndarray] = None) -> Serie:
+    textos = _normalizados(textos)
+    return Serie(np.array(textos, dtype="float64"), datas, textos)
+
+
+def _datas_date_utc(anos: List[str], meses: List[str], dias: List[str]) -> np.ndarray:
+    """datetime64[D] de Date.UTC(ano, mês, dia), com o mês começando em 0 como no JavaScript."""
+    mes = (np.array(anos, dtype="int64") - 1970) * 12 + np.array(meses, dtype="int64")
+    return mes.astype("datetime64[M]").astype("datetime64[D]") + (np.array(dias, dtype="int64") - 1)
+
+
+def _serie_de_pares(pares_epoch: list, pares_utc: list) -> Optional[Serie]:
+    if pares_epoch:
+        ts, valores = zip(*pares_epoch)
+        datas = np.array(ts, dtype="int64").astype("datetime64[ms]").astype("datetime64[D]")
+        return _serie(valores, datas)
+    if pares_utc:
+        anos, meses, dias, valores = zip(*pares_utc)
+        return _serie(valores, _datas_date_utc(anos, meses, dias))
+    return None
+
+
+def extrair_series(html: str) -> Dict[str, Serie]:
+    """{nome: Serie} de todas as séries do HTML."""
+    pushes: Dict[str, List[str]] = {}
+    series: Dict[str, Serie] = {}
+    soltos: list = []
+    pos = 0
+    while True:
+        ancora = _ANCORAS.search(html, pos)
+        if ancora is None:
+            break
+        pos = ancora.end()
+        if ancora.group("push") is not None:
+            nome = _nome_antes(html, ancora.start())
+            if nome:
+                pushes.setdefault(nome, []).append(ancora.group("push"))
+        elif ancora.group("bloco") is not None:
+            nome = _nome_antes(html, ancora.start())
+            if not nome:
+                # "= [" de uma comparação (==, >=, ...): segue do próprio ponto, sem pular o trecho
+                continue
+            # bloco inteiro de uma vez: findall só no trecho e a varredura continua depois dele
+            fim_bloco = _fim_colchetes(html, pos - 1)
+            serie = _serie_de_pares(_PAR_EPOCH.findall(html, pos, fim_bloco),
+                                    _PAR_DATE_UTC.findall(html, pos, fim_bloco))
+            if serie is not None:
+                series[nome] = serie
+            pos = fim_bloco
+        else:
+            # pares Date.UTC soltos (ex.: data: [[Date.UTC(...), v], ...]): o array inteiro de uma vez
+            fim = _FIM_PARES.search(html, pos)
+            fim_pares = fim.start() + 1 if fim else len(html)
+            soltos.extend(_PAR_DATE_UTC.findall(html, ancora.start(), fim_pares))
+            pos = max(pos, fim_pares)
+
+    for nome, valores in pushes.items():
+        series[nome] = _serie(valores)
+    if soltos:
+        series[SERIE_DATE_UTC] = _serie_de_pares([], soltos)
+    return series
@@ -0,0 +1,184 @@
+"""
+Cálculo em lote dos indicadores mensais de FIIs (DY 12 meses, yield on cost e crescimento do rendimento).
+
+Todas as séries são carregadas de uma vez e processadas em formato largo (mês x FII) com pandas,
+de modo que o cálculo é uma única passada vetorizada sobre todos os fundos. Só são recalculados
+os FIIs cujas linhas de origem (FIIRendimento / FIIHistoricoPreco) mudaram desde o último cálculo;
+um FII que perdeu todas elas também conta como mudado, e os indicadores dele são apagados.
+"""
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from .models import FIIHistoricoPreco, FIIIndicadorFonte, FIIIndicadorMensal, FIIRendimento
+
+# Limite de ids por cláusula IN (SQLite aceita no máximo ~32k variáveis por consulta)
+LOTE_IDS = 500
+# "Assinatura" de um FII que tinha indicadores e já não tem nenhuma linha de origem
+SEM_FONTES = ''
+
+
+def _lotes(ids: List[int], tamanho: int = LOTE_IDS) -> Iterable[List[int]]:
+    for i in range(0, len(ids), tamanho):
+        yield ids[i:i + tamanho]
+
+
+def assinaturas_fontes() -> Dict[int, str]:
+    """Retorna {fii_id: assinatura} a partir de agregados (contagem, última data, soma) das séries de origem."""
+    partes: Dict[int, List[str]] = {}
+    rend = (
+        FIIRendimento.objects.values('fii_id')
+        .annotate(n=Count('id'), ultima=Max('data'), total=Sum('valor_rendimento'))
+        .order_by()
+    )
+    for row in rend:
+        partes.setdefault(row['fii_id'], ['', ''])[0] = f"{row['n']}|{row['ultima']}|{row['total']}"
+    precos = (
+        FIIHistoricoPreco.objects.values('fii_id')
+        .annotate(n=Count('id'), ultima=Max('data'), total=Sum('preco_fechamento'))
+        .order_by()
+    )
+    for row in precos:
+        partes.setdefault(row['fii_id'], ['', ''])[1] = f"{row['n']}|{row['ultima']}|{row['total']}"
+    return {
+        fii_id: hashlib.sha1('#'.join(p).encode('utf-8')).hexdigest()
+        for fii_id, p in partes.items()
+    }
+
+
+def fiis_desatualizados(forcar: bool = False) -> Dict[int, str]:
+    """Retorna {fii_id: nova_assinatura} dos FIIs cujas séries de origem mudaram (SEM_FONTES se sumiram)."""
+    atuais = assinaturas_fontes()
+    salvas = dict(FIIIndicadorFonte.objects.values_list('fii_id', 'assinatura'))
+    sem_fontes = {fii_id: SEM_FONTES for fii_id in salvas.keys() - atuais.keys()}
+    if forcar:
+        return {**atuais, **sem_fontes}
+    mudaram = {fii_id: ass for fii_id, ass in atuais.items() if salvas.get(fii_id) != ass}
+    return {**mudaram, **sem_fontes}
+
+
+def _carregar_series(fii_ids: List[int]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    rend_rows: List[tuple] = []
+    preco_rows: List[tuple] = []
+    for lote in _lotes(fii_ids):
+        rend_rows.extend(
+            FIIRendimento.objects.filter(fii_id__in=lote).values_list('fii_id', 'data', 'valor_rendimento')
+        )
+        preco_rows.extend(
+            FIIHistoricoPreco.objects.filter(fii_id__in=lote).values_list('fii_id', 'data', 'preco_fechamento')
+        )
+    rend = pd.DataFrame(rend_rows, columns=['fii_id', 'data', 'valor'])
+    precos = pd.DataFrame(preco_rows, columns=['fii_id', 'data', 'valor'])
+    for df in (rend, precos):
+        df['data'] = pd.to_datetime(df['data'])
+        df['valor'] = df['valor'].astype('float64')
+    return rend, precos
+
+
+def calcular_indicadores(rend: pd.DataFrame, precos: pd.DataFrame) -> pd.DataFrame:
+    """Calcula os indicadores mensais para todos os FIIs presentes nas séries (formato longo).
+
+    `rend` e `precos` têm colunas fii_id, data (datetime64) e valor (float64).
+    Retorna um DataFrame com fii_id, data, rendimento, rendimento_12m, preco_fechamento,
+    dy_12m, yield_on_cost e crescimento_rendimento.
+    """
+    colunas = [
+        'fii_id', 'data', 'rendimento', 'rendimento_12m', 'preco_fechamento',
+        'dy_12m', 'yield_on_cost', 'crescimento_rendimento',
+    ]
+    if rend.empty and precos.empty:
+        return pd.DataFrame(columns=colunas)
+
+    rend = rend.assign(mes=rend['data'].dt.to_period('M'))
+    precos = precos.sort_values('data').assign(mes=precos['data'].dt.to_period('M'))
+
+    # matrizes mês x FII
+    rend_m = rend.pivot_table(index='mes', columns='fii_id', values='valor', aggfunc='sum')
+    preco_m = precos.groupby(['mes', 'fii_id'])['valor'].last().unstack('fii_id')
+
+    inicio = min(x.index.min() for x in (rend_m, preco_m) if not x.empty)
+    fim = max(x.index.max() for x in (rend_m, preco_m) if not x.empty)
+    meses = pd.period_range(inicio, fim, freq='M')
+    fiis = rend_m.columns.union(preco_m.columns)
+    rend_m = rend_m.reindex(index=meses, columns=fiis)
+    preco_m = preco_m.reindex(index=meses, columns=fiis)
+
+    # período ativo de cada FII: do primeiro ao último mês com qualquer dado
+    tem_dado = rend_m.notna() | preco_m.notna()
+    ativo = tem_dado.cummax() & tem_dado[::-1].cummax()[::-1]
+
+    rend_m = rend_m.fillna(0.0).where(ativo)
+    preco_m = preco_m.ffill().where(ativo)
+
+    rend_12m = rend_m.rolling(12, min_periods=12).sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dy_12m = rend_12m / preco_m
+        yoc = rend_12m / preco_m.shift(12)
+        crescimento = rend_m / rend_m.shift(1) - 1.0
+
+    def longo(df: pd.DataFrame, nome: str) -> pd.Series:
+        return df.replace([np.inf, -np.inf], np.nan).stack(future_stack=True).rename(nome)
+
+    resultado = pd.concat(
+        [
+            longo(rend_m, 'rendimento'),
+            longo(rend_12m, 'rendimento_12m'),
+            longo(preco_m, 'preco_fechamento'),
+            longo(dy_12m, 'dy_12m'),
+            longo(yoc, 'yield_on_cost'),
+            longo(crescimento, 'crescimento_rendimento'),
+        ],
+        axis=1,
+    )
+    resultado = resultado[resultado['rendimento'].notna()].reset_index()
+    resultado.columns = ['mes', 'fii_id'] + colunas[2:]
+    resultado['data'] = resultado['mes'].dt.end_time.dt.date
+    return resultado[colunas]
+
+
+def _para_decimal(valor, casas: int):
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    return round(float(valor), casas)
+
+
+def atualizar_indicadores(forcar: bool = False) -> Tuple[int, int]:
+    """Recalcula os indicadores dos FIIs cujas séries mudaram. Retorna (fiis_recalculados, linhas_gravadas)."""
+    pendentes = fiis_desatualizados(forcar=forcar)
+    if not pendentes:
+        return 0, 0
+    fii_ids = sorted(pendentes)
+    rend, precos = _carregar_series(fii_ids)
+    df = calcular_indicadores(rend, precos)
+
+    objetos = [
+        FIIIndicadorMensal(
+            fii_id=int(row.fii_id),
+            data=row.data,
+            rendimento=_para_decimal(row.rendimento, 6),
+            rendimento_12m=_para_decimal(row.rendimento_12m, 6),
+            preco_fechamento=_para_decimal(row.preco_fechamento, 4),
+            dy_12m=_para_decimal(row.dy_12m, 6),
+            yield_on_cost=_para_decimal(row.yield_on_cost, 6),
+            crescimento_rendimento=_para_decimal(row.crescimento_rendimento, 6),
+        )
+        for row in df.itertuples(index=False)
+    ]
+
+    with transaction.atomic():
+        for lote in _lotes(fii_ids):
+            FIIIndicadorMensal.objects.filter(fii_id__in=lote).delete()
+        FIIIndicadorMensal.objects.bulk_create(objetos, batch_size=1000)
+        for lote in _lotes(fii_ids):
+            FIIIndicadorFonte.objects.filter(fii_id__in=lote).delete()
+        # sem fontes: indicadores e assinatura apagados, nada a recriar
+        FIIIndicadorFonte.objects.bulk_create(
+            [FIIIndicadorFonte(fii_id=fii_id, assinatura=pendentes[fii_id])
+             for fii_id in fii_ids if pendentes[fii_id] != SEM_FONTES],
+            batch_size=1000,
+        )
+    return len(fii_ids), len(objetos)
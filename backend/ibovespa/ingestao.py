@@ -0,0 +1,246 @@
+"""
+Diário das ingestões: cada execução de um comando é uma RodadaIngestao e o resultado de cada código
+nela fica em RegistroIngestao.
+
+A rodada só ganha `fim` quando o comando chega ao final. Com --resume, o comando continua a última
+rodada interrompida (da mesma partição, iniciada há no máximo --janela-horas, padrão 24h) e pula
+só os códigos já concluídos ou ignorados nela; sem rodada interrompida, começa uma nova completa.
+Como cada rodada guarda seus registros, a assinatura (sha256 do conteúdo baixado) de um código
+pode ser comparada entre execuções. Ficam guardadas as RODADAS_GUARDADAS completas mais recentes
+por comando e partição; rodadas interrompidas não são apagadas.
+
+Para dividir o universo entre vários processos (na mesma máquina ou em várias, com o mesmo banco):
+--shard I/N fixa a fatia de cada processo pelo hash do código; --fila distribui os códigos um a
+um por concessões em ConcessaoIngestao, que expiram se o processo morrer. Enquanto trabalha num
+código, o processo renova a concessão entre as etapas (`manter_concessao`).
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import socket
+import zlib
+from datetime import timedelta
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ConcessaoIngestao, RegistroIngestao, RodadaIngestao
+
+JANELA_PADRAO_HORAS = 24.0
+RODADAS_GUARDADAS = 30
+# Status que contam como feito no --resume
+STATUS_CONCLUIDOS = ('ok', 'ignorado')
+CONCESSAO_PADRAO_SEGUNDOS = 600
+# Candidatos lidos por tentativa de pegar um código da fila (sorteados para os processos não disputarem o mesmo)
+CANDIDATOS_FILA = 20
+
+
+def adicionar_argumentos(parser) -> None:
+    parser.add_argument('--resume', action='store_true',
+                        help='Continua a última execução interrompida, pulando os códigos que ela já concluiu')
+    parser.add_argument('--janela-horas', type=float, default=JANELA_PADRAO_HORAS,
+                        help=f'Idade máxima, em horas, da execução interrompida retomada (padrão {JANELA_PADRAO_HORAS:g})')
+
+
+def adicionar_argumentos_distribuicao(parser) -> None:
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--shard', type=_shard, default=None, metavar='I/N',
+                       help='Processa só a fatia I de N do universo (0 <= I < N), pelo hash do código')
+    grupo.add_argument('--fila', nargs='?', const='', default=None, metavar='RODADA',
+                       help='Pega os códigos de uma fila no banco; processos na mesma rodada (padrão: a data '
+                            'de hoje) dividem o universo sem repetir códigos')
+    parser.add_argument('--concessao-segundos', type=int, default=CONCESSAO_PADRAO_SEGUNDOS,
+                        help=f'Prazo de cada código pego da --fila antes de voltar a ficar livre '
+                             f'(padrão {CONCESSAO_PADRAO_SEGUNDOS})')
+
+
+def _shard(texto: str) -> Tuple[int, int]:
+    indice, _, total = texto.partition('/')
+    try:
+        indice, total = int(indice), int(total)
+    except ValueError:
+        indice = total = -1
+    if total < 1 or not 0 <= indice < total:
+        raise argparse.ArgumentTypeError(f'{texto!r}: use I/N com 0 <= I < N, ex.: 0/4')
+    return indice, total
+
+
+def fatia(codigos: Iterable[str], indice: int, total: int) -> List[str]:
+    """Códigos da fatia `indice` de `total` (crc32: estável entre processos, ao contrário de hash())."""
+    return [codigo for codigo in codigos if zlib.crc32(codigo.encode('utf-8')) % total == indice]
+
+
+def distribuir(comando: str, codigos: List[str], options: dict):
+    """Parte deste processo nos `codigos`, conforme --shard/--fila (sem elas, todos).
+
+    Devolve algo iterável e com len(): uma lista ou uma `FilaIngestao`.
+    """
+    if options.get('shard'):
+        return fatia(codigos, *options['shard'])
+    if options.get('fila') is not None:
+        fila = FilaIngestao(comando, options['fila'], options['concessao_segundos'])
+        fila.abastecer(codigos)
+        return fila
+    return codigos
+
+
+def manter_concessao(pendentes: Iterable[str]) -> None:
+    """Renova a concessão do código em andamento quando `pendentes` é uma fila (listas não têm prazo)."""
+    if isinstance(pendentes, FilaIngestao):
+        pendentes.renovar()
+
+
+class FilaIngestao:
+    def __init__(self, comando: str, rodada: str = '', segundos: int = CONCESSAO_PADRAO_SEGUNDOS):
+        self.comando = comando
+        self.rodada = rodada or timezone.localdate().isoformat()
+        self.prazo = timedelta(seconds=segundos)
+        self.dono = f'{socket.gethostname()}:{os.getpid()}'
+        self.restantes = 0
+        # código concedido que o laço está processando agora
+        self.atual: Optional[str] = None
+
+    def _da_rodada(self):
+        return ConcessaoIngestao.objects.filter(comando=self.comando, rodada=self.rodada)
+
+    def _livres(self, agora):
+        return self._da_rodada().filter(finalizado_em__isnull=True).filter(
+            Q(expira_em__isnull=True) | Q(expira_em__lt=agora)
+        )
+
+    def abastecer(self, codigos: Iterable[str]) -> None:
+        """Inclui os códigos na rodada (quem chega depois só encontra as linhas já criadas)."""
+        agora = timezone.now()
+        ConcessaoIngestao.objects.bulk_create(
+            [ConcessaoIngestao(comando=self.comando, rodada=self.rodada, codigo=codigo) for codigo in codigos],
+            ignore_conflicts=True, batch_size=500,
+        )
+        # rodadas anteriores sem concessão em andamento já não servem para nada
+        ConcessaoIngestao.objects.filter(comando=self.comando).exclude(rodada=self.rodada).filter(
+            Q(expira_em__isnull=True) | Q(expira_em__lt=agora)
+        ).delete()
+        self.restantes = self._da_rodada().filter(finalizado_em__isnull=True).count()
+
+    def pegar(self) -> Optional[str]:
+        """Próximo código livre, já concedido a este processo; None quando a fila acabou."""
+        while True:
+            agora = timezone.now()
+            candidatos = list(self._livres(agora).values_list('pk', 'codigo')[:CANDIDATOS_FILA])
+            if not candidatos:
+                return None
+            random.shuffle(candidatos)
+            for pk, codigo in candidatos:
+                # UPDATE condicional: só um processo consegue trocar o dono de uma linha livre
+                if self._livres(agora).filter(pk=pk).update(dono=self.dono, expira_em=agora + self.prazo):
+                    return codigo
+
+    def _meus(self, codigo: str):
+        return self._da_rodada().filter(codigo=codigo, dono=self.dono, finalizado_em__isnull=True)
+
+    def renovar(self, codigo: Optional[str] = None) -> bool:
+        """Estende a concessão do código (o atual, por padrão); False se ela já passou para outro processo.
+
+        Os comandos chamam entre as etapas pesadas de um código, para que um download lento não deixe a
+        concessão expirar no meio e outro processo repetir o mesmo código.
+        """
+        codigo = codigo or self.atual
+        if codigo is None:
+            return False
+        return bool(self._meus(codigo).update(expira_em=timezone.now() + self.prazo))
+
+    def finalizar(self, codigo: str) -> bool:
+        # se a concessão expirou e outro processo a pegou, é ele quem finaliza
+        return bool(self._meus(codigo).update(finalizado_em=timezone.now(), expira_em=None))
+
+    def __len__(self) -> int:
+        return self.restantes
+
+    def __iter__(self) -> Iterator[str]:
+        # o código entregue é finalizado quando o laço pede o próximo (com sucesso ou com a falha já
+        # registrada no diário); se o processo morrer no meio, a concessão expira e outro o pega
+        while True:
+            codigo = self.atual = self.pegar()
+            if codigo is None:
+                return
+            yield codigo
+            self.finalizar(codigo)
+            self.atual = None
+
+
+def assinatura(*partes: Any) -> str:
+    """sha256 das partes (texto, bytes, DataFrame ou qualquer coisa serializável em JSON)."""
+    resumo = hashlib.sha256()
+    for parte in partes:
+        if isinstance(parte, bytes):
+            resumo.update(parte)
+        elif isinstance(parte, str):
+            resumo.update(parte.encode('utf-8'))
+        elif isinstance(parte, (pd.DataFrame, pd.Series)):
+            resumo.update(pd.util.hash_pandas_object(parte, index=True).values.tobytes())
+        else:
+            resumo.update(json.dumps(parte, sort_keys=True, default=str).encode('utf-8'))
+    return resumo.hexdigest()
+
+
+def particao(options: dict) -> str:
+    """Parte do universo de uma execução: só se retoma uma rodada da mesma partição."""
+    if options.get('shard'):
+        return 'shard {}/{}'.format(*options['shard'])
+    if options.get('fila') is not None:
+        return f"fila {options['fila'] or timezone.localdate().isoformat()}"
+    return ''
+
+
+class DiarioIngestao:
+    def __init__(self, comando: str, retomar: bool = False, janela_horas: float = JANELA_PADRAO_HORAS,
+                 particao_: str = ''):
+        self.comando = comando
+        self.concluidos = set()
+        self.rodada = None
+        if retomar:
+            desde = timezone.now() - timedelta(hours=janela_horas)
+            self.rodada = RodadaIngestao.objects.filter(
+                comando=comando, particao=particao_, fim__isnull=True, inicio__gte=desde,
+            ).order_by('-inicio').first()
+        self.retomada = self.rodada is not None
+        if self.retomada:
+            self.concluidos = set(self.rodada.registros.filter(
+                status__in=STATUS_CONCLUIDOS,
+            ).values_list('codigo', flat=True))
+        else:
+            self.rodada = RodadaIngestao.objects.create(comando=comando, particao=particao_)
+
+    @classmethod
+    def das_opcoes(cls, comando: str, options: dict) -> 'DiarioIngestao':
+        return cls(comando, options['resume'], options['janela_horas'], particao(options))
+
+    def pendentes(self, codigos: Iterable[str]) -> List[str]:
+        return [codigo for codigo in codigos if codigo not in self.concluidos]
+
+    def encerrar(self) -> None:
+        """Marca a rodada como completa (um --resume seguinte começa outra, do zero) e limpa as antigas."""
+        RodadaIngestao.objects.filter(pk=self.rodada.pk).update(fim=timezone.now())
+        # só rodadas completas da mesma partição: uma interrompida segue disponível ao --resume
+        antigas = RodadaIngestao.objects.filter(
+            comando=self.comando, particao=self.rodada.particao, fim__isnull=False,
+        ).order_by('-inicio')[RODADAS_GUARDADAS:]
+        RodadaIngestao.objects.filter(pk__in=list(antigas.values_list('pk', flat=True))).delete()
+
+    def _registrar(self, codigo: str, status: str, assinatura_: str = '', mensagem: str = '') -> None:
+        RegistroIngestao.objects.update_or_create(
+            rodada=self.rodada, codigo=codigo,
+            defaults={'comando': self.comando, 'status': status, 'assinatura': assinatura_, 'mensagem': mensagem},
+        )
+
+    def concluir(self, codigo: str, *conteudo: Any) -> None:
+        self._registrar(codigo, 'ok', assinatura(*conteudo) if conteudo else '')
+
+    def ignorar(self, codigo: str, motivo: str = '') -> None:
+        self._registrar(codigo, 'ignorado', mensagem=motivo)
+
+    def falhar(self, codigo: str, erro: BaseException) -> None:
+        self._registrar(codigo, 'erro', mensagem=f'{type(erro).__name__}: {erro}'[:1000])
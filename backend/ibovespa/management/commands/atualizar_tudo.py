@@ -0,0 +1,236 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from ibovespa.metricas import ComandoComMetricas
+
+
+@dataclass(frozen=True)
+class Etapa:
+    nome: str
+    comando: Tuple[str, ...]
+    depende: Tuple[str, ...] = ()
+    # fonte externa que a etapa consulta: etapas da mesma fonte dividem o --limite dela
+    fonte: str = ''
+    aceita_resume: bool = True
+
+
+# Ações e FIIs são ramos independentes; em cada um a base vem antes dos históricos
+ETAPAS = (
+    Etapa('base_b3', ('baixar_base_b3', '--banco'), fonte='yfinance'),
+    Etapa('log_fechamento', ('baixar_log_fechamento', 'ALL'), depende=('base_b3',), fonte='yfinance'),
+    Etapa('base_fii', ('baixar_base_fii', 'ALL'), fonte='fundamentus'),
+    Etapa('log_fii', ('baixar_log_fii', 'ALL'), depende=('base_fii',), fonte='fundamentus'),
+    Etapa('indicadores_fii', ('calcular_indicadores_fii',), depende=('log_fii',), aceita_resume=False),
+)
+LIMITES_PADRAO = {'yfinance': 1, 'fundamentus': 1}
+
+
+@dataclass
+class Execucao:
+    etapa: Etapa
+    status: str = 'pendente'
+    inicio: Optional[float] = None
+    fim: Optional[float] = None
+    codigo_saida: Optional[int] = None
+    ultimas_linhas: List[str] = field(default_factory=list)
+
+    @property
+    def duracao(self) -> float:
+        return (self.fim - self.inicio) if self.inicio is not None and self.fim is not None else 0.0
+
+
+def ordenar(etapas) -> List[Etapa]:
+    """Ordem topológica das etapas (dependências fora da seleção contam como satisfeitas)."""
+    por_nome = {e.nome: e for e in etapas}
+    ordem, visitando, feitas = [], set(), set()
+
+    def visitar(etapa):
+        if etapa.nome in feitas:
+            return
+        if etapa.nome in visitando:
+            raise CommandError(f'Ciclo de dependências em {etapa.nome}.')
+        visitando.add(etapa.nome)
+        for dep in etapa.depende:
+            if dep in por_nome:
+                visitar(por_nome[dep])
+        visitando.discard(etapa.nome)
+        feitas.add(etapa.nome)
+        ordem.append(etapa)
+
+    for etapa in etapas:
+        visitar(etapa)
+    return ordem
+
+
+class Command(ComandoComMetricas):
+    help = (
+        'Roda toda a ingestão como um grafo de dependências: base_b3 -> log_fechamento e '
+        'base_fii -> log_fii -> indicadores_fii. Ramos independentes rodam em paralelo (cada etapa '
+        'num processo manage.py próprio) e no fim sai um relatório único de tempos. '
+        'Uso: python manage.py atualizar_tudo [--etapas base_fii,log_fii] [--paralelo 2] [--limite yfinance=1] [--resume]'
+    )
+    def add_arguments(self, parser):
+        nomes = ','.join(e.nome for e in ETAPAS)
+        parser.add_argument('--etapas', type=str, default='', help=f'Subconjunto das etapas ({nomes}); padrão todas')
+        parser.add_argument('--paralelo', type=int, default=2, help='Máximo de etapas rodando ao mesmo tempo (padrão 2)')
+        parser.add_argument(
+            '--limite', action='append', default=[], metavar='FONTE=N',
+            help='Máximo de etapas simultâneas por fonte externa (padrão yfinance=1, fundamentus=1); pode repetir',
+        )
+        parser.add_argument('--workers', type=int, default=None, help='Repassado ao baixar_base_b3 (threads do yfinance)')
+        parser.add_argument('--resume', action='store_true', help='Repassado às etapas de ingestão (ver baixar_base_b3 --help)')
+        parser.add_argument('--janela-horas', type=float, default=None, help='Repassado junto com --resume')
+        parser.add_argument('--planejar', action='store_true', help='Só mostra a ordem e os comandos, sem executar')
+
+    def handle(self, *args, **options):
+        etapas = self._selecionar(options['etapas'])
+        limites = self._limites(options['limite'])
+        paralelo = max(1, options['paralelo'])
+        execucoes = {e.nome: Execucao(e) for e in ordenar(etapas)}
+
+        if options['planejar']:
+            for execucao in execucoes.values():
+                etapa = execucao.etapa
+                deps = ', '.join(d for d in etapa.depende if d in execucoes) or '-'
+                self.stdout.write(f'{etapa.nome:<16} depende de {deps:<16} manage.py {" ".join(self._argumentos(etapa, options))}')
+            return
+
+        self.stdout.write(self.style.NOTICE(
+            f'Executando {len(execucoes)} etapas, até {paralelo} em paralelo '
+            f'({", ".join(f"{f}={n}" for f, n in sorted(limites.items()))}).'
+        ))
+        self._saida = threading.Lock()
+        inicio = time.monotonic()
+        rodando: Dict[Future, Execucao] = {}
+        while True:
+            self._pular_dependentes_de_falhas(execucoes)
+            for execucao in self._prontas(execucoes, rodando.values(), limites, paralelo):
+                execucao.status, execucao.inicio = 'rodando', time.monotonic()
+                futuro = Future()
+                threading.Thread(target=self._rodar, args=(execucao, options, futuro), daemon=True).start()
+                rodando[futuro] = execucao
+            if not rodando:
+                break
+            concluidos, _ = wait(list(rodando), return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                execucao = rodando.pop(futuro)
+                execucao.fim = time.monotonic()
+                execucao.codigo_saida = futuro.result()
+                execucao.status = 'ok' if execucao.codigo_saida == 0 else 'falhou'
+                self.metricas.registrar(execucao.etapa.nome, execucao.duracao)
+                self.metricas.contar(f'etapas_{execucao.status}')
+                estilo = self.style.SUCCESS if execucao.status == 'ok' else self.style.ERROR
+                self._escrever(estilo(f'[{execucao.etapa.nome}] {execucao.status} em {execucao.duracao:.1f}s'))
+
+        self._relatorio(execucoes, inicio, time.monotonic())
+        falhas = [e.etapa.nome for e in execucoes.values() if e.status != 'ok']
+        if falhas:
+            raise CommandError(f'Etapas sem sucesso: {", ".join(falhas)}')
+
+    def _selecionar(self, texto: str) -> List[Etapa]:
+        if not texto:
+            return list(ETAPAS)
+        nomes = [n.strip() for n in texto.split(',') if n.strip()]
+        desconhecidas = set(nomes) - {e.nome for e in ETAPAS}
+        if desconhecidas:
+            raise CommandError(f'Etapas desconhecidas: {", ".join(sorted(desconhecidas))}')
+        return [e for e in ETAPAS if e.nome in nomes]
+
+    def _limites(self, pares: List[str]) -> Dict[str, int]:
+        limites = dict(LIMITES_PADRAO)
+        for par in pares:
+            fonte, _, valor = par.partition('=')
+            if not fonte or not valor.isdigit() or int(valor) < 1:
+                raise CommandError(f'--limite inválido: {par!r} (use FONTE=N, ex.: yfinance=2)')
+            limites[fonte.strip()] = int(valor)
+        return limites
+
+    def _prontas(self, execucoes, rodando, limites, paralelo) -> List[Execucao]:
+        ocupadas = {}
+        for execucao in rodando:
+            ocupadas[execucao.etapa.fonte] = ocupadas.get(execucao.etapa.fonte, 0) + 1
+        vagas = paralelo - len(rodando)
+        prontas = []
+        for execucao in execucoes.values():
+            etapa = execucao.etapa
+            if vagas <= 0:
+                break
+            if execucao.status != 'pendente':
+                continue
+            if any(execucoes[d].status != 'ok' for d in etapa.depende if d in execucoes):
+                continue
+            if etapa.fonte and ocupadas.get(etapa.fonte, 0) >= limites.get(etapa.fonte, paralelo):
+                continue
+            ocupadas[etapa.fonte] = ocupadas.get(etapa.fonte, 0) + 1
+            vagas -= 1
+            prontas.append(execucao)
+        return prontas
+
+    def _pular_dependentes_de_falhas(self, execucoes) -> None:
+        # em ordem topológica, então a falha se propaga por toda a cadeia numa passada
+        for execucao in execucoes.values():
+            if execucao.status != 'pendente':
+                continue
+            deps = [execucoes[d] for d in execucao.etapa.depende if d in execucoes]
+            if any(d.status in ('falhou', 'pulada') for d in deps):
+                execucao.status = 'pulada'
+                self._escrever(self.style.WARNING(f'[{execucao.etapa.nome}] pulada: dependência sem sucesso'))
+
+    def _argumentos(self, etapa: Etapa, options) -> List[str]:
+        argumentos = list(etapa.comando)
+        if etapa.nome == 'base_b3' and options['workers'] is not None:
+            argumentos += ['--workers', str(options['workers'])]
+        if options['resume'] and etapa.aceita_resume:
+            argumentos.append('--resume')
+            if options['janela_horas'] is not None:
+                argumentos += ['--janela-horas', f'{options["janela_horas"]:g}']
+        return argumentos
+
+    def _rodar(self, execucao: Execucao, options, futuro: Future) -> None:
+        etapa = execucao.etapa
+        comando = [sys.executable, '-m', 'django', *self._argumentos(etapa, options), '--no-color']
+        ambiente = dict(os.environ, PYTHONUNBUFFERED='1')
+        self._escrever(f'[{etapa.nome}] iniciando: manage.py {" ".join(comando[3:-1])}')
+        try:
+            # diretório do projeto: as etapas gravam seus arquivos de staging relativos a ele
+            processo = subprocess.Popen(comando, cwd=settings.BASE_DIR, env=ambiente, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace')
+            for linha in processo.stdout:
+                linha = linha.rstrip()
+                execucao.ultimas_linhas = (execucao.ultimas_linhas + [linha])[-5:]
+                self._escrever(f'[{etapa.nome}] {linha}')
+            futuro.set_result(processo.wait())
+        except Exception as exc:
+            self._escrever(self.style.ERROR(f'[{etapa.nome}] não foi possível executar: {exc}'))
+            futuro.set_result(-1)
+
+    def _escrever(self, texto: str) -> None:
+        with self._saida:
+            self.stdout.write(texto)
+
+    def _relatorio(self, execucoes, inicio: float, fim: float) -> None:
+        self.stdout.write('')
+        self.stdout.write(self.style.NOTICE('Relatório da atualização'))
+        self.stdout.write(f'{"etapa":<16} {"status":<8} {"início":>8} {"duração":>9} {"saída":>6}')
+        soma = 0.0
+        for execucao in sorted(execucoes.values(), key=lambda e: (e.inicio is None, e.inicio or 0)):
+            soma += execucao.duracao
+            desde = f'+{execucao.inicio - inicio:.1f}s' if execucao.inicio is not None else '-'
+            saida = '-' if execucao.codigo_saida is None else str(execucao.codigo_saida)
+            self.stdout.write(
+                f'{execucao.etapa.nome:<16} {execucao.status:<8} {desde:>8} {execucao.duracao:>8.1f}s {saida:>6}'
+            )
+            if execucao.status == 'falhou':
+                for linha in execucao.ultimas_linhas:
+                    self.stdout.write(f'    {linha}')
+        total = fim - inicio
+        self.stdout.write(f'Total: {total:.1f}s de relógio; {soma:.1f}s somando as etapas (em série).')
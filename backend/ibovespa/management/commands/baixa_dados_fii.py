@@ -1,6 +1,7 @@
-import re
+# Rodar de backend/: python -m ibovespa.management.commands.baixa_dados_fii
 import requests
-from datetime import date, datetime
+
+from ibovespa.graficos import extrair_series
 
 URL = "https://www.fundamentus.com.br/fii_graficos.php?papel=VTLT11&tipo=1"
 
@@ -17,12 +18,13 @@ resp.raise_for_status()
 resp.encoding = resp.apparent_encoding or resp.encoding
 html = resp.text
 
-# captura pares [Date.UTC(YYYY,MM,DD), VALOR]
-# Atenção: no regex abaixo usamos apenas um backslash para escapar o ponto literal e os parênteses, pois r"..." já trata a barra
-pattern = re.compile(r"Date\.UTC\(\s*(\d{4})\s*,\s*(\d{1,2})\s*,\s*(\d{1,2})\s*\)\s*,\s*([-?\d.,]+)", re.IGNORECASE)
-matches = pattern.findall(html)
+# uma varredura só devolve todas as séries da página (ver ibovespa/graficos.py)
+series = extrair_series(html)
 
-if not matches:
+# pares [Date.UTC(YYYY,MM,DD), VALOR] do Highcharts (mês 0-based já convertido; aceita 1.234,56):
+# soltos ficam na série "Date.UTC"; dentro de "var nome = [...]" ficam com o nome da variável
+com_data = [s for nome, s in series.items() if s.datas is not None and nome != "dataSerieDividendYield"]
+if not com_data:
     # opcional: salva HTML para inspecionar localmente
     try:
         with open("fundamentus_debug.html", "w", encoding="utf-8") as f:
@@ -31,42 +33,19 @@ if not matches:
     except Exception:
         pass
 
-dados = []
-for y, m, d, v in matches:
-    yyyy, mm, dd = int(y), int(m) + 1, int(d)  # Highcharts usa mês 0-based
-    # normaliza número com possível separador de milhar '.' e decimal ','
-    valor_str = v.strip()
-    if "," in valor_str and "." in valor_str:
-        # formato brasileiro: 1.234,56
-        valor = float(valor_str.replace(".", "").replace(",", "."))
-    elif "," in valor_str and "." not in valor_str:
-        # apenas vírgula como decimal
-        valor = float(valor_str.replace(",", "."))
-    else:
-        valor = float(valor_str)
-    dados.append((date(yyyy, mm, dd).isoformat(), valor))
+dados = [linha for s in com_data for linha in zip(s.datas.astype(str).tolist(), s.valores.tolist())]
 
 print(f"Date.UTC pontos extraídos: {len(dados)}")
 for linha in dados:
     print(linha)
 
-# Extração específica da variável JavaScript dataSerieDividendYield (ApexCharts)
-pattern_divy_block = re.compile(r"var\s+dataSerieDividendYield\s*=\s*\[(.*?)\];", re.DOTALL | re.IGNORECASE)
-m_divy = pattern_divy_block.search(html)
-
-dados_divy = []
-if m_divy:
-    block = m_divy.group(1)
-    # extrai pares [ timestamp_ms , valor_decimal ]
-    pair_regex = re.compile(r"\[\s*(\d+)\s*,\s*([-]?\d+(?:\.\d+)?)\s*\]")
-    for ts_ms_str, val_str in pair_regex.findall(block):
-        ts_ms = int(ts_ms_str)
-        dy_val = float(val_str)
-        dt = datetime.utcfromtimestamp(ts_ms / 1000).date().isoformat()
-        dados_divy.append((dt, dy_val))
+# Variável JavaScript dataSerieDividendYield (ApexCharts): pares [timestamp_ms, valor]
+divy = series.get("dataSerieDividendYield")
+if divy is not None:
+    dados_divy = list(zip(divy.datas.astype(str).tolist(), divy.valores.tolist()))
 
     print(f"DividendYield pontos extraídos: {len(dados_divy)}")
     for linha in dados_divy:
         print(linha)
 else:
-    print("Variável dataSerieDividendYield não encontrada no HTML.")
\ No newline at end of file
+    print("Variável dataSerieDividendYield não encontrada no HTML.")
@@ -1,13 +1,96 @@
-import time
+import json
+import math
+import os
+from itertools import islice
+from typing import Iterator
+
 import requests
 import pandas as pd
 import yfinance as yf
 from bs4 import BeautifulSoup
-from django.core.management.base import BaseCommand
+from django.db import transaction
+from ibovespa.coleta import LimitadorTaxa, Progresso, coletar_em_paralelo
+from ibovespa.ingestao import DiarioIngestao, adicionar_argumentos
+from ibovespa.metricas import ComandoComMetricas
 from ibovespa.models import Ativo, Setor, Segmento
 
-class Command(BaseCommand):
-    help = 'Coleta dados da B3 e salva em um arquivo CSV. Pode salvar no banco e usar CSV existente.'
+COLUNAS = [
+    'Codigo', 'Nome', 'Nick', 'Preco_atual', 'Variacao', 'Setor', 'Segmento', 'Sobre', 'Funcionarios',
+    'Risco_Auditoria', 'Risco_Administrativo', 'Risco_Executivos', 'Risco_Acionista', 'Risco_Medio',
+    'Fechamento_Anterior', 'Baixa_do_Dia', 'Alta_do_Dia', 'Volume', 'MenorPreco_52S', 'MaiorPreco_52S',
+    'DivYeard_Valor', 'DivYeard_Percent', 'PercLucro_Div', 'MediaDiv_5Anos', 'Risco_Mercado',
+    'Divida_Sobre_Patrim', 'Divida', 'Especialista_Alta', 'Especialista_Media', 'Especialista_Baixa',
+    'Especialista_Ideal',
+]
+
+# Arquivo de staging (uma linha JSON por ativo, gravada assim que coletada) e o CSV das versões antigas
+ARQUIVO_STAGING = 'dados_b3.ndjson'
+ARQUIVO_CSV_LEGADO = 'dados_b3.csv'
+# Linhas lidas do staging por vez no --nodownload / --banco
+LINHAS_POR_BLOCO = 500
+# Tipos explícitos na leitura: texto fica object (vazio vira '' em salvar_no_banco), o resto é numérico
+COLUNAS_TEXTO = (
+    'Codigo', 'Nome', 'Nick', 'Setor', 'Segmento', 'Sobre', 'Risco_Auditoria', 'Risco_Administrativo',
+    'Risco_Executivos', 'Risco_Acionista', 'Risco_Medio',
+)
+COLUNAS_INTEIRAS = ('Funcionarios', 'Volume')
+TIPOS_NUMERICOS = {
+    coluna: 'Int64' if coluna in COLUNAS_INTEIRAS else 'float64' for coluna in COLUNAS if coluna not in COLUNAS_TEXTO
+}
+
+# coluna do CSV -> campo de Ativo (Setor e Segmento viram setor_id/segmento_id pelos mapas de nomes)
+CAMPOS_ATIVO = {
+    'Codigo': 'codigo', 'Nome': 'nome', 'Nick': 'apelido', 'Preco_atual': 'preco_atual',
+    'Variacao': 'variacao', 'Sobre': 'descricao', 'Funcionarios': 'funcionarios',
+    'Risco_Auditoria': 'risco_auditoria', 'Risco_Administrativo': 'risco_administrativo',
+    'Risco_Executivos': 'risco_executivos', 'Risco_Acionista': 'risco_acionista', 'Risco_Medio': 'risco_medio',
+    'Fechamento_Anterior': 'fechamento_anterior', 'Baixa_do_Dia': 'baixa_do_dia', 'Alta_do_Dia': 'alta_do_dia',
+    'Volume': 'volume', 'MenorPreco_52S': 'menor_preco_52s', 'MaiorPreco_52S': 'maior_preco_52s',
+    'DivYeard_Valor': 'dividendo_valor', 'DivYeard_Percent': 'dividendo_percentual',
+    'PercLucro_Div': 'percentual_lucro_dividendo', 'MediaDiv_5Anos': 'media_dividendo_5anos',
+    'Risco_Mercado': 'risco_mercado_beta', 'Divida_Sobre_Patrim': 'divida_sobre_patrimonio',
+    'Divida': 'divida_total', 'Especialista_Alta': 'preco_alvo_alta', 'Especialista_Media': 'preco_alvo_media',
+    'Especialista_Baixa': 'preco_alvo_baixa', 'Especialista_Ideal': 'preco_alvo_ideal',
+}
+# Ativos por INSERT ... ON CONFLICT (o backend ainda reduz o lote ao limite de parâmetros, ex.: SQLite)
+TAMANHO_LOTE = 500
+
+def _sem_nan(valor):
+    # o .info às vezes traz NaN/Infinity, que não são JSON válido
+    return None if isinstance(valor, float) and not math.isfinite(valor) else valor
+
+
+def _registros_ndjson(caminho: str) -> Iterator[dict]:
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            try:
+                yield json.loads(linha)
+            except json.JSONDecodeError:
+                # última linha truncada por uma coleta interrompida no meio da escrita
+                continue
+
+
+def ler_staging(caminho: str, linhas_por_bloco: int = LINHAS_POR_BLOCO) -> Iterator[pd.DataFrame]:
+    """Blocos do staging (NDJSON, ou o CSV antigo) com as colunas e os tipos numéricos fixos."""
+    if caminho.endswith('.csv'):
+        tipos = {coluna: str for coluna in COLUNAS_TEXTO}
+        tipos.update({c: t for c, t in TIPOS_NUMERICOS.items() if t != 'Int64'})
+        blocos = pd.read_csv(caminho, sep=';', chunksize=linhas_por_bloco, dtype=tipos)
+    else:
+        registros = _registros_ndjson(caminho)
+        blocos = (
+            pd.DataFrame.from_records(lote, columns=COLUNAS)
+            for lote in iter(lambda: list(islice(registros, linhas_por_bloco)), [])
+        )
+    for bloco in blocos:
+        yield bloco.reindex(columns=COLUNAS).astype(TIPOS_NUMERICOS)
+
+
+class Command(ComandoComMetricas):
+    help = (
+        'Coleta dados da B3 e grava cada ativo em dados_b3.ndjson assim que chega. '
+        'Pode salvar no banco e reaproveitar o arquivo existente (--nodownload).'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -18,28 +101,147 @@ class Command(BaseCommand):
         parser.add_argument(
             '--nodownload',
             action='store_true',
-            help='Usa dados do CSV dados_b3.csv para salvar no banco, sem fazer coleta online.'
+            help='Usa o dados_b3.ndjson (ou o antigo dados_b3.csv) existente para salvar no banco, sem coleta online.'
         )
+        parser.add_argument('--workers', type=int, default=8, help='Threads de coleta no yfinance (padrão 8)')
+        parser.add_argument('--taxa', type=float, default=4.0,
+                            help='Máximo de requisições por segundo somando as threads (padrão 4)')
+        adicionar_argumentos(parser)
+
+    def _mapa_nomes(self, modelo, nomes) -> dict:
+        """{nome: id} da dimensão, criando de uma vez (bulk_create) os nomes que faltam."""
+        nomes = {nome for nome in nomes if nome}
+        mapa = dict(modelo.objects.filter(nome__in=nomes).values_list('nome', 'id'))
+        faltantes = nomes - mapa.keys()
+        if faltantes:
+            modelo.objects.bulk_create([modelo(nome=nome) for nome in faltantes], ignore_conflicts=True)
+            mapa.update(modelo.objects.filter(nome__in=faltantes).values_list('nome', 'id'))
+        return mapa
+
+    def salvar_no_banco(self, df: pd.DataFrame) -> int:
+        """Grava um bloco do staging em Ativo com upserts em lote: poucas consultas por bloco, não 4 por ativo."""
+        df = df.drop_duplicates('Codigo', keep='last').reindex(columns=COLUNAS)
+        textos = list(COLUNAS_TEXTO)
+        # campos de texto são blank=True e não nulos: vazio vira '' e não None
+        df[textos] = df[textos].fillna('').astype(str)
+        # NaN -> None de uma vez (object para o None não virar NaN de novo nas colunas float)
+        df = df.astype(object).where(df.notna(), None)
+
+        with transaction.atomic():
+            setores = self._mapa_nomes(Setor, df['Setor'].unique())
+            segmentos = self._mapa_nomes(Segmento, df['Segmento'].unique())
+            ativos = [
+                Ativo(
+                    setor_id=setores.get(registro['Setor']),
+                    segmento_id=segmentos.get(registro['Segmento']),
+                    **{campo: registro[coluna] for coluna, campo in CAMPOS_ATIVO.items()},
+                )
+                for registro in df.to_dict(orient='records')
+            ]
+            # data_atualizacao entra na atualização: auto_now vale no pre_save do bulk_create, mas só
+            # chega às linhas existentes se estiver em update_fields
+            campos_atualizados = [c for c in CAMPOS_ATIVO.values() if c != 'codigo'] + [
+                'setor', 'segmento', 'data_atualizacao']
+            Ativo.objects.bulk_create(
+                ativos, batch_size=TAMANHO_LOTE, update_conflicts=True,
+                unique_fields=['codigo'], update_fields=campos_atualizados,
+            )
+        return len(ativos)
+
+    def _coletar_info(self, codigo):
+        """Linha do CSV com o .info do yfinance; None se o ativo não tiver nome."""
+        with self.metricas.medir('http', codigo):
+            info = yf.Ticker(codigo).info
+        info.setdefault('longName', '')
+        info.setdefault('shortName', '')
+        info.setdefault('currentPrice', None)
+        info.setdefault('regularMarketChangePercent', None)
+        info.setdefault('industry', '')
+        info.setdefault('sector', '')
+        info.setdefault('longBusinessSummary', '')
+        info.setdefault('fullTimeEmployees', None)
+        info.setdefault('auditRisk', '')
+        info.setdefault('boardRisk', '')
+        info.setdefault('compensationRisk', '')
+        info.setdefault('shareHolderRightsRisk', '')
+        info.setdefault('overallRisk', '')
+        info.setdefault('previousClose', None)
+        info.setdefault('dayLow', None)
+        info.setdefault('dayHigh', None)
+        info.setdefault('volume', None)
+        info.setdefault('fiftyTwoWeekLow', None)
+        info.setdefault('fiftyTwoWeekHigh', None)
+        info.setdefault('dividendRate', None)
+        info.setdefault('dividendYield', None)
+        info.setdefault('payoutRatio', None)
+        info.setdefault('fiveYearAvgDividendYield', None)
+        info.setdefault('beta', None)
+        info.setdefault('debtToEquity', None)
+        info.setdefault('totalDebt', None)
+        info.setdefault('targetHighPrice', None)
+        info.setdefault('targetMedianPrice', None)
+        info.setdefault('targetLowPrice', None)
+        info.setdefault('targetMeanPrice', None)
+
+        if not info['longName'] and not info['shortName']:
+            return None
+
+        linha = {
+            'Codigo': codigo,
+            'Nome': info['longName'],
+            'Nick': info['shortName'],
+            'Preco_atual': info['currentPrice'],
+            'Variacao': info['regularMarketChangePercent'],
+            'Setor': info['industry'],
+            'Segmento': info['sector'],
+            'Sobre': info['longBusinessSummary'],
+            'Funcionarios': info['fullTimeEmployees'],
+            'Risco_Auditoria': info['auditRisk'],
+            'Risco_Administrativo': info['boardRisk'],
+            'Risco_Executivos': info['compensationRisk'],
+            'Risco_Acionista': info['shareHolderRightsRisk'],
+            'Risco_Medio': info['overallRisk'],
+            'Fechamento_Anterior': info['previousClose'],
+            'Baixa_do_Dia': info['dayLow'],
+            'Alta_do_Dia': info['dayHigh'],
+            'Volume': info['volume'],
+            'MenorPreco_52S': info['fiftyTwoWeekLow'],
+            'MaiorPreco_52S': info['fiftyTwoWeekHigh'],
+            'DivYeard_Valor': info['dividendRate'],
+            'DivYeard_Percent': info['dividendYield'],
+            'PercLucro_Div': info['payoutRatio'],
+            'MediaDiv_5Anos': info['fiveYearAvgDividendYield'],
+            'Risco_Mercado': info['beta'],
+            'Divida_Sobre_Patrim': info['debtToEquity'],
+            'Divida': info['totalDebt'],
+            'Especialista_Alta': info['targetHighPrice'],
+            'Especialista_Media': info['targetMedianPrice'],
+            'Especialista_Baixa': info['targetLowPrice'],
+            'Especialista_Ideal': info['targetMeanPrice'],
+        }
+        return {coluna: _sem_nan(valor) for coluna, valor in linha.items()}
 
     def handle(self, *args, **kwargs):
         salvar_no_banco = kwargs['banco']
         nodownload = kwargs['nodownload']
+        workers = kwargs['workers']
+        taxa = kwargs['taxa']
 
         if nodownload:
-            self.stdout.write(self.style.NOTICE('Carregando dados do CSV existente dados_b3.csv...'))
-            try:
-                df = pd.read_csv('dados_b3.csv', sep=';')
-            except FileNotFoundError:
-                self.stdout.write(self.style.ERROR('Arquivo dados_b3.csv não encontrado. Saindo.'))
+            arquivo = ARQUIVO_STAGING if os.path.exists(ARQUIVO_STAGING) else ARQUIVO_CSV_LEGADO
+            if not os.path.exists(arquivo):
+                self.stdout.write(self.style.ERROR(f'Arquivo {ARQUIVO_STAGING} não encontrado. Saindo.'))
                 return
+            self.stdout.write(self.style.NOTICE(f'Carregando dados do arquivo existente {arquivo}...'))
         else:
             self.stdout.write(self.style.NOTICE('Coletando códigos das ações...'))
 
             url = 'https://www.fundamentus.com.br/resultado.php'
             headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers)
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
+            with self.metricas.medir('lista_fundamentus'):
+                response = requests.get(url, headers=headers)
+                response.encoding = 'utf-8'
+                soup = BeautifulSoup(response.text, 'html.parser')
 
             empresas = []
             tabela = soup.find('table', {'class': 'resultado'})
@@ -58,157 +260,52 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR('Nenhum dado foi coletado.'))
                 return
 
-            self.stdout.write(self.style.NOTICE('Coletando dados usando yfinance...'))
-            dados = []
-
-            for acao in empresas:
-                self.stdout.write(f'Tentando coletar dados para: {acao["codigo"]}')
-                try:
-                    info = yf.Ticker(acao['codigo']).info
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f'Erro ao coletar {acao["codigo"]}: {e}'))
-                    continue
-
-                info.setdefault('longName', '')
-                info.setdefault('shortName', '')
-                info.setdefault('currentPrice', None)
-                info.setdefault('regularMarketChangePercent', None)
-                info.setdefault('industry', '')
-                info.setdefault('sector', '')
-                info.setdefault('longBusinessSummary', '')
-                info.setdefault('fullTimeEmployees', None)
-                info.setdefault('auditRisk', '')
-                info.setdefault('boardRisk', '')
-                info.setdefault('compensationRisk', '')
-                info.setdefault('shareHolderRightsRisk', '')
-                info.setdefault('overallRisk', '')
-                info.setdefault('previousClose', None)
-                info.setdefault('dayLow', None)
-                info.setdefault('dayHigh', None)
-                info.setdefault('volume', None)
-                info.setdefault('fiftyTwoWeekLow', None)
-                info.setdefault('fiftyTwoWeekHigh', None)
-                info.setdefault('dividendRate', None)
-                info.setdefault('dividendYield', None)
-                info.setdefault('payoutRatio', None)
-                info.setdefault('fiveYearAvgDividendYield', None)
-                info.setdefault('beta', None)
-                info.setdefault('debtToEquity', None)
-                info.setdefault('totalDebt', None)
-                info.setdefault('targetHighPrice', None)
-                info.setdefault('targetMedianPrice', None)
-                info.setdefault('targetLowPrice', None)
-                info.setdefault('targetMeanPrice', None)
-
-                if not info['longName'] and not info['shortName']:
-                    self.stdout.write(self.style.WARNING(f'Ignorando ativo {acao["codigo"]} pois não possui nome válido.'))
-                    continue
-
-                dados.append({
-                    'Codigo': acao['codigo'],
-                    'Nome': info['longName'],
-                    'Nick': info['shortName'],
-                    'Preco_atual': info['currentPrice'],
-                    'Variacao': info['regularMarketChangePercent'],
-                    'Setor': info['industry'],
-                    'Segmento': info['sector'],
-                    'Sobre': info['longBusinessSummary'],
-                    'Funcionarios': info['fullTimeEmployees'],
-                    'Risco_Auditoria': info['auditRisk'],
-                    'Risco_Administrativo': info['boardRisk'],
-                    'Risco_Executivos': info['compensationRisk'],
-                    'Risco_Acionista': info['shareHolderRightsRisk'],
-                    'Risco_Medio': info['overallRisk'],
-                    'Fechamento_Anterior': info['previousClose'],
-                    'Baixa_do_Dia': info['dayLow'],
-                    'Alta_do_Dia': info['dayHigh'],
-                    'Volume': info['volume'],
-                    'MenorPreco_52S': info['fiftyTwoWeekLow'],
-                    'MaiorPreco_52S': info['fiftyTwoWeekHigh'],
-                    'DivYeard_Valor': info['dividendRate'],
-                    'DivYeard_Percent': info['dividendYield'],
-                    'PercLucro_Div': info['payoutRatio'],
-                    'MediaDiv_5Anos': info['fiveYearAvgDividendYield'],
-                    'Risco_Mercado': info['beta'],
-                    'Divida_Sobre_Patrim': info['debtToEquity'],
-                    'Divida': info['totalDebt'],
-                    'Especialista_Alta': info['targetHighPrice'],
-                    'Especialista_Media': info['targetMedianPrice'],
-                    'Especialista_Baixa': info['targetLowPrice'],
-                    'Especialista_Ideal': info['targetMeanPrice'],
-                })
-                
-                time.sleep(0.5)  # pausa para evitar bloqueios
-
-            df = pd.DataFrame(dados)
-            df.to_csv('dados_b3.csv', index=False, encoding='utf-8', sep=';')
+            diario = DiarioIngestao.das_opcoes('baixar_base_b3', kwargs)
+            codigos = diario.pendentes(acao['codigo'] for acao in empresas)
+            if len(codigos) < len(empresas):
+                self.stdout.write(f'Retomando: {len(empresas) - len(codigos)} ativos já concluídos na execução interrompida.')
 
-        if salvar_no_banco:
-            # Criar setores e segmentos únicos primeiro
-            setores_unicos = set(df['Setor'].dropna().unique())
-            segmentos_unicos = set(df['Segmento'].dropna().unique())
-
-            for nome_setor in setores_unicos:
-                if nome_setor:
-                    Setor.objects.get_or_create(nome=nome_setor)
-
-            for nome_segmento in segmentos_unicos:
-                if nome_segmento:
-                    Segmento.objects.get_or_create(nome=nome_segmento)
-
-            registros = df.to_dict(orient='records')
-
-            import math
-            def nan_to_none(value):
-                if isinstance(value, float) and math.isnan(value):
-                    return None
-                return value
-
-            for registro in registros:
-                setor_obj = None
-                if registro.get('Setor'):
-                    setor_obj = Setor.objects.filter(nome=registro['Setor']).first()
-
-                segmento_obj = None
-                if registro.get('Segmento'):
-                    segmento_obj = Segmento.objects.filter(nome=registro['Segmento']).first()
-
-                Ativo.objects.update_or_create(
-                    codigo=registro['Codigo'],
-                    defaults={
-                        'nome': registro.get('Nome', ''),
-                        'apelido': registro.get('Nick', ''),
-                        'preco_atual': nan_to_none(registro.get('Preco_atual')),
-                        'variacao': nan_to_none(registro.get('Variacao')),
-                        'setor': setor_obj,
-                        'segmento': segmento_obj,
-                        'descricao': registro.get('Sobre', ''),
-                        'funcionarios': nan_to_none(registro.get('Funcionarios')),
-                        'risco_auditoria': registro.get('Risco_Auditoria', ''),
-                        'risco_administrativo': registro.get('Risco_Administrativo', ''),
-                        'risco_executivos': registro.get('Risco_Executivos', ''),
-                        'risco_acionista': registro.get('Risco_Acionista', ''),
-                        'risco_medio': registro.get('Risco_Medio', ''),
-                        'fechamento_anterior': nan_to_none(registro.get('Fechamento_Anterior')),
-                        'baixa_do_dia': nan_to_none(registro.get('Baixa_do_Dia')),
-                        'alta_do_dia': nan_to_none(registro.get('Alta_do_Dia')),
-                        'volume': nan_to_none(registro.get('Volume')),
-                        'menor_preco_52s': nan_to_none(registro.get('MenorPreco_52S')),
-                        'maior_preco_52s': nan_to_none(registro.get('MaiorPreco_52S')),
-                        'dividendo_valor': nan_to_none(registro.get('DivYeard_Valor')),
-                        'dividendo_percentual': nan_to_none(registro.get('DivYeard_Percent')),
-                        'percentual_lucro_dividendo': nan_to_none(registro.get('PercLucro_Div')),
-                        'media_dividendo_5anos': nan_to_none(registro.get('MediaDiv_5Anos')),
-                        'risco_mercado_beta': nan_to_none(registro.get('Risco_Mercado')),
-                        'divida_sobre_patrimonio': nan_to_none(registro.get('Divida_Sobre_Patrim')),
-                        'divida_total': nan_to_none(registro.get('Divida')),
-                        'preco_alvo_alta': nan_to_none(registro.get('Especialista_Alta')),
-                        'preco_alvo_media': nan_to_none(registro.get('Especialista_Media')),
-                        'preco_alvo_baixa': nan_to_none(registro.get('Especialista_Baixa')),
-                        'preco_alvo_ideal': nan_to_none(registro.get('Especialista_Ideal')),
-                    }
-                )
+            self.stdout.write(self.style.NOTICE(
+                f'Coletando dados usando yfinance ({workers} threads, até {taxa:g} requisições/s)...'
+            ))
+            limitador = LimitadorTaxa(taxa)
+            progresso = Progresso(len(codigos))
 
+            def ao_limitar(codigo, pausa):
+                self.stdout.write(self.style.WARNING(f'Limitado pelo Yahoo em {codigo}: pausando {pausa:g}s'))
+
+            # cada ativo vira uma linha no staging assim que chega: nada se acumula em memória e uma
+            # interrupção não perde o que já foi coletado (ao retomar, o arquivo é continuado, não recriado)
+            arquivo = ARQUIVO_STAGING
+            with open(arquivo, 'a' if diario.retomada else 'w', encoding='utf-8') as staging:
+                resultados = coletar_em_paralelo(self._coletar_info, codigos,
+                                                 limitador, workers=workers, ao_limitar=ao_limitar)
+                for codigo, linha, erro in resultados:
+                    etapa = progresso.avancar()
+                    if erro is not None:
+                        diario.falhar(codigo, erro)
+                        self.metricas.contar('codigos_erro')
+                        self.stdout.write(self.style.WARNING(f'{etapa} Erro ao coletar {codigo}: {erro}'))
+                    elif linha is None:
+                        diario.ignorar(codigo, 'sem nome no yfinance')
+                        self.metricas.contar('codigos_ignorados')
+                        self.stdout.write(self.style.WARNING(f'{etapa} Ignorando ativo {codigo} pois não possui nome válido.'))
+                    else:
+                        staging.write(json.dumps(linha, ensure_ascii=False, allow_nan=False) + '\n')
+                        staging.flush()
+                        diario.concluir(codigo, linha)
+                        self.metricas.contar('codigos_ok')
+                        self.stdout.write(f'{etapa} {codigo}')
+            diario.encerrar()
+
+        if salvar_no_banco:
+            self.marcar_dados_alterados()
+            total = 0
+            for bloco in ler_staging(arquivo):
+                with self.metricas.medir('banco'):
+                    total += self.salvar_no_banco(bloco)
+                self.stdout.write(f'{total} ativos gravados...')
+            self.metricas.contar('ativos_gravados', total)
             self.stdout.write(self.style.SUCCESS('Dados salvos no banco de dados com sucesso!'))
         else:
-            self.stdout.write(self.style.SUCCESS('Dados salvos no arquivo CSV com sucesso!'))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS(f'Dados salvos em {arquivo} com sucesso!'))
\ No newline at end of file
@@ -5,8 +5,10 @@ from typing import Any, Dict, Iterable, List, Optional
 
 import requests
 from bs4 import BeautifulSoup
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 
+from ibovespa.ingestao import DiarioIngestao, adicionar_argumentos
+from ibovespa.metricas import ComandoComMetricas
 from ibovespa.models import (FundoImobiliario, Segmento)
 
 
@@ -428,7 +430,7 @@ def upsert_fii_record(ticker: str, attrs: Dict[str, Any]) -> FundoImobiliario:
 ## removido: coleta/persistência de histórico de preços
 
 
-def process_one_fii(ticker: str) -> None:
+def process_one_fii(ticker: str) -> Dict[str, Any]:
     # Preferimos a tabela consolidada para atributos básicos
     try:
         all_rows = fetch_fii_resultado_rows()
@@ -439,7 +441,7 @@ def process_one_fii(ticker: str) -> None:
             fii = upsert_fii_record(ticker, base_attrs)
             preenchidos = sorted([k for k, v in base_attrs.items() if v not in (None, "")])
             print(f"{ticker}: base atualizada via tabela (campos: {', '.join(preenchidos) if preenchidos else 'nenhum'})")
-            return
+            return base_attrs
     except Exception:
         pass
 
@@ -449,9 +451,10 @@ def process_one_fii(ticker: str) -> None:
     fii = upsert_fii_record(ticker, attrs)
     preenchidos = sorted([k for k, v in attrs.items() if v not in (None, "")])
     print(f"{ticker}: base atualizada via detalhes (campos: {', '.join(preenchidos) if preenchidos else 'nenhum'})")
+    return attrs
 
 
-class Command(BaseCommand):
+class Command(ComandoComMetricas):
     help = (
         "Baixa e popula APENAS metadados de FIIs a partir do Fundamentus (sem logs). "
         "Uso: python manage.py baixar_base_fii <CODIGO|ALL>"
@@ -464,6 +467,7 @@ class Command(BaseCommand):
             help="Código do FII (ex.: VTLT11) ou ALL para processar todos",
         )
         # sem delay; não há múltiplas chamadas por FII aqui
+        adicionar_argumentos(parser)
 
     def handle(self, *args, **options) -> None:
         alvo: str = options["alvo"].strip().upper()
@@ -483,26 +487,44 @@ class Command(BaseCommand):
         table_rows: List[Dict[str, Any]] = []
         if alvo in ("ALL", "TUDO"):
             try:
-                table_rows = fetch_fii_resultado_rows()
+                with self.metricas.medir("tabela"):
+                    table_rows = fetch_fii_resultado_rows()
             except Exception as exc:
                 self.stderr.write(self.style.WARNING(f"Falha ao ler tabela base: {exc}. Usando fallback por código."))
 
-        for code in tickers:
+        diario = DiarioIngestao.das_opcoes("baixar_base_fii", options)
+        pendentes = diario.pendentes(tickers)
+        if len(pendentes) < len(tickers):
+            self.stdout.write(f"Retomando: {len(tickers) - len(pendentes)} FIIs já concluídos na execução interrompida.")
+
+        for code in pendentes:
             try:
                 if table_rows:
                     row = next((r for r in table_rows if r.get("codigo") == code), None)
                     if row:
                         base_attrs = {k: v for k, v in row.items() if k != "codigo"}
-                        upsert_fii_record(code, base_attrs)
+                        self.marcar_dados_alterados()
+                        with self.metricas.medir("banco", code):
+                            upsert_fii_record(code, base_attrs)
+                        diario.concluir(code, base_attrs)
+                        self.metricas.contar("codigos_ok")
                         ok += 1
                         self.stdout.write(self.style.SUCCESS(f"{code}: base atualizada (tabela)"))
                         continue
-                process_one_fii(code)
+                # sem a tabela: página de detalhes do FII (HTTP, parse e gravação juntos)
+                self.marcar_dados_alterados()
+                with self.metricas.medir("detalhes", code):
+                    attrs = process_one_fii(code)
+                diario.concluir(code, attrs)
+                self.metricas.contar("codigos_ok")
                 ok += 1
             except Exception as exc:
+                diario.falhar(code, exc)
+                self.metricas.contar("codigos_erro")
                 self.stderr.write(self.style.WARNING(f"Falha em {code}: {exc}"))
                 continue
 
+        diario.encerrar()
         self.stdout.write(self.style.SUCCESS(f"Processados {ok} FIIs de {len(tickers)}"))
 
 
@@ -1,57 +1,82 @@
 import yfinance as yf
-from django.core.management.base import BaseCommand
+from ibovespa.ingestao import DiarioIngestao, adicionar_argumentos, adicionar_argumentos_distribuicao, distribuir, manter_concessao
+from ibovespa.metricas import ComandoComMetricas
 from ibovespa.models import Ativo, HistoricoAtivo
 from django.utils import timezone
 from datetime import datetime
 
-class Command(BaseCommand):
+class Command(ComandoComMetricas):
     help = 'Baixa o histórico de fechamento dos ativos usando yfinance.'
 
     def add_arguments(self, parser):
         parser.add_argument('codigo', type=str, help="Código do ativo (ex: PETR4) ou 'ALL' para todos")
         parser.add_argument('--anos', type=int, default=5, help="Quantidade de anos de histórico a baixar (ex: --anos 10 para 10 anos, padrão 5 anos)")
+        adicionar_argumentos(parser)
+        adicionar_argumentos_distribuicao(parser)
 
     def handle(self, *args, **options):
         codigo = options['codigo']
         anos = options['anos']
         periodo = f'{anos}y'
+        self.diario = DiarioIngestao.das_opcoes('baixar_log_fechamento', options)
         if codigo == 'ALL':
-            ativos = Ativo.objects.all()
-            total = ativos.count()
+            codigos = list(Ativo.objects.values_list('codigo', flat=True))
+            pendentes = self.diario.pendentes(codigos)
+            if len(pendentes) < len(codigos):
+                self.stdout.write(f'Retomando: {len(codigos) - len(pendentes)} ativos já concluídos na execução interrompida.')
+            # --shard/--fila: só a parte deste processo (na fila, o total é o que falta para todos)
+            pendentes = distribuir('baixar_log_fechamento', pendentes, options)
+            total = len(pendentes)
             self.stdout.write(f'Baixando histórico de {total} ativos ({anos} anos)...')
-            for idx, ativo in enumerate(ativos, 1):
-                self.stdout.write(f'[{idx}/{total}] {ativo.codigo}...')
-                self.baixar_e_salvar(ativo.codigo, periodo)
+            for idx, codigo_ativo in enumerate(pendentes, 1):
+                self.stdout.write(f'[{idx}/{total}] {codigo_ativo}...')
+                self.baixar_e_salvar(codigo_ativo, periodo, pendentes)
+            self.diario.encerrar()
             self.stdout.write(self.style.SUCCESS('Processo finalizado!'))
         else:
             self.baixar_e_salvar(codigo + ".SA", periodo)
+            self.diario.encerrar()
             self.stdout.write(self.style.SUCCESS(f'Histórico de {codigo} baixado e salvo!'))
 
-    def baixar_e_salvar(self, codigo_com_sufixo, periodo):
+    def baixar_e_salvar(self, codigo_com_sufixo, periodo, pendentes=()):
         try:
-            ticker = yf.Ticker(codigo_com_sufixo)
-            hist = ticker.history(period=periodo)
+            with self.metricas.medir('http', codigo_com_sufixo):
+                ticker = yf.Ticker(codigo_com_sufixo)
+                hist = ticker.history(period=periodo)
             if hist.empty:
                 self.stdout.write(self.style.WARNING(f'Nenhum dado encontrado para {codigo_com_sufixo}'))
+                self.diario.ignorar(codigo_com_sufixo, 'sem dados')
+                self.metricas.contar('codigos_ignorados')
                 return
             #codigo = codigo_com_sufixo.replace('.SA', '')
-            ativo = Ativo.objects.get(codigo=codigo_com_sufixo)
-            count = 0
-            for data, row in hist.iterrows():
-                data_date = data.date() if hasattr(data, 'date') else datetime.strptime(str(data), '%Y-%m-%d').date()
-                preco_fechamento = row['Close']
-                volume = row['Volume']
-                obj, created = HistoricoAtivo.objects.update_or_create(
-                    ativo=ativo,
-                    data=data_date,
-                    defaults={
-                        'preco_fechamento': preco_fechamento,
-                        'volume': volume
-                    }
-                )
-                count += 1
+            # o download pode ter consumido boa parte do prazo da --fila
+            manter_concessao(pendentes)
+            self.marcar_dados_alterados()
+            with self.metricas.medir('banco', codigo_com_sufixo):
+                ativo = Ativo.objects.get(codigo=codigo_com_sufixo)
+                count = 0
+                for data, row in hist.iterrows():
+                    data_date = data.date() if hasattr(data, 'date') else datetime.strptime(str(data), '%Y-%m-%d').date()
+                    preco_fechamento = row['Close']
+                    volume = row['Volume']
+                    obj, created = HistoricoAtivo.objects.update_or_create(
+                        ativo=ativo,
+                        data=data_date,
+                        defaults={
+                            'preco_fechamento': preco_fechamento,
+                            'volume': volume
+                        }
+                    )
+                    count += 1
+            self.diario.concluir(codigo_com_sufixo, hist)
+            self.metricas.contar('codigos_ok')
+            self.metricas.contar('linhas_gravadas', count)
             self.stdout.write(self.style.SUCCESS(f'{codigo_com_sufixo}: {count} registros atualizados.'))
-        except Ativo.DoesNotExist:
+        except Ativo.DoesNotExist as e:
+            self.diario.falhar(codigo_com_sufixo, e)
+            self.metricas.contar('codigos_erro')
             self.stdout.write(self.style.ERROR(f'Ativo {codigo_com_sufixo} não encontrado no banco.'))
         except Exception as e:
+            self.diario.falhar(codigo_com_sufixo, e)
+            self.metricas.contar('codigos_erro')
             self.stdout.write(self.style.ERROR(f'Erro ao baixar {codigo_com_sufixo}: {e}'))
\ No newline at end of file
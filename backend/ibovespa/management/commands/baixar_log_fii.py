@@ -4,14 +4,28 @@ from datetime import datetime, date
 from decimal import Decimal, InvalidOperation
 from typing import Any, Iterable, List, Optional, Tuple, Union, Dict
 
+import numpy as np
+import pandas as pd
 import requests
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
+from django.db import transaction
 
+from ibovespa.ingestao import DiarioIngestao, adicionar_argumentos, adicionar_argumentos_distribuicao, distribuir, manter_concessao
+from ibovespa.graficos import extrair_series
+from ibovespa.metricas import ComandoComMetricas
 from ibovespa.models import FundoImobiliario, FIIHistoricoPreco, FIIRendimento, FIIDividendYield
 
 
 BASE = "https://www.fundamentus.com.br"
 
+FORMATOS_DATA = ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%Y%m%d")
+# Chaves aceitas nos pontos em formato de dict, em ordem de preferência
+CHAVES_DATA = ("Data", "data", "date", "x")
+CHAVES_PRECO = ("Preco", "preco", "close", "y")
+CHAVES_VOLUME = ("Volume", "volume", "v")
+# Epoch acima disto está em ms (em segundos seria depois de 2286)
+LIMITE_EPOCH_SEGUNDOS = 10_000_000_000
+
 
 def _build_headers(ticker: str) -> dict:
     return {
@@ -68,7 +82,7 @@ def _to_date(value: Union[int, str]) -> date:
     if isinstance(value, str):
         s = value.strip()
         # tenta ISO
-        for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%Y%m%d"):
+        for fmt in FORMATOS_DATA:
             try:
                 return datetime.strptime(s, fmt).date()
             except ValueError:
@@ -77,7 +91,7 @@ def _to_date(value: Union[int, str]) -> date:
         if s.isdigit():
             iv = int(s)
             # detecta se está em segundos ou ms
-            if iv > 10_000_000_000:  # > ~2001 em segundos → provavelmente ms
+            if iv > LIMITE_EPOCH_SEGUNDOS:
                 return datetime.utcfromtimestamp(iv / 1000).date()
             return datetime.utcfromtimestamp(iv).date()
     raise ValueError(f"Formato de data desconhecido: {value!r}")
@@ -98,6 +112,13 @@ def _to_decimal(value: Union[int, float, str]) -> Decimal:
         raise ValueError(f"Não foi possível converter para Decimal: {value!r}") from exc
 
 
+def _to_volume(value: Union[int, float, str]) -> int:
+    # volume é inteiro: no texto o ponto é sempre separador de milhar ("1.000" = 1000)
+    if isinstance(value, str):
+        return int(Decimal(value.strip().replace(" ", "").replace(".", "").replace(",", ".")))
+    return int(value)
+
+
 def _normalize_points(parsed: Any) -> List[Tuple[date, Decimal, Optional[int]]]:
     """Retorna lista de tuplas (data, preco, volume_opcional)."""
     points: List[Tuple[date, Decimal, Optional[int]]] = []
@@ -115,7 +136,7 @@ def _normalize_points(parsed: Any) -> List[Tuple[date, Decimal, Optional[int]]]:
                 vol = item[2] if len(item) >= 3 else None
                 d = _to_date(ts)
                 p = _to_decimal(price)
-                v = int(vol) if vol is not None else None
+                v = _to_volume(vol) if vol is not None else None
                 points.append((d, p, v))
             elif isinstance(item, dict):
                 # tenta chaves comuns
@@ -126,7 +147,7 @@ def _normalize_points(parsed: Any) -> List[Tuple[date, Decimal, Optional[int]]]:
                     continue
                 d = _to_date(ts)
                 p = _to_decimal(price)
-                v = int(vol) if vol is not None else None
+                v = _to_volume(vol) if vol is not None else None
                 points.append((d, p, v))
         except Exception:
             # ignora pontos problemáticos
@@ -134,7 +155,150 @@ def _normalize_points(parsed: Any) -> List[Tuple[date, Decimal, Optional[int]]]:
     return points
 
 
-class Command(BaseCommand):
+def _datas_vetorizadas(coluna: pd.Series) -> pd.Series:
+    """datetime64 da coluna, com o formato detectado uma vez no primeiro valor (NaT onde não converte)."""
+    amostra = coluna.dropna()
+    if amostra.empty:
+        return pd.Series(pd.NaT, index=coluna.index, dtype="datetime64[ns]")
+    primeiro = amostra.iloc[0]
+    if pd.api.types.is_numeric_dtype(coluna) or isinstance(primeiro, (int, np.integer)):
+        # números são epoch em ms, como em _to_date
+        return pd.to_datetime(pd.to_numeric(coluna, errors="coerce"), unit="ms", errors="coerce")
+    if isinstance(primeiro, str):
+        texto = coluna.astype(str).str.strip()
+        for fmt in FORMATOS_DATA:
+            try:
+                datetime.strptime(primeiro.strip(), fmt)
+            except ValueError:
+                continue
+            return pd.to_datetime(texto, format=fmt, errors="coerce")
+        if primeiro.strip().isdigit():
+            epoch = pd.to_numeric(texto, errors="coerce")
+            ms = epoch.where(epoch > LIMITE_EPOCH_SEGUNDOS, epoch * 1000)
+            return pd.to_datetime(ms, unit="ms", errors="coerce")
+    raise ValueError(f"Formato de data desconhecido: {primeiro!r}")
+
+
+def _numeros_vetorizados(coluna: pd.Series, inteiro: bool = False) -> pd.Series:
+    """float64 da coluna, aceitando texto com vírgula decimal e ponto de milhar (NaN onde não converte).
+
+    Com `inteiro` (volume), todo ponto num texto é de milhar, como em _to_volume; sem ele, só quando
+    o texto também tem vírgula, como em _to_decimal.
+    """
+    if pd.api.types.is_numeric_dtype(coluna):
+        return coluna.astype("float64")
+    texto = coluna.astype(str).str.replace(" ", "", regex=False)
+    if inteiro:
+        # só nos textos: um float numa coluna mista vira "1000.0", cujo ponto é decimal
+        milhar = coluna.map(type).eq(str)
+    else:
+        milhar = texto.str.contains(",", regex=False) & texto.str.contains(".", regex=False)
+    texto = texto.where(~milhar, texto.str.replace(".", "", regex=False)).str.replace(",", ".", regex=False)
+    return pd.to_numeric(texto, errors="coerce")
+
+
+def historico_vetorizado(parsed: Any) -> pd.DataFrame:
+    """Colunas data (date), preco e volume (Int64) de um payload do cot_hist, sem laço por ponto.
+
+    O formato dos pontos (lista ou dict, quais chaves, formato da data) é detectado no primeiro e
+    a conversão roda na coluna inteira; pontos que não convertem são descartados. Pontos de
+    formatos misturados levantam ValueError (aí vale o _normalize_points, ponto a ponto).
+    """
+    itens = parsed["data"] if isinstance(parsed, dict) and "data" in parsed else parsed
+    if not isinstance(itens, list) or not itens:
+        return pd.DataFrame({"data": [], "preco": [], "volume": pd.Series([], dtype="Int64")})
+
+    volume = None
+    if isinstance(itens[0], (list, tuple)):
+        if not all(isinstance(item, (list, tuple)) for item in itens):
+            raise ValueError("Pontos do histórico em formatos misturados.")
+        tabela = pd.DataFrame(itens)
+        data, preco = tabela[0], tabela[1]
+        if tabela.shape[1] >= 3:
+            volume = tabela[2]
+    elif isinstance(itens[0], dict):
+        if not all(isinstance(item, dict) for item in itens):
+            raise ValueError("Pontos do histórico em formatos misturados.")
+        tabela = pd.DataFrame.from_records(itens)
+        data = next((tabela[c] for c in CHAVES_DATA if c in tabela.columns), None)
+        preco = next((tabela[c] for c in CHAVES_PRECO if c in tabela.columns), None)
+        volume = next((tabela[c] for c in CHAVES_VOLUME if c in tabela.columns), None)
+        if data is None or preco is None:
+            raise ValueError("Pontos do histórico sem data ou preço.")
+    else:
+        raise ValueError(f"Ponto do histórico em formato desconhecido: {itens[0]!r}")
+
+    df = pd.DataFrame({
+        "data": _datas_vetorizadas(data),
+        "preco": _numeros_vetorizados(preco).round(4),
+        "volume": (np.trunc(_numeros_vetorizados(volume, inteiro=True)) if volume is not None
+                   else pd.Series(np.nan, index=tabela.index)).astype("Int64"),
+    })
+    df = df.dropna(subset=["data", "preco"])
+    df["data"] = df["data"].dt.date
+    return df
+
+
+def _serie(datas: np.ndarray, valores: List[str]) -> pd.Series:
+    """Série de Decimal (do texto da página) indexada por date; na data repetida vale o último valor."""
+    serie = pd.Series([Decimal(v) for v in valores], index=datas.astype(object), dtype=object)
+    return serie[~serie.index.duplicated(keep="last")]
+
+
+def series_graficos(html: str) -> Tuple[pd.Series, pd.Series]:
+    """(rendimentos R$/cota, dividend yield) da página fii_graficos, cada um como `_serie`."""
+    series = extrair_series(html)
+    vazia = _serie(np.array([], dtype="datetime64[D]"), [])
+
+    # Rendimento (R$/cota): dataSerieRendimento + labelsRendimento (epoch em ms)
+    labels, valores = series.get("labelsRendimento"), series.get("dataSerieRendimento")
+    rendimentos = vazia
+    if labels is not None and valores is not None and len(labels.valores) == len(valores.valores):
+        datas = labels.valores.astype("int64").astype("datetime64[ms]").astype("datetime64[D]")
+        rendimentos = _serie(datas, valores.textos)
+
+    # Dividend Yield (% em fração): var dataSerieDividendYield = [ [ts, val], ... ]
+    dy = series.get("dataSerieDividendYield")
+    dys = _serie(dy.datas, dy.textos) if dy is not None and dy.datas is not None else vazia
+    return rendimentos, dys
+
+
+def gravar_serie(modelo, campo: str, fii: FundoImobiliario, serie: pd.Series) -> Tuple[int, int]:
+    """Insere as datas novas e atualiza só os valores que mudaram; devolve (inseridos, atualizados).
+
+    Os valores existentes vêm numa consulta e a comparação é nas casas decimais do campo, as
+    mesmas que o banco guarda.
+    """
+    quantum = Decimal(1).scaleb(-modelo._meta.get_field(campo).decimal_places)
+    existentes = {data: (pk, valor) for pk, data, valor in
+                  modelo.objects.filter(fii=fii).values_list("pk", "data", campo)}
+    novos, alterados = [], []
+    for data, valor in serie.items():
+        valor = valor.quantize(quantum)
+        atual = existentes.get(data)
+        if atual is None:
+            novos.append(modelo(fii=fii, data=data, **{campo: valor}))
+        elif atual[1] != valor:
+            alterados.append(modelo(pk=atual[0], **{campo: valor}))
+    modelo.objects.bulk_create(novos, batch_size=500)
+    modelo.objects.bulk_update(alterados, [campo], batch_size=500)
+    return len(novos), len(alterados)
+
+
+def salvar_historico(fii: FundoImobiliario, pontos: pd.DataFrame) -> int:
+    """Upsert em lote de FIIHistoricoPreco (data, preco, volume); devolve quantas datas são novas."""
+    existentes = set(FIIHistoricoPreco.objects.filter(fii=fii).values_list("data", flat=True))
+    pontos = pontos.astype(object).where(pontos.notna(), None)
+    FIIHistoricoPreco.objects.bulk_create(
+        [FIIHistoricoPreco(fii=fii, data=d, preco_fechamento=p, volume=v)
+         for d, p, v in pontos[["data", "preco", "volume"]].itertuples(index=False)],
+        batch_size=500, update_conflicts=True,
+        unique_fields=["fii", "data"], update_fields=["preco_fechamento", "volume"],
+    )
+    return len(set(pontos["data"]) - existentes)
+
+
+class Command(ComandoComMetricas):
     help = (
         "Baixa logs de FIIs do Fundamentus (histórico de preços, rendimentos R$/cota e Dividend Yield). "
         "Uso: python manage.py baixar_log_fii <CODIGO|ALL> [--delay 0.2]"
@@ -143,6 +307,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser) -> None:
         parser.add_argument("codigo", type=str, help="Código do FII (quatro letras seguidas de 11), ex.: VTLT11, ou ALL")
         parser.add_argument("--delay", type=float, default=0.2, help="Atraso entre requisições em segundos (padrão 0.2)")
+        adicionar_argumentos(parser)
+        adicionar_argumentos_distribuicao(parser)
 
     def handle(self, *args, **options) -> None:
         alvo: str = options["codigo"].upper().strip()
@@ -158,22 +324,37 @@ class Command(BaseCommand):
                 raise CommandError("Código inválido. Utilize o formato de 4 letras + 11, ex.: VTLT11, ou ALL.")
             tickers = [alvo]
 
+        diario = DiarioIngestao.das_opcoes("baixar_log_fii", options)
+        pendentes = diario.pendentes(tickers)
+        if len(pendentes) < len(tickers):
+            self.stdout.write(f"Retomando: {len(tickers) - len(pendentes)} FIIs já concluídos na execução interrompida.")
+        pendentes = distribuir("baixar_log_fii", pendentes, options)
+
         total_ok = 0
-        for codigo in tickers:
+        for codigo in pendentes:
             try:
-                fii, _ = FundoImobiliario.objects.get_or_create(codigo=codigo)
-                ins_h = self._fetch_and_store_historico(fii)
+                fii, criado = FundoImobiliario.objects.get_or_create(codigo=codigo)
+                if criado:
+                    self.marcar_dados_alterados()
+                ins_h, conteudo_h = self._fetch_and_store_historico(fii)
                 if delay_s:
                     self._sleep(delay_s)
-                ins_r, ins_dy = self._fetch_and_store_graficos(fii)
+                # renova a concessão da --fila antes da segunda etapa
+                manter_concessao(pendentes)
+                ins_r, ins_dy, conteudo_g = self._fetch_and_store_graficos(fii)
+                diario.concluir(codigo, conteudo_h, conteudo_g)
+                self.metricas.contar("codigos_ok")
                 total_ok += 1
                 self.stdout.write(self.style.SUCCESS(f"{codigo}: historico+{ins_h}; rend+{ins_r}; dy+{ins_dy}"))
                 if delay_s:
                     self._sleep(delay_s)
             except Exception as exc:
+                diario.falhar(codigo, exc)
+                self.metricas.contar("codigos_erro")
                 self.stderr.write(self.style.WARNING(f"Falha em {codigo}: {exc}"))
                 continue
 
+        diario.encerrar()
         self.stdout.write(self.style.SUCCESS(f"Processados {total_ok} FIIs de {len(tickers)}"))
 
     # utilitários
@@ -193,71 +374,47 @@ class Command(BaseCommand):
         candidates = set(re.findall(r"[A-Z]{4}11", text))
         return sorted(candidates)
 
-    def _fetch_and_store_historico(self, fii: FundoImobiliario) -> int:
+    def _fetch_and_store_historico(self, fii: FundoImobiliario) -> Tuple[int, str]:
         url = f"{BASE}/amline/cot_hist.php?papel={fii.codigo}"
         headers = _build_headers(fii.codigo)
 
-        resp = requests.get(url, headers=headers, timeout=30)
-        resp.raise_for_status()
-        resp.encoding = resp.apparent_encoding or resp.encoding
-        raw = resp.text
-        parsed = _parse_js_or_json(raw)
-        pontos = _normalize_points(parsed)
-        inseridos = 0
-        for d, preco, volume in pontos:
-            _, created = FIIHistoricoPreco.objects.update_or_create(
-                fii=fii,
-                data=d,
-                defaults={"preco_fechamento": preco, "volume": volume},
-            )
-            if created:
-                inseridos += 1
-        return inseridos
-
-    def _fetch_and_store_graficos(self, fii: FundoImobiliario) -> Tuple[int, int]:
+        with self.metricas.medir("http", fii.codigo):
+            resp = requests.get(url, headers=headers, timeout=30)
+            resp.raise_for_status()
+            resp.encoding = resp.apparent_encoding or resp.encoding
+            raw = resp.text
+        with self.metricas.medir("parse", fii.codigo):
+            parsed = _parse_js_or_json(raw)
+            try:
+                pontos = historico_vetorizado(parsed)
+            except (ValueError, TypeError, KeyError):
+                pontos = pd.DataFrame(_normalize_points(parsed), columns=["data", "preco", "volume"])
+            # a mesma data duas vezes no payload: vale a última (e o upsert não aceita repetição)
+            pontos = pontos.drop_duplicates("data", keep="last")
+        self.marcar_dados_alterados()
+        with self.metricas.medir("banco", fii.codigo):
+            inseridos = salvar_historico(fii, pontos)
+        self.metricas.contar("historico_inseridos", inseridos)
+        return inseridos, raw
+
+    def _fetch_and_store_graficos(self, fii: FundoImobiliario) -> Tuple[int, int, str]:
         url = f"{BASE}/fii_graficos.php?papel={fii.codigo}&tipo=1"
-        resp = requests.get(url, headers=_build_html_headers(referer=f"{BASE}/"), timeout=30)
-        resp.raise_for_status()
-        html = resp.text
-
-        # Rendimento (R$/cota): dataSerieRendimento + labelsRendimento
-        labels = [int(x) for x in re.findall(r"labelsRendimento\.push\((\d+)\)\s*;", html)]
-        valores = re.findall(r"dataSerieRendimento\.push\(([-]?\d+(?:\.\d+)?)\)\s*;", html)
-        rend_pairs: List[Tuple[date, Decimal]] = []
-        if labels and valores and len(labels) == len(valores):
-            for ts_ms, v in zip(labels, valores):
-                dt = datetime.utcfromtimestamp(int(ts_ms) / 1000).date()
-                rend_pairs.append((dt, Decimal(v)))
-
-        # Dividend Yield (% em fração): var dataSerieDividendYield = [ [ts, val], ... ]
-        m_dy = re.search(r"var\s+dataSerieDividendYield\s*=\s*\[(.*?)\];", html, re.DOTALL | re.IGNORECASE)
-        dy_pairs: List[Tuple[date, Decimal]] = []
-        if m_dy:
-            for ts_ms_str, val_str in re.findall(r"\[\s*(\d+)\s*,\s*([-]?\d+(?:\.\d+)?)\s*\]", m_dy.group(1)):
-                dt = datetime.utcfromtimestamp(int(ts_ms_str) / 1000).date()
-                dy_pairs.append((dt, Decimal(val_str)))
-
-        # Persistência
-        ins_r = 0
-        for dt, val in rend_pairs:
-            _, created = FIIRendimento.objects.update_or_create(
-                fii=fii,
-                data=dt,
-                defaults={"valor_rendimento": val},
-            )
-            if created:
-                ins_r += 1
-
-        ins_dy = 0
-        for dt, val in dy_pairs:
-            _, created = FIIDividendYield.objects.update_or_create(
-                fii=fii,
-                data=dt,
-                defaults={"dy": val},
-            )
-            if created:
-                ins_dy += 1
-
-        return ins_r, ins_dy
+        with self.metricas.medir("http", fii.codigo):
+            resp = requests.get(url, headers=_build_html_headers(referer=f"{BASE}/"), timeout=30)
+            resp.raise_for_status()
+            html = resp.text
+        with self.metricas.medir("parse", fii.codigo):
+            rendimentos, dys = series_graficos(html)
+
+        # uma transação por FII; só entram as datas novas e os valores que mudaram
+        self.marcar_dados_alterados()
+        with self.metricas.medir("banco", fii.codigo), transaction.atomic():
+            ins_r, alt_r = gravar_serie(FIIRendimento, "valor_rendimento", fii, rendimentos)
+            ins_dy, alt_dy = gravar_serie(FIIDividendYield, "dy", fii, dys)
+        self.metricas.contar("rendimentos_inseridos", ins_r)
+        self.metricas.contar("rendimentos_alterados", alt_r)
+        self.metricas.contar("dy_inseridos", ins_dy)
+        self.metricas.contar("dy_alterados", alt_dy)
+        return ins_r, ins_dy, html
 
 
@@ -0,0 +1,326 @@
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ibovespa import views
+from ibovespa.graficos import extrair_series
+from ibovespa.management.commands.baixar_log_fii import (
+    _normalize_points, historico_vetorizado, salvar_historico, series_graficos,
+)
+from ibovespa.models import Ativo, FIIHistoricoPreco, FundoImobiliario
+
+from ibovespa.montecarlo import simular_carteira
+from ibovespa.otimizacao import fronteira_eficiente
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks de desempenho do app ibovespa. montecarlo, fronteira e cot_hist usam dados sintéticos; "
+        "serializacao e asgi usam os dados do banco; graficos usa a página salva em fundamentus_debug.html. "
+        "Uso: python manage.py benchmark <montecarlo|fronteira|serializacao|asgi|cot_hist|graficos> [--repeticoes 3]"
+    )
+
+    ALVOS = ('montecarlo', 'fronteira', 'serializacao', 'asgi', 'cot_hist', 'graficos')
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("alvo", choices=self.ALVOS, help="Benchmark a executar")
+        parser.add_argument("--repeticoes", type=int, default=3, help="Repetições de cada medição (usa a melhor)")
+        parser.add_argument("--caminhos", type=int, default=100_000, help="montecarlo: caminhos simulados")
+        parser.add_argument("--horizonte", type=int, default=252, help="montecarlo: horizonte em dias úteis")
+        parser.add_argument("--ativos", type=int, default=20, help="ativos na carteira")
+        parser.add_argument("--requisicoes", type=int, default=20, help="serializacao: requisições por medição")
+        parser.add_argument("--clientes", type=int, default=100, help="asgi: clientes simultâneos")
+        parser.add_argument("--por-cliente", type=int, default=3, help="asgi: requisições de cada cliente")
+
+    def handle(self, *args, **options) -> None:
+        getattr(self, f"bench_{options['alvo']}")(options)
+
+    def _melhor_tempo(self, func, repeticoes: int) -> float:
+        melhor = float("inf")
+        for _ in range(max(1, repeticoes)):
+            inicio = time.perf_counter()
+            func()
+            melhor = min(melhor, time.perf_counter() - inicio)
+        return melhor
+
+    def bench_montecarlo(self, options) -> None:
+        rng = np.random.default_rng(0)
+        n_ativos = options["ativos"]
+        retornos = rng.normal(0.0004, 0.015, size=(252 * 10, n_ativos))
+        pesos = np.full(n_ativos, 1.0 / n_ativos)
+        caminhos, horizonte = options["caminhos"], options["horizonte"]
+        nucleos = os.cpu_count() or 1
+
+        self.stdout.write(f"Monte Carlo: {caminhos} caminhos x {horizonte} dias, {n_ativos} ativos, {nucleos} núcleos")
+        for processos in sorted({1, nucleos}):
+            # aquece o pool para não medir a criação dos processos
+            simular_carteira(retornos, pesos, horizonte, 1000, semente=1, processos=processos)
+            for metodo in ("bootstrap", "normal"):
+                tempo = self._melhor_tempo(
+                    lambda: simular_carteira(retornos, pesos, horizonte, caminhos, metodo=metodo,
+                                             semente=1, processos=processos),
+                    options["repeticoes"],
+                )
+                por_segundo = caminhos / tempo
+                self.stdout.write(
+                    f"  {metodo:<9} processos={processos:<3} {tempo * 1000:9.1f} ms  "
+                    f"{por_segundo:12,.0f} caminhos/s  {por_segundo / processos:12,.0f} caminhos/s/núcleo"
+                )
+
+    def bench_fronteira(self, options) -> None:
+        rng = np.random.default_rng(0)
+        n_ativos = options["ativos"]
+        diarios = rng.normal(0.0004, 0.015, size=(252 * 5, n_ativos)) + rng.normal(0, 0.01, size=(252 * 5, 1))
+        mu = diarios.mean(axis=0) * 252
+        cov = np.cov(diarios, rowvar=False) * 252
+        grupos = [f"Setor{i % 10}" for i in range(n_ativos)]
+        cenarios = {
+            "long-only": dict(peso_max=1.0),
+            "tetos de setor": dict(peso_max=0.1, limites={g: 0.15 for g in set(grupos)}),
+            "long/short": dict(peso_min=-0.1, peso_max=0.2),
+        }
+        self.stdout.write(f"Fronteira eficiente: {n_ativos} ativos, 20 pontos + máximo Sharpe")
+        for nome, kwargs in cenarios.items():
+            tempo = self._melhor_tempo(lambda: fronteira_eficiente(mu, cov, grupos, pontos=20, **kwargs),
+                                       options["repeticoes"])
+            self.stdout.write(f"  {nome:<15} {tempo * 1000:9.1f} ms")
+
+    def bench_serializacao(self, options) -> None:
+        usuario = get_user_model().objects.first()
+        ativo = Ativo.objects.filter(historicos__isnull=False).values_list('codigo', flat=True).first()
+        fii = FundoImobiliario.objects.filter(historicos_preco__isnull=False).values_list('codigo', flat=True).first()
+        if usuario is None or ativo is None:
+            raise CommandError("É preciso ao menos um usuário e um ativo com histórico no banco.")
+        casos = [
+            ("ativos/", views.AtivoListAPIView, {}),
+            ("ativos/<codigo>/historico/", views.HistoricoAtivoListAPIView, {"codigo": ativo}),
+            ("fiis/", views.FIIListAPIView, {}),
+            ("fiis/ranking/", views.FIIRankingListAPIView, {}),
+        ]
+        if fii:
+            casos.append(("fiis/<codigo>/historico/", views.FIIHistoricoPrecoListAPIView, {"codigo": fii}))
+
+        fabrica = APIRequestFactory()
+        n = options["requisicoes"]
+        self.stdout.write(f"Serialização das listagens: {n} requisições por medição (req/s DRF -> caminho rápido)")
+        for nome, classe, kwargs in casos:
+            taxas = []
+            for rapida in (False, True):
+                view = classe.as_view(renderizacao_rapida=rapida)
+
+                def rodar():
+                    for _ in range(n):
+                        requisicao = fabrica.get("/")
+                        force_authenticate(requisicao, user=usuario)
+                        resposta = view(requisicao, **kwargs)
+                        if hasattr(resposta, "render"):  # Response do DRF; o caminho rápido já devolve bytes
+                            resposta.render()
+
+                rodar()
+                taxas.append(n / self._melhor_tempo(rodar, options["repeticoes"]))
+            self.stdout.write(f"  {nome:<28} {taxas[0]:9.1f} -> {taxas[1]:9.1f} req/s  ({taxas[1] / taxas[0]:.1f}x)")
+
+    def _rodar_wsgi(self, handler, caminho: str, cabecalhos: dict, clientes: int, por_cliente: int) -> list:
+        fabrica = RequestFactory()
+
+        def cliente():
+            latencias = []
+            for _ in range(por_cliente):
+                environ = fabrica.get(caminho, **cabecalhos).environ
+                inicio = time.perf_counter()
+                corpo = handler(environ, lambda status, headers, exc_info=None: None)
+                b"".join(corpo)
+                corpo.close()
+                latencias.append(time.perf_counter() - inicio)
+            return latencias
+
+        with ThreadPoolExecutor(max_workers=clientes) as executor:
+            return [t for lista in executor.map(lambda _: cliente(), range(clientes)) for t in lista]
+
+    def _rodar_asgi(self, handler, caminho: str, cabecalhos: dict, clientes: int, por_cliente: int) -> list:
+        path, _, query = caminho.partition("?")
+        headers = [(b"host", b"testserver")] + [
+            (nome[5:].replace("_", "-").lower().encode(), valor.encode()) for nome, valor in cabecalhos.items()
+        ]
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "root_path": "", "query_string": query.encode(), "headers": headers,
+            "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+        }
+
+        async def requisicao():
+            terminou = asyncio.Event()
+            corpo_lido = False
+
+            async def receive():
+                nonlocal corpo_lido
+                if not corpo_lido:
+                    corpo_lido = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # só "desconecta" depois da resposta, senão o handler cancela a view
+                await terminou.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(mensagem):
+                if mensagem["type"] == "http.response.body" and not mensagem.get("more_body"):
+                    terminou.set()
+
+            inicio = time.perf_counter()
+            await handler(dict(scope), receive, send)
+            return time.perf_counter() - inicio
+
+        async def cliente():
+            return [await requisicao() for _ in range(por_cliente)]
+
+        async def todos():
+            return await asyncio.gather(*(cliente() for _ in range(clientes)))
+
+        return [t for lista in asyncio.run(todos()) for t in lista]
+
+    def bench_asgi(self, options) -> None:
+        token = Token.objects.select_related("user").filter(user__is_active=True).first()
+        ativo = Ativo.objects.filter(historicos__isnull=False).values_list("codigo", flat=True).first()
+        fii = FundoImobiliario.objects.filter(historicos_preco__isnull=False).values_list("codigo", flat=True).first()
+        if token is None or ativo is None:
+            raise CommandError("É preciso ao menos um token de usuário ativo e um ativo com histórico no banco.")
+        inicio = (date.today() - timedelta(days=365)).isoformat()
+        casos = [
+            "ativos/",
+            f"ativos/{ativo}/?fields=codigo,nome,preco_atual",
+            f"ativos/{ativo}/historico/?data_inicio={inicio}",
+        ]
+        if fii:
+            casos.append(f"fiis/{fii}/painel/")
+
+        cabecalhos = {"HTTP_AUTHORIZATION": f"Token {token.key}", "HTTP_ACCEPT": "application/json"}
+        clientes, por_cliente = options["clientes"], options["por_cliente"]
+        total = clientes * por_cliente
+        modos = [
+            ("WSGI  + views DRF", self._rodar_wsgi, WSGIHandler(), ""),
+            ("ASGI  + views DRF", self._rodar_asgi, ASGIHandler(), ""),
+            ("ASGI  + views async", self._rodar_asgi, ASGIHandler(), "async/"),
+        ]
+        self.stdout.write(f"WSGI x ASGI: {clientes} clientes simultâneos x {por_cliente} requisições")
+        for caso in casos:
+            self.stdout.write(f"  {caso}")
+            for nome, rodar, handler, prefixo in modos:
+                caminho = f"/api/ibovespa/{prefixo}{caso}"
+                latencias = []
+
+                def medir():
+                    latencias[:] = rodar(handler, caminho, cabecalhos, clientes, por_cliente)
+
+                rodar(handler, caminho, cabecalhos, 1, 1)
+                tempo = self._melhor_tempo(medir, options["repeticoes"])
+                p50, p95 = np.percentile(latencias, [50, 95]) * 1000
+                self.stdout.write(
+                    f"    {nome:<20} {total / tempo:9.1f} req/s  p50 {p50:8.1f} ms  p95 {p95:8.1f} ms"
+                )
+
+    def bench_cot_hist(self, options) -> None:
+        rng = np.random.default_rng(0)
+        dias = pd.bdate_range(end=date.today(), periods=252 * 10)
+        precos = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dias)))), 2)
+        volumes = rng.integers(1_000, 1_000_000, len(dias))
+        epoch_ms = dias.asi8 // 1_000_000
+        payloads = {
+            "[ms, preço, volume]": [[int(t), float(p), int(v)] for t, p, v in zip(epoch_ms, precos, volumes)],
+            "{Data: dd/mm/aaaa}": [
+                {"Data": d.strftime("%d/%m/%Y"), "Preco": f"{p:.2f}".replace(".", ","), "Volume": str(v)}
+                for d, p, v in zip(dias, precos, volumes)
+            ],
+        }
+        repeticoes = options["repeticoes"]
+        self.stdout.write(f"cot_hist de 10 anos ({len(dias)} pontos): ponto a ponto -> vetorizado")
+        for nome, payload in payloads.items():
+            antes = self._melhor_tempo(lambda: _normalize_points(payload), repeticoes)
+            depois = self._melhor_tempo(lambda: historico_vetorizado(payload), repeticoes)
+            self.stdout.write(f"  parse {nome:<22} {antes * 1000:9.1f} ms -> {depois * 1000:7.1f} ms  ({antes / depois:.0f}x)")
+
+        # regravação da série inteira, o caso diário; tudo numa transação desfeita no fim
+        pontos = historico_vetorizado(payloads["[ms, preço, volume]"])
+        with transaction.atomic():
+            fii = FundoImobiliario.objects.create(codigo="BNCH11", nome="Benchmark")
+            salvar_historico(fii, pontos)
+
+            def por_linha():
+                for d, p, v in pontos.itertuples(index=False):
+                    FIIHistoricoPreco.objects.update_or_create(
+                        fii=fii, data=d, defaults={"preco_fechamento": p, "volume": int(v)},
+                    )
+
+            antes = self._melhor_tempo(por_linha, 1)
+            depois = self._melhor_tempo(lambda: salvar_historico(fii, pontos), repeticoes)
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f"  gravação update_or_create -> upsert    {antes * 1000:9.1f} ms -> {depois * 1000:7.1f} ms  ({antes / depois:.0f}x)"
+        )
+
+    def bench_graficos(self, options) -> None:
+        caminho = os.path.join(os.path.dirname(__file__), "fundamentus_debug.html")
+        if not os.path.exists(caminho):
+            raise CommandError(f"Fixture não encontrada: {caminho}")
+        with open(caminho, encoding="utf-8") as arquivo:
+            pagina = arquivo.read()
+        # a mesma página com 10 anos de pares Date.UTC (formato do Highcharts, vírgula decimal)
+        dias = pd.bdate_range(end=date.today(), periods=252 * 10)
+        pares = ",".join(
+            f"[Date.UTC({d.year}, {d.month - 1}, {d.day}), {v:.2f}]".replace(".", ",", 1).replace("Date,UTC", "Date.UTC")
+            for d, v in zip(dias, np.random.default_rng(0).uniform(0.5, 1.5, len(dias)))
+        )
+        com_date_utc = pagina.replace("</body>", f"<script>chart.addSeries({{data: [{pares}]}});</script></body>")
+
+        repeticoes = max(options["repeticoes"], 20)
+        rendimentos, dys = series_graficos(pagina)
+        self.stdout.write(
+            f"fii_graficos ({len(pagina) // 1024} KiB, {len(rendimentos)} rendimentos, {len(dys)} DY): "
+            f"regex por série + ponto a ponto -> varredura única"
+        )
+        medicoes = (
+            ("series_graficos", pagina, _series_graficos_por_regex, series_graficos),
+            (f"Date.UTC ({len(dias)} pares)", com_date_utc, _date_utc_por_regex, extrair_series),
+        )
+        for nome, html, antes_f, depois_f in medicoes:
+            antes = self._melhor_tempo(lambda: antes_f(html), repeticoes)
+            depois = self._melhor_tempo(lambda: depois_f(html), repeticoes)
+            self.stdout.write(f"  {nome:<24} {antes * 1000:8.2f} ms -> {depois * 1000:6.2f} ms  ({antes / depois:.1f}x)")
+
+
+def _series_graficos_por_regex(html: str):
+    """Parse anterior do baixar_log_fii: uma busca por série e conversão ponto a ponto."""
+    labels = re.findall(r"labelsRendimento\.push\((\d+)\)\s*;", html)
+    valores = re.findall(r"dataSerieRendimento\.push\(([-]?\d+(?:\.\d+)?)\)\s*;", html)
+    rendimentos = pd.Series([Decimal(v) for v in valores],
+                            index=pd.to_datetime(np.array(labels, dtype="int64"), unit="ms").date, dtype=object)
+    m_dy = re.search(r"var\s+dataSerieDividendYield\s*=\s*\[(.*?)\];", html, re.DOTALL | re.IGNORECASE)
+    pares = re.findall(r"\[\s*(\d+)\s*,\s*([-]?\d+(?:\.\d+)?)\s*\]", m_dy.group(1)) if m_dy else []
+    dys = pd.Series([Decimal(v) for _, v in pares],
+                    index=pd.to_datetime(np.array([t for t, _ in pares], dtype="int64"), unit="ms").date, dtype=object)
+    return rendimentos[~rendimentos.index.duplicated(keep="last")], dys[~dys.index.duplicated(keep="last")]
+
+
+def _date_utc_por_regex(html: str):
+    """Parse anterior do baixa_dados_fii: findall dos pares Date.UTC e date()/float() por ponto."""
+    dados = []
+    padrao = r"Date\.UTC\(\s*(\d{4})\s*,\s*(\d{1,2})\s*,\s*(\d{1,2})\s*\)\s*,\s*([-?\d.,]+)"
+    for y, m, d, v in re.findall(padrao, html, re.IGNORECASE):
+        v = v.strip()
+        if "," in v:
+            v = v.replace(".", "").replace(",", ".")
+        dados.append((date(int(y), int(m) + 1, int(d)).isoformat(), float(v)))
+    return dados
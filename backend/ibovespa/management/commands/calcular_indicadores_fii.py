@@ -0,0 +1,35 @@
+import time
+
+from ibovespa.indicadores import atualizar_indicadores
+from ibovespa.metricas import ComandoComMetricas
+
+
+class Command(ComandoComMetricas):
+    help = (
+        "Recalcula os indicadores mensais de FIIs (DY 12m, yield on cost, crescimento do rendimento) "
+        "a partir de FIIRendimento x FIIHistoricoPreco. Apenas FIIs com séries alteradas são recalculados. "
+        "Uso: python manage.py calcular_indicadores_fii [--todos]"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--todos",
+            action="store_true",
+            help="Recalcula todos os FIIs, mesmo os que não tiveram alteração nas séries de origem.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        inicio = time.perf_counter()
+        with self.metricas.medir("calculo"):
+            n_fiis, n_linhas = atualizar_indicadores(forcar=options["todos"])
+        duracao = time.perf_counter() - inicio
+        self.metricas.contar("fiis_recalculados", n_fiis)
+        if n_fiis:
+            self.marcar_dados_alterados()
+        self.metricas.contar("linhas_gravadas", n_linhas)
+        if not n_fiis:
+            self.stdout.write(self.style.NOTICE("Nenhum FII com séries alteradas; indicadores já estão atualizados."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Indicadores recalculados para {n_fiis} FIIs ({n_linhas} linhas) em {duracao:.2f}s"
+        ))
@@ -0,0 +1,134 @@
+import signal
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import yfinance as yf
+from django.utils import timezone
+
+from ibovespa.cache import registrar_alteracao
+from ibovespa.metricas import ComandoComMetricas
+from ibovespa.models import Ativo
+
+CAMPOS = ('preco_atual', 'variacao', 'baixa_do_dia', 'alta_do_dia', 'volume')
+# Os que indicam que o preço se moveu; volume e variação só vão junto
+INDICES_PRECO = tuple(CAMPOS.index(c) for c in ('preco_atual', 'baixa_do_dia', 'alta_do_dia'))
+QUATRO_CASAS = Decimal('0.0001')
+
+Cotacao = Tuple[Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[int]]
+
+
+def _decimal(valor) -> Optional[Decimal]:
+    if valor is None or pd.isna(valor):
+        return None
+    return Decimal(str(float(valor))).quantize(QUATRO_CASAS)
+
+
+def cotacoes_do_download(df: pd.DataFrame, fechamentos: Dict[str, Optional[Decimal]]) -> Dict[str, Cotacao]:
+    """Cotação do dia por código a partir das barras intraday de um yf.download(group_by='ticker')."""
+    if df is None or df.empty:
+        return {}
+    if not isinstance(df.columns, pd.MultiIndex):
+        df = pd.concat({next(iter(fechamentos)): df}, axis=1)
+    fechamento = df.xs('Close', axis=1, level=1).ffill().iloc[-1]
+    baixa = df.xs('Low', axis=1, level=1).min()
+    alta = df.xs('High', axis=1, level=1).max()
+    volume = df.xs('Volume', axis=1, level=1).sum(min_count=1)
+
+    cotacoes = {}
+    for codigo in fechamento.index:
+        preco = _decimal(fechamento[codigo])
+        if preco is None:
+            continue
+        anterior = fechamentos.get(codigo)
+        variacao = ((preco / anterior - 1) * 100).quantize(QUATRO_CASAS) if anterior else None
+        vol = volume.get(codigo)
+        cotacoes[codigo] = (preco, variacao, _decimal(baixa.get(codigo)), _decimal(alta.get(codigo)),
+                            None if vol is None or pd.isna(vol) else int(vol))
+    return cotacoes
+
+
+class Command(ComandoComMetricas):
+    help = (
+        'Atualiza continuamente preço, variação, mínima, máxima e volume do dia das ações, com '
+        'downloads em lote do yfinance. Só grava (num único bulk_update por ciclo) os códigos cujo preço mudou.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=60, help='Segundos entre os ciclos (padrão 60)')
+        parser.add_argument('--lote', type=int, default=100, help='Códigos por requisição ao yfinance (padrão 100)')
+        parser.add_argument('--codigos', type=str, default='', help='Restringe aos códigos informados (ex: PETR4.SA,VALE3.SA)')
+        parser.add_argument('--uma-vez', action='store_true', help='Executa um único ciclo e sai')
+
+    def handle(self, *args, **options):
+        self.parar = False
+        signal.signal(signal.SIGTERM, self._sinal)
+        signal.signal(signal.SIGINT, self._sinal)
+
+        ativos = Ativo.objects.order_by('codigo')
+        if options['codigos']:
+            ativos = ativos.filter(codigo__in=[c.strip().upper() for c in options['codigos'].split(',') if c.strip()])
+        # última cotação gravada de cada código: a base da comparação em memória
+        self.ultimas: Dict[str, Cotacao] = {}
+        self.ids: Dict[str, int] = {}
+        self.fechamentos: Dict[str, Optional[Decimal]] = {}
+        for id_, codigo, fechamento, *cotacao in ativos.values_list('id', 'codigo', 'fechamento_anterior', *CAMPOS):
+            self.ids[codigo] = id_
+            self.fechamentos[codigo] = fechamento
+            self.ultimas[codigo] = tuple(cotacao)
+        if not self.ids:
+            self.stdout.write(self.style.ERROR('Nenhum ativo no banco. Rode baixar_base_b3 antes.'))
+            return
+
+        self.stdout.write(self.style.NOTICE(
+            f'Acompanhando {len(self.ids)} ativos a cada {options["intervalo"]:g}s, lotes de {options["lote"]}.'
+        ))
+        while not self.parar:
+            inicio = time.monotonic()
+            try:
+                self.ciclo(options['lote'])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Erro no ciclo: {e}'))
+            if options['uma_vez']:
+                break
+            # dorme em passos curtos para atender ao SIGTERM rapidamente
+            while not self.parar and time.monotonic() - inicio < options['intervalo']:
+                time.sleep(min(1.0, options['intervalo']))
+        self.stdout.write(self.style.SUCCESS('Encerrado.'))
+
+    def _sinal(self, signum, frame):
+        self.parar = True
+
+    def ciclo(self, lote: int) -> int:
+        codigos = list(self.ids)
+        cotacoes: Dict[str, Cotacao] = {}
+        for i in range(0, len(codigos), lote):
+            parte = codigos[i:i + lote]
+            with self.metricas.medir('http'):
+                df = yf.download(parte, period='1d', interval='1m', group_by='ticker', auto_adjust=False,
+                                 threads=True, progress=False)
+            with self.metricas.medir('parse'):
+                cotacoes.update(cotacoes_do_download(df, {c: self.fechamentos[c] for c in parte}))
+
+        agora = timezone.now()
+        alterados: List[Ativo] = []
+        for codigo, cotacao in cotacoes.items():
+            anterior = self.ultimas.get(codigo)
+            if anterior is not None and all(cotacao[i] == anterior[i] for i in INDICES_PRECO):
+                continue
+            # bulk_update não aplica auto_now: a data vai explícita (é o que o SSE e o cache observam)
+            alterados.append(Ativo(id=self.ids[codigo], data_atualizacao=agora, **dict(zip(CAMPOS, cotacao))))
+            self.ultimas[codigo] = cotacao
+
+        if alterados:
+            with self.metricas.medir('banco'):
+                Ativo.objects.bulk_update(alterados, CAMPOS + ('data_atualizacao',), batch_size=500)
+            # versão no banco: invalida o cache dos processos web, não só o deste daemon
+            registrar_alteracao()
+        self.metricas.contar('ciclos')
+        self.metricas.contar('cotacoes_gravadas', len(alterados))
+        self.stdout.write(
+            f'{timezone.localtime(agora):%H:%M:%S} {len(cotacoes)}/{len(codigos)} cotações, {len(alterados)} gravadas.'
+        )
+        return len(alterados)
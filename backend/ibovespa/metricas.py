@@ -0,0 +1,182 @@
+"""
+Métricas dos comandos de ingestão: tempo por etapa (HTTP, parse, banco...) e por código, e contadores.
+
+Os comandos herdam de `ComandoComMetricas` e marcam os trechos com `self.metricas.medir('http',
+codigo)` e `self.metricas.contar('linhas_gravadas', n)`. No fim de cada execução, com sucesso ou
+não, o resumo vira uma linha em ExecucaoIngestao (admin e api/ibovespa/ingestao/execucoes/) e, com
+--metricas ARQUIVO, é gravado também em JSON ou, se o arquivo terminar em .prom, no formato texto
+do Prometheus (para o textfile collector do node_exporter).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from .cache import registrar_alteracao
+from .models import ExecucaoIngestao
+
+# Códigos mais lentos guardados no resumo do banco (o --metricas em JSON leva todos)
+MAIS_LENTOS = 10
+
+
+class Metricas:
+    def __init__(self, comando: str):
+        self.comando = comando
+        self.inicio = timezone.now()
+        self._relogio = time.perf_counter()
+        # etapa -> [segundos, chamadas, maior]
+        self.etapas: Dict[str, list] = {}
+        self.contadores: Dict[str, int] = {}
+        self.por_codigo: Dict[str, float] = {}
+        # os comandos com threads (baixar_base_b3, atualizar_tudo) medem de várias threads
+        self._trava = threading.Lock()
+
+    @contextmanager
+    def medir(self, etapa: str, codigo: Optional[str] = None):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio, codigo)
+
+    def registrar(self, etapa: str, segundos: float, codigo: Optional[str] = None) -> None:
+        with self._trava:
+            acumulado = self.etapas.setdefault(etapa, [0.0, 0, 0.0])
+            acumulado[0] += segundos
+            acumulado[1] += 1
+            acumulado[2] = max(acumulado[2], segundos)
+            if codigo is not None:
+                self.por_codigo[codigo] = self.por_codigo.get(codigo, 0.0) + segundos
+
+    def contar(self, nome: str, quantidade: int = 1) -> None:
+        with self._trava:
+            self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def duracao(self) -> float:
+        return time.perf_counter() - self._relogio
+
+    def resumo(self, todos_os_codigos: bool = False) -> dict:
+        with self._trava:
+            duracao = self.duracao()
+            lentos = sorted(self.por_codigo.items(), key=lambda item: item[1], reverse=True)
+            return {
+                'comando': self.comando,
+                'inicio': self.inicio.isoformat(),
+                'duracao_segundos': round(duracao, 3),
+                'codigos': len(self.por_codigo),
+                'codigos_por_segundo': round(len(self.por_codigo) / duracao, 3) if duracao else None,
+                'etapas': {
+                    etapa: {'segundos': round(s, 3), 'chamadas': n, 'maior_segundos': round(maior, 3)}
+                    for etapa, (s, n, maior) in sorted(self.etapas.items())
+                },
+                'contadores': dict(sorted(self.contadores.items())),
+                'mais_lentos': [[codigo, round(s, 3)] for codigo, s in
+                                (lentos if todos_os_codigos else lentos[:MAIS_LENTOS])],
+            }
+
+    def prometheus(self, status: str) -> str:
+        resumo = self.resumo()
+        rotulo = f'comando="{self.comando}"'
+        linhas = [
+            '# TYPE ibovespa_ingestao_duracao_segundos gauge',
+            f'ibovespa_ingestao_duracao_segundos{{{rotulo}}} {resumo["duracao_segundos"]}',
+            '# TYPE ibovespa_ingestao_sucesso gauge',
+            f'ibovespa_ingestao_sucesso{{{rotulo}}} {int(status == "ok")}',
+            '# TYPE ibovespa_ingestao_fim_timestamp_segundos gauge',
+            f'ibovespa_ingestao_fim_timestamp_segundos{{{rotulo}}} {int(time.time())}',
+            '# TYPE ibovespa_ingestao_codigos gauge',
+            f'ibovespa_ingestao_codigos{{{rotulo}}} {resumo["codigos"]}',
+            '# TYPE ibovespa_ingestao_etapa_segundos gauge',
+        ]
+        for etapa, dados in resumo['etapas'].items():
+            linhas.append(f'ibovespa_ingestao_etapa_segundos{{{rotulo},etapa="{etapa}"}} {dados["segundos"]}')
+        linhas.append('# TYPE ibovespa_ingestao_etapa_chamadas gauge')
+        for etapa, dados in resumo['etapas'].items():
+            linhas.append(f'ibovespa_ingestao_etapa_chamadas{{{rotulo},etapa="{etapa}"}} {dados["chamadas"]}')
+        linhas.append('# TYPE ibovespa_ingestao_contador gauge')
+        for nome, valor in resumo['contadores'].items():
+            linhas.append(f'ibovespa_ingestao_contador{{{rotulo},nome="{nome}"}} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+    def salvar(self, status: str, mensagem: str = '') -> ExecucaoIngestao:
+        resumo = self.resumo()
+        return ExecucaoIngestao.objects.create(
+            comando=self.comando,
+            inicio=self.inicio,
+            fim=timezone.now(),
+            duracao_segundos=resumo['duracao_segundos'],
+            status=status,
+            mensagem=mensagem[:1000],
+            codigos=resumo['codigos'],
+            etapas=resumo['etapas'],
+            contadores=resumo['contadores'],
+            mais_lentos=resumo['mais_lentos'],
+        )
+
+    def exportar(self, caminho: str, status: str) -> None:
+        if caminho.endswith('.prom'):
+            conteudo = self.prometheus(status)
+        else:
+            conteudo = json.dumps(dict(self.resumo(todos_os_codigos=True), status=status),
+                                  ensure_ascii=False, indent=2)
+        # troca atômica: o coletor nunca lê um arquivo pela metade
+        temporario = f'{caminho}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
+
+
+class ComandoComMetricas(BaseCommand):
+    """BaseCommand que mede a execução inteira e registra o resumo em ExecucaoIngestao.
+
+    O comando chama `marcar_dados_alterados()` antes de gravar no banco; no fim (também com erro,
+    que pode deixar parte gravada) a versão dos dados do cache só sobe se a execução gravou algo.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument('--metricas', type=str, default='', metavar='ARQUIVO',
+                            help='Grava as métricas da execução em ARQUIVO (JSON, ou texto do Prometheus se terminar em .prom)')
+        return parser
+
+    def execute(self, *args, **options):
+        comando = self.__module__.rsplit('.', 1)[-1]
+        self.metricas = Metricas(comando)
+        self.alterou_dados = False
+        status, mensagem = 'ok', ''
+        try:
+            return super().execute(*args, **options)
+        except KeyboardInterrupt:
+            status, mensagem = 'interrompido', 'KeyboardInterrupt'
+            raise
+        except Exception as exc:
+            status, mensagem = 'erro', f'{type(exc).__name__}: {exc}'
+            raise
+        finally:
+            self._registrar_metricas(status, mensagem, options.get('metricas') or '')
+            if self.alterou_dados:
+                self._registrar_alteracao()
+
+    def marcar_dados_alterados(self) -> None:
+        """Esta execução gravou (ou vai gravar) no banco: o cache das respostas fica inválido no fim."""
+        self.alterou_dados = True
+
+    def _registrar_metricas(self, status: str, mensagem: str, caminho: str) -> None:
+        # falhar ao registrar não pode esconder o resultado (ou o erro) do comando
+        try:
+            self.metricas.salvar(status, mensagem)
+            if caminho:
+                self.metricas.exportar(caminho, status)
+        except Exception as exc:
+            self.stderr.write(f'Não foi possível registrar as métricas: {exc}')
+
+    def _registrar_alteracao(self) -> None:
+        try:
+            registrar_alteracao()
+        except Exception as exc:
+            self.stderr.write(f'Não foi possível atualizar a versão dos dados: {exc}')
@@ -0,0 +1,139 @@
+"""
+Compressão das respostas segundo o Accept-Encoding (brotli se instalado, senão gzip).
+
+Respostas GET 200 das views do app ibovespa são determinísticas para um mesmo corpo, então a
+versão comprimida fica no cache indexada pelo hash do corpo e pela codificação: cada payload
+distinto (por versão dos dados, que já muda o corpo) é comprimido uma única vez, com nível alto.
+As demais respostas são comprimidas na hora com nível moderado. Respostas em streaming ou que
+já trazem Content-Encoding (ex.: exportar/?gzip=1) passam intactas.
+
+Só são comprimidas respostas das views do app ibovespa nos tipos da API (JSON, MessagePack, Arrow,
+NDJSON, CSV). Diferente do GZipMiddleware do Django, não há bytes aleatórios contra BREACH: essas
+respostas autenticam por token no cabeçalho e não trazem token CSRF no corpo, e o padding impediria
+o cache. HTML (admin, user/, API navegável do DRF), que mistura token CSRF e cookie de sessão, passa
+intacto.
+"""
+import gzip
+import hashlib
+from typing import Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from .cache import CACHE_TTL
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só gzip
+    brotli = None
+
+TAMANHO_MINIMO = 200
+# Corpo máximo guardado comprimido no cache (respostas maiores são comprimidas a cada requisição).
+# O cache padrão fica na memória de cada processo e cada corpo distinto é uma entrada, então
+# exportações e históricos grandes ficam de fora e cada entrada tem no máximo algumas centenas de KB.
+TAMANHO_MAXIMO_CACHE = 512 * 1024
+TIPOS_COMPRIMIVEIS = ('application/json', 'application/msgpack', 'application/vnd.apache.arrow.stream',
+                      'application/x-ndjson', 'text/csv')
+# (na hora, no cache): o que vai para o cache é comprimido uma vez só e pode gastar mais CPU
+NIVEL_GZIP = (6, 9)
+QUALIDADE_BROTLI = (4, 9)
+
+
+def codificacoes_aceitas(cabecalho: str) -> Dict[str, float]:
+    """{codificação: q} do Accept-Encoding; '*' vale para as não citadas."""
+    aceitas: Dict[str, float] = {}
+    for parte in cabecalho.split(','):
+        nome, _, parametros = parte.strip().partition(';')
+        if not nome:
+            continue
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith('q='):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        aceitas[nome.strip().lower()] = q
+    return aceitas
+
+
+def escolher_codificacao(cabecalho: str) -> Optional[str]:
+    aceitas = codificacoes_aceitas(cabecalho)
+    curinga = aceitas.get('*', 0.0)
+    candidatas = (['br'] if brotli is not None else []) + ['gzip']
+    melhor, melhor_q = None, 0.0
+    for nome in candidatas:
+        q = aceitas.get(nome, curinga)
+        if q > melhor_q:
+            melhor, melhor_q = nome, q
+    return melhor
+
+
+def comprimir(conteudo: bytes, codificacao: str, para_cache: bool = False) -> bytes:
+    if codificacao == 'br':
+        return brotli.compress(conteudo, quality=QUALIDADE_BROTLI[para_cache])
+    return gzip.compress(conteudo, compresslevel=NIVEL_GZIP[para_cache], mtime=0)
+
+
+def _view_ibovespa(request) -> bool:
+    match = getattr(request, 'resolver_match', None)
+    return match is not None and match.func.__module__.startswith('ibovespa.')
+
+
+def _cacheavel(request, response) -> bool:
+    return (
+        request.method == 'GET' and response.status_code == 200
+        and len(response.content) <= TAMANHO_MAXIMO_CACHE
+    )
+
+
+class CompressaoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.processar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.processar(request, await self.get_response(request))
+
+    def processar(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or not _view_ibovespa(request):
+            return response
+        if len(response.content) < TAMANHO_MINIMO:
+            return response
+        if not response.get('Content-Type', '').startswith(TIPOS_COMPRIMIVEIS):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codificacao = escolher_codificacao(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacao is None:
+            return response
+
+        if _cacheavel(request, response):
+            resumo = hashlib.sha1(response.content).hexdigest()
+            chave = f'ibovespa:compressao:{codificacao}:{resumo}:{len(response.content)}'
+            comprimido = cache.get(chave)
+            if comprimido is None:
+                comprimido = comprimir(response.content, codificacao, para_cache=True)
+                cache.set(chave, comprimido, CACHE_TTL)
+        else:
+            comprimido = comprimir(response.content, codificacao)
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response.headers['Content-Length'] = str(len(comprimido))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codificacao
+        return response
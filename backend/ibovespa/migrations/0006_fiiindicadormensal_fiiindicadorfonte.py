@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibovespa', '0005_fundoimobiliario_aluguel_m2_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FIIIndicadorFonte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assinatura', models.CharField(max_length=64)),
+                ('data_calculo', models.DateTimeField(auto_now=True)),
+                ('fii', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='indicador_fonte', to='ibovespa.fundoimobiliario')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FIIIndicadorMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('rendimento', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('rendimento_12m', models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True)),
+                ('preco_fechamento', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True)),
+                ('dy_12m', models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True)),
+                ('yield_on_cost', models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True)),
+                ('crescimento_rendimento', models.DecimalField(blank=True, decimal_places=6, max_digits=14, null=True)),
+                ('fii', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indicadores_mensais', to='ibovespa.fundoimobiliario')),
+            ],
+            options={
+                'ordering': ['-data'],
+                'unique_together': {('fii', 'data')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibovespa', '0006_fiiindicadormensal_fiiindicadorfonte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroIngestao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comando', models.CharField(max_length=50)),
+                ('codigo', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('ok', 'Concluído'), ('ignorado', 'Ignorado'), ('erro', 'Erro')], max_length=10)),
+                ('assinatura', models.CharField(blank=True, max_length=64)),
+                ('mensagem', models.TextField(blank=True)),
+                ('data_execucao', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-data_execucao'],
+                'unique_together': {('comando', 'codigo')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibovespa', '0007_registroingestao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConcessaoIngestao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comando', models.CharField(max_length=50)),
+                ('rodada', models.CharField(max_length=50)),
+                ('codigo', models.CharField(max_length=20)),
+                ('dono', models.CharField(blank=True, max_length=100)),
+                ('expira_em', models.DateTimeField(blank=True, null=True)),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['comando', 'rodada', 'codigo'],
+                'unique_together': {('comando', 'rodada', 'codigo')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibovespa', '0008_concessaoingestao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoIngestao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comando', models.CharField(max_length=50)),
+                ('inicio', models.DateTimeField()),
+                ('fim', models.DateTimeField()),
+                ('duracao_segundos', models.FloatField()),
+                ('status', models.CharField(choices=[('ok', 'Concluída'), ('erro', 'Erro'), ('interrompido', 'Interrompida')], max_length=12)),
+                ('mensagem', models.TextField(blank=True)),
+                ('codigos', models.IntegerField(default=0)),
+                ('etapas', models.JSONField(default=dict)),
+                ('contadores', models.JSONField(default=dict)),
+                ('mais_lentos', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['comando', '-inicio'], name='ibovespa_ex_comando_cd89c7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibovespa', '0009_execucaoingestao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveBigIntegerField(default=0)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
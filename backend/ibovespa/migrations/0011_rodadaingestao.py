@@ -0,0 +1,54 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def agrupar_registros_antigos(apps, schema_editor):
+    """Os registros anteriores (um por código) viram uma execução concluída por comando."""
+    RodadaIngestao = apps.get_model('ibovespa', 'RodadaIngestao')
+    RegistroIngestao = apps.get_model('ibovespa', 'RegistroIngestao')
+    for comando, ultimo in (RegistroIngestao.objects.values_list('comando')
+                            .annotate(ultimo=Max('data_execucao')).order_by()):
+        rodada = RodadaIngestao.objects.create(comando=comando, fim=ultimo)
+        RegistroIngestao.objects.filter(comando=comando).update(rodada=rodada)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibovespa', '0010_versaodados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RodadaIngestao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comando', models.CharField(max_length=50)),
+                ('particao', models.CharField(blank=True, max_length=60)),
+                ('inicio', models.DateTimeField(auto_now_add=True)),
+                ('fim', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['comando', 'particao', '-inicio'], name='ibovespa_ro_comando_bdbd4b_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='registroingestao',
+            name='rodada',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='registros', to='ibovespa.rodadaingestao'),
+        ),
+        migrations.RunPython(agrupar_registros_antigos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='registroingestao',
+            name='rodada',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='registros', to='ibovespa.rodadaingestao'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='registroingestao',
+            unique_together={('rodada', 'codigo')},
+        ),
+    ]
@@ -156,3 +156,129 @@ class FIIDividendYield(models.Model):
     def __str__(self):
         return f'{self.fii.codigo} - {self.data} - DY {self.dy}'
 
+
+
+class FIIIndicadorMensal(models.Model):
+    """Indicadores mensais derivados de FIIRendimento x FIIHistoricoPreco (recalculados em lote)."""
+    fii = models.ForeignKey(FundoImobiliario, on_delete=models.CASCADE, related_name='indicadores_mensais')
+    data = models.DateField()  # último dia do mês de referência
+    rendimento = models.DecimalField(max_digits=20, decimal_places=6)  # soma R$/cota pagos no mês
+    rendimento_12m = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True)
+    preco_fechamento = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True)  # último fechamento do mês
+    dy_12m = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True)  # fração, ex.: 0.087 = 8,7%
+    yield_on_cost = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True)  # rendimento 12m / preço de 12 meses antes
+    crescimento_rendimento = models.DecimalField(max_digits=14, decimal_places=6, null=True, blank=True)  # variação contra o mês anterior
+
+    class Meta:
+        unique_together = ('fii', 'data')
+        ordering = ['-data']
+
+    def __str__(self):
+        return f'{self.fii.codigo} - {self.data} - DY12m {self.dy_12m}'
+
+
+class FIIIndicadorFonte(models.Model):
+    """Assinatura das séries de origem usadas no último cálculo de FIIIndicadorMensal de cada FII."""
+    fii = models.OneToOneField(FundoImobiliario, on_delete=models.CASCADE, related_name='indicador_fonte')
+    assinatura = models.CharField(max_length=64)
+    data_calculo = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.fii.codigo} - {self.assinatura[:12]}'
+
+
+class RodadaIngestao(models.Model):
+    """Uma execução de um comando de ingestão; sem `fim`, foi interrompida e o --resume a continua."""
+    comando = models.CharField(max_length=50)
+    # parte do universo da execução (--shard I/N ou --fila RODADA); vazio quando é o universo todo
+    particao = models.CharField(max_length=60, blank=True)
+    inicio = models.DateTimeField(auto_now_add=True)
+    fim = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-inicio']
+        indexes = [models.Index(fields=['comando', 'particao', '-inicio'])]
+
+    def __str__(self):
+        return f'{self.comando} [{self.particao or "tudo"}] - {self.inicio:%Y-%m-%d %H:%M}'
+
+
+class RegistroIngestao(models.Model):
+    """Resultado de cada código em cada execução (RodadaIngestao) de um comando de ingestão."""
+    STATUS_CHOICES = [
+        ('ok', 'Concluído'),
+        ('ignorado', 'Ignorado'),
+        ('erro', 'Erro'),
+    ]
+
+    rodada = models.ForeignKey(RodadaIngestao, on_delete=models.CASCADE, related_name='registros')
+    comando = models.CharField(max_length=50)
+    codigo = models.CharField(max_length=20)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    assinatura = models.CharField(max_length=64, blank=True)  # sha256 do conteúdo baixado
+    mensagem = models.TextField(blank=True)
+    data_execucao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('rodada', 'codigo')
+        ordering = ['-data_execucao']
+
+    def __str__(self):
+        return f'{self.comando} - {self.codigo} - {self.status}'
+
+
+class ConcessaoIngestao(models.Model):
+    """Fila de códigos de uma rodada de ingestão dividida entre processos (--fila).
+
+    Quem pega um código grava seu `dono` e um prazo (`expira_em`); se o processo morrer, o código
+    volta a ficar livre quando o prazo vence.
+    """
+    comando = models.CharField(max_length=50)
+    rodada = models.CharField(max_length=50)
+    codigo = models.CharField(max_length=20)
+    dono = models.CharField(max_length=100, blank=True)
+    expira_em = models.DateTimeField(null=True, blank=True)
+    finalizado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('comando', 'rodada', 'codigo')
+        ordering = ['comando', 'rodada', 'codigo']
+
+    def __str__(self):
+        return f'{self.comando} - {self.rodada} - {self.codigo}'
+
+
+class ExecucaoIngestao(models.Model):
+    """Resumo de uma execução de comando de ingestão (ver ibovespa.metricas)."""
+    STATUS_CHOICES = [
+        ('ok', 'Concluída'),
+        ('erro', 'Erro'),
+        ('interrompido', 'Interrompida'),
+    ]
+
+    comando = models.CharField(max_length=50)
+    inicio = models.DateTimeField()
+    fim = models.DateTimeField()
+    duracao_segundos = models.FloatField()
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES)
+    mensagem = models.TextField(blank=True)
+    codigos = models.IntegerField(default=0)  # códigos distintos medidos
+    etapas = models.JSONField(default=dict)  # {etapa: {segundos, chamadas, maior_segundos}}
+    contadores = models.JSONField(default=dict)
+    mais_lentos = models.JSONField(default=list)  # [[codigo, segundos], ...]
+
+    class Meta:
+        ordering = ['-inicio']
+        indexes = [models.Index(fields=['comando', '-inicio'])]
+
+    def __str__(self):
+        return f'{self.comando} - {self.inicio:%Y-%m-%d %H:%M} - {self.status}'
+
+
+class VersaoDados(models.Model):
+    """Contador compartilhado entre processos: sobe a cada ingestão ou edição no admin (ver ibovespa.cache)."""
+    numero = models.PositiveBigIntegerField(default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'versão {self.numero}'
@@ -0,0 +1,119 @@
+"""
+Simulação Monte Carlo do valor futuro de uma carteira a partir dos retornos históricos.
+
+Os caminhos são gerados em lotes (NumPy vetorizado) e reduzidos na hora a histogramas do
+log do valor em cada passo de controle. Assim a memória fica limitada pelo tamanho do lote
+e pelo número de bins, qualquer que seja o número de caminhos, e os histogramas de cada
+worker podem ser simplesmente somados. Cada lote tem seu próprio fluxo aleatório independente,
+derivado de `np.random.SeedSequence(semente).spawn(n_lotes)`, e os lotes são repartidos entre
+os workers; o resultado de uma semente é o mesmo qualquer que seja o número de processos.
+
+Assim como `backtest`, este módulo não importa Django para poder rodar nos workers do pool.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backtest import obter_pool
+
+METODOS = ('bootstrap', 'normal')
+PERCENTIS_PADRAO = (5, 25, 50, 75, 95)
+
+# Histograma do log do valor da carteira: e^-8 (~0.0003x) até e^8 (~2981x) em 8192 bins (~0.2%)
+LOG_MIN, LOG_MAX, BINS = -8.0, 8.0, 8192
+# Limite de retornos diários gerados por lote (caminhos x horizonte), ~8 MB em float64
+MAX_ELEMENTOS_LOTE = 1_000_000
+MAX_PONTOS = 60
+
+
+def passos_controle(horizonte: int, max_pontos: int = MAX_PONTOS) -> np.ndarray:
+    """Passos (1..horizonte) em que a distribuição é registrada."""
+    return np.unique(np.linspace(1, horizonte, min(horizonte, max_pontos)).round().astype(np.int64))
+
+
+def _simular_parcial(retornos_carteira: np.ndarray, horizonte: int, metodo: str, pontos: np.ndarray,
+                     lotes: List[Tuple[np.random.SeedSequence, int]]):
+    """Gera os lotes (semente, n_caminhos) recebidos e devolve (contagens, soma_valores, n_perdas)."""
+    n_pontos = len(pontos)
+    contagens = np.zeros(n_pontos * (BINS + 2), dtype=np.int64)
+    soma = np.zeros(n_pontos)
+    perdas = 0
+    largura = (LOG_MAX - LOG_MIN) / BINS
+    deslocamento = np.arange(n_pontos) * (BINS + 2)
+    log_hist = np.log1p(retornos_carteira)
+    media, desvio = log_hist.mean(), log_hist.std(ddof=1)
+
+    for semente, lote in lotes:
+        rng = np.random.default_rng(semente)
+        if metodo == 'bootstrap':
+            diarios = log_hist[rng.integers(0, len(log_hist), size=(lote, horizonte))]
+        else:
+            diarios = rng.normal(media, desvio, size=(lote, horizonte))
+        log_valor = np.cumsum(diarios, axis=1)[:, pontos - 1]
+        idx = np.clip(((log_valor - LOG_MIN) / largura).astype(np.int64) + 1, 0, BINS + 1)
+        contagens += np.bincount((idx + deslocamento).ravel(), minlength=len(contagens))
+        soma += np.exp(log_valor).sum(axis=0)
+        perdas += int((log_valor[:, -1] < 0).sum())
+    return contagens.reshape(n_pontos, BINS + 2), soma, perdas
+
+
+def _percentis(contagens: np.ndarray, percentis: Sequence[float]) -> Dict[str, List[float]]:
+    """Percentis por passo, interpolando linearmente dentro do bin (em escala log)."""
+    total = contagens.sum(axis=1, keepdims=True)
+    acumulado = np.cumsum(contagens, axis=1) / total
+    largura = (LOG_MAX - LOG_MIN) / BINS
+    resultado: Dict[str, List[float]] = {}
+    for q in percentis:
+        alvo = q / 100.0
+        j = np.argmax(acumulado >= alvo, axis=1)
+        anterior = np.where(j > 0, acumulado[np.arange(len(j)), j - 1], 0.0)
+        no_bin = contagens[np.arange(len(j)), j] / total[:, 0]
+        fracao = np.divide(alvo - anterior, no_bin, out=np.zeros_like(no_bin), where=no_bin > 0)
+        log_valor = LOG_MIN + (j - 1 + np.clip(fracao, 0.0, 1.0)) * largura
+        resultado[f'{q:g}'] = np.round(np.exp(log_valor), 6).tolist()
+    return resultado
+
+
+def simular_carteira(retornos: np.ndarray, pesos: np.ndarray, horizonte: int, caminhos: int,
+                     metodo: str = 'bootstrap', semente: Optional[int] = None, processos: int = 1,
+                     percentis: Sequence[float] = PERCENTIS_PADRAO) -> Dict[str, object]:
+    """Simula o valor (base 1.0) de uma carteira rebalanceada diariamente.
+
+    `retornos` é a matriz histórica T x N de retornos simples. No método bootstrap cada dia
+    futuro sorteia um dia histórico (preservando a correlação entre ativos); no método normal
+    o log-retorno diário da carteira segue uma normal com a média e o desvio históricos.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método inválido: {metodo!r}. Use um de {', '.join(METODOS)}.")
+    retornos_carteira = retornos @ pesos
+    # com venda a descoberto a carteira pode perder 100% ou mais num dia: aí o log do valor não existe
+    if not np.all(retornos_carteira > -1.0):
+        raise ValueError('A carteira perde 100% ou mais em algum dia da janela histórica; reduza as posições vendidas.')
+    pontos = passos_controle(horizonte)
+    tamanho_lote = max(1, MAX_ELEMENTOS_LOTE // horizonte)
+    n_lotes = math.ceil(caminhos / tamanho_lote)
+    tamanhos = [min(tamanho_lote, caminhos - i * tamanho_lote) for i in range(n_lotes)]
+    lotes = list(zip(np.random.SeedSequence(semente).spawn(n_lotes), tamanhos))
+    processos = max(1, min(processos, n_lotes))
+    if processos == 1:
+        parciais = [_simular_parcial(retornos_carteira, horizonte, metodo, pontos, lotes)]
+    else:
+        pool = obter_pool(processos)
+        futuros = [
+            pool.submit(_simular_parcial, retornos_carteira, horizonte, metodo, pontos, lotes[i::processos])
+            for i in range(processos)
+        ]
+        parciais = [f.result() for f in futuros]
+
+    contagens = sum(p[0] for p in parciais)
+    soma = sum(p[1] for p in parciais)
+    perdas = sum(p[2] for p in parciais)
+    return {
+        'passos': pontos.tolist(),
+        'percentis': _percentis(contagens, percentis),
+        'media': np.round(soma / caminhos, 6).tolist(),
+        'prob_perda': round(perdas / caminhos, 6),
+        'caminhos': caminhos,
+        'processos': processos,
+    }
@@ -0,0 +1,273 @@
+"""
+Fronteira eficiente de média-variância e carteira de máximo Sharpe.
+
+Cada ponto da fronteira resolve  min ½ w'Σw  sujeito a  μ'w = alvo,  sum(w) = 1,
+peso_min <= w <= peso_max  e  sum(w[grupo]) <= limite_grupo, com um ADMM no estilo OSQP.
+Entre os pontos só muda o limite da linha μ'w, então a matriz do sistema é invertida uma
+vez para toda a fronteira e cada ponto parte da solução do ponto anterior (warm start).
+O máximo Sharpe é uma busca de seção áurea sobre o retorno-alvo, reaproveitando o mesmo solver.
+Cada carteira informa se o solver convergiu; sem convergência os pesos são só aproximados.
+
+Módulo puramente NumPy (sem Django), como `backtest` e `montecarlo`.
+"""
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+RHO = 0.1
+SIGMA = 1e-6
+ALFA = 1.6
+TOLERANCIA = 1e-6
+# tolerância a partir da qual se tenta o polimento (solução exata no conjunto ativo estimado)
+TOLERANCIA_POLIMENTO = 1e-3
+MAX_ITERACOES = 4000
+# rho é reajustado (e o sistema reinvertido) quando o ajuste sugerido passa deste fator
+FATOR_AJUSTE_RHO = 2.0
+REGULARIZACAO_KKT = 1e-10
+# trocas do conjunto ativo tentadas em cada polimento antes de voltar ao ADMM
+MAX_CORRECOES_POLIMENTO = 8
+
+
+class SolucionadorQP:
+    """ADMM para  min ½ x'Px + q'x  s.a.  l <= Ax <= u  com P e A fixos e q, l, u variáveis."""
+
+    def __init__(self, P: np.ndarray, A: np.ndarray, l: np.ndarray, u: np.ndarray,
+                 igualdade: Optional[np.ndarray] = None):
+        self.P, self.A, self.l, self.u = P, A, l, u
+        # linhas tratadas como igualdade (rho maior); podem ser indicadas para limites que variam
+        self.igualdade = np.isclose(l, u) if igualdade is None else igualdade
+        self._definir_rho(RHO)
+        n = P.shape[0]
+        self.x = np.zeros(n)
+        self.z = np.clip(np.zeros(A.shape[0]), l, u)
+        self.y = np.zeros(A.shape[0])
+
+    def _definir_rho(self, rho: float) -> None:
+        # restrições de igualdade recebem rho maior, como no OSQP
+        self.rho_base = rho
+        self.rho = np.where(self.igualdade, rho * 1e3, rho)
+        K = self.P + SIGMA * np.eye(self.P.shape[0]) + self.A.T @ (self.rho[:, None] * self.A)
+        self.K_inv = np.linalg.inv(K)
+
+    def resolver(self, q: np.ndarray, l: Optional[np.ndarray] = None,
+                 u: Optional[np.ndarray] = None) -> Tuple[np.ndarray, int, bool]:
+        """(x, iterações, convergiu); sem convergência em MAX_ITERACOES, x é o último iterado."""
+        if l is not None:
+            self.l = l
+        if u is not None:
+            self.u = u
+        P, A, l, u, rho, K_inv = self.P, self.A, self.l, self.u, self.rho, self.K_inv
+        x, z, y = self.x, self.z, self.y
+        proximo_polimento = 0.0
+        convergiu = False
+        for it in range(1, MAX_ITERACOES + 1):
+            x_til = K_inv @ (SIGMA * x - q + A.T @ (rho * z - y))
+            z_til = A @ x_til
+            x = ALFA * x_til + (1.0 - ALFA) * x
+            z_rel = ALFA * z_til + (1.0 - ALFA) * z
+            z = np.clip(z_rel + y / rho, l, u)
+            y = y + rho * (z_rel - z)
+            if it % 10 == 0:
+                Ax, Px, Aty = A @ x, P @ x, A.T @ y
+                prim = np.abs(Ax - z).max()
+                dual = np.abs(Px + q + Aty).max()
+                escala_prim = max(np.abs(Ax).max(), np.abs(z).max(), 1e-12)
+                escala_dual = max(np.abs(Px).max(), np.abs(Aty).max(), np.abs(q).max(), 1e-12)
+                if prim < TOLERANCIA * max(1.0, escala_prim) and dual < TOLERANCIA * max(1.0, escala_dual):
+                    convergiu = True
+                    break
+                erro = max(prim / max(1.0, escala_prim), dual / max(1.0, escala_dual))
+                if erro < TOLERANCIA_POLIMENTO and it >= proximo_polimento:
+                    polido = self._polir(q, z, y)
+                    if polido is not None:
+                        x, y = polido
+                        z = A @ x
+                        convergiu = True
+                        break
+                    proximo_polimento = it + 50
+                if it % 20 == 0:
+                    # regra adaptativa do OSQP: equilibra os resíduos primal e dual relativos
+                    ajuste = np.sqrt((prim / escala_prim) / max(dual / escala_dual, 1e-30))
+                    if ajuste > FATOR_AJUSTE_RHO or ajuste < 1.0 / FATOR_AJUSTE_RHO:
+                        self._definir_rho(float(np.clip(self.rho_base * ajuste, 1e-6, 1e6)))
+                        rho, K_inv = self.rho, self.K_inv
+        self.x, self.z, self.y = x, z, y
+        return x, it, convergiu
+
+    def _polir(self, q: np.ndarray, z: np.ndarray, y: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Resolve o KKT no conjunto ativo sugerido pelo ADMM; None se a solução não for ótima.
+
+        Se a solução violar alguma restrição ou algum multiplicador tiver o sinal errado, o
+        conjunto ativo é corrigido (troca ativa-inativa) e o KKT resolvido de novo, algumas vezes.
+        """
+        P, A, l, u = self.P, self.A, self.l, self.u
+        n = P.shape[0]
+        igualdade = np.isfinite(l) & (l == u)
+        inferior = (((z - l) < -y) & np.isfinite(l)) | igualdade
+        superior = ((u - z) < y) & np.isfinite(u) & ~igualdade
+        for _ in range(MAX_CORRECOES_POLIMENTO):
+            ativo = inferior | superior
+            m = int(ativo.sum())
+            A_ativo = A[ativo]
+            kkt = np.block([
+                [P + REGULARIZACAO_KKT * np.eye(n), A_ativo.T],
+                [A_ativo, -REGULARIZACAO_KKT * np.eye(m)],
+            ])
+            try:
+                solucao = np.linalg.solve(kkt, np.concatenate([-q, np.where(superior, u, l)[ativo]]))
+            except np.linalg.LinAlgError:
+                return None
+            if not np.all(np.isfinite(solucao)):
+                return None
+            x = solucao[:n]
+            y_novo = np.zeros_like(y)
+            y_novo[ativo] = solucao[n:]
+            Ax = A @ x
+            folga = TOLERANCIA * max(1.0, np.abs(Ax).max())
+            folga_dual = TOLERANCIA * max(1.0, np.abs(q).max(), np.abs(y_novo).max())
+            # sinais dos multiplicadores: negativos no limite inferior, positivos no superior
+            viola_inf = ~ativo & (Ax < l - folga)
+            viola_sup = ~ativo & (Ax > u + folga)
+            sinal_errado = ~igualdade & ((inferior & (y_novo > folga_dual)) | (superior & (y_novo < -folga_dual)))
+            if not (viola_inf.any() or viola_sup.any() or sinal_errado.any()):
+                return x, y_novo
+            inferior = (inferior & ~sinal_errado) | viola_inf
+            superior = (superior & ~sinal_errado) | viola_sup
+        return None
+
+
+def restricoes(n: int, peso_min: float, peso_max: float, grupos: Sequence[Optional[str]],
+               limites: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Monta A, l, u: soma dos pesos = 1, limites individuais e tetos por grupo."""
+    linhas = [np.ones((1, n)), np.eye(n)]
+    l = [np.array([1.0]), np.full(n, peso_min)]
+    u = [np.array([1.0]), np.full(n, peso_max)]
+    for nome, teto in limites.items():
+        membros = np.array([g == nome for g in grupos], dtype=float)
+        if membros.any():
+            linhas.append(membros[None, :])
+            l.append(np.array([-np.inf]))
+            u.append(np.array([teto]))
+    return np.vstack(linhas), np.concatenate(l), np.concatenate(u)
+
+
+def verificar_viabilidade(peso_min: float, peso_max: float, grupos: Sequence[Optional[str]],
+                          limites: Dict[str, float]) -> None:
+    n = len(grupos)
+    if peso_min > peso_max:
+        raise ValueError('peso_min não pode ser maior que peso_max.')
+    if n * peso_min > 1.0 + 1e-9:
+        raise ValueError('peso_min é alto demais: a soma mínima dos pesos passa de 100%.')
+    maximo = 0.0
+    for nome in set(grupos):
+        n_grupo = sum(1 for g in grupos if g == nome)
+        teto_grupo = n_grupo * peso_max
+        if nome in limites:
+            if limites[nome] < n_grupo * peso_min - 1e-9:
+                raise ValueError(f'Limite do grupo {nome!r} é menor que a soma dos pesos mínimos.')
+            teto_grupo = min(teto_grupo, limites[nome])
+        maximo += teto_grupo
+    if maximo < 1.0 - 1e-9:
+        raise ValueError('Restrições inviáveis: peso_max e limites de grupo não permitem somar 100%.')
+
+
+def carteira_retorno_maximo(mu: np.ndarray, peso_min: float, peso_max: float, grupos: Sequence[Optional[str]],
+                            limites: Dict[str, float]) -> np.ndarray:
+    """Carteira de maior retorno viável (LP resolvido de forma exata por algoritmo guloso, grupos disjuntos)."""
+    w = np.full(len(mu), float(peso_min))
+    restante = 1.0 - w.sum()
+    folga = {nome: teto - sum(peso_min for g in grupos if g == nome) for nome, teto in limites.items()}
+    for i in np.argsort(-mu):
+        if restante <= 0:
+            break
+        extra = min(peso_max - peso_min, restante, folga.get(grupos[i], np.inf))
+        if extra > 0:
+            w[i] += extra
+            restante -= extra
+            if grupos[i] in folga:
+                folga[grupos[i]] -= extra
+    return w
+
+
+def _ponto(w: np.ndarray, mu: np.ndarray, cov: np.ndarray, taxa_livre: float,
+           convergiu: bool = True) -> Dict[str, object]:
+    retorno = float(mu @ w)
+    vol = float(np.sqrt(max(w @ cov @ w, 0.0)))
+    return {
+        'retorno': retorno,
+        'volatilidade': vol,
+        'sharpe': (retorno - taxa_livre) / vol if vol > 0 else None,
+        'pesos': w,
+        'convergiu': convergiu,
+    }
+
+
+def fronteira_eficiente(mu: np.ndarray, cov: np.ndarray, grupos: Sequence[Optional[str]],
+                        peso_min: float = 0.0, peso_max: float = 1.0,
+                        limites: Optional[Dict[str, float]] = None, pontos: int = 20,
+                        taxa_livre: float = 0.0) -> Dict[str, object]:
+    """Calcula `pontos` carteiras da fronteira (da mínima variância à de maior retorno) e a de máximo Sharpe.
+
+    `mu` e `cov` devem estar na mesma escala (ex.: anualizados).
+    """
+    limites = limites or {}
+    n = len(mu)
+    verificar_viabilidade(peso_min, peso_max, grupos, limites)
+    A, l, u = restricoes(n, peso_min, peso_max, grupos, limites)
+    # última linha: retorno da carteira, livre na mínima variância e fixo no alvo nos demais pontos
+    A = np.vstack([A, mu[None, :]])
+    l, u = np.append(l, -np.inf), np.append(u, np.inf)
+    igualdade = np.append(np.isclose(l[:-1], u[:-1]), True)
+    solver = SolucionadorQP(cov, A, l, u, igualdade=igualdade)
+    q = np.zeros(n)
+    iteracoes = 0
+
+    def resolver_alvo(alvo: float) -> Dict[str, object]:
+        nonlocal iteracoes
+        l[-1] = u[-1] = alvo
+        w, it, convergiu = solver.resolver(q, l, u)
+        iteracoes += it
+        return _ponto(w.copy(), mu, cov, taxa_livre, convergiu)
+
+    w_min, it, convergiu_min = solver.resolver(q)
+    iteracoes += it
+    minimo = _ponto(w_min.copy(), mu, cov, taxa_livre, convergiu_min)
+    r_min = minimo['retorno']
+    # o extremo de maior retorno é um vértice degenerado para o ADMM; usa a solução exata do LP
+    w_max = carteira_retorno_maximo(mu, peso_min, peso_max, grupos, limites)
+    r_max = max(float(mu @ w_max), r_min)
+    alvos = np.linspace(r_min, r_max, max(pontos, 2))
+    fronteira = ([minimo] + [resolver_alvo(r) for r in alvos[1:-1]]
+                 + [_ponto(w_max, mu, cov, taxa_livre) if r_max > r_min else minimo])
+
+    # máximo Sharpe: seção áurea no retorno-alvo entre os vizinhos do melhor ponto da fronteira
+    def sharpe(p: Dict[str, object]) -> float:
+        return -np.inf if p['sharpe'] is None else p['sharpe']
+
+    k = max(range(len(fronteira)), key=lambda i: sharpe(fronteira[i]))
+    melhor = fronteira[k]
+    a, b = alvos[max(k - 1, 0)], alvos[min(k + 1, len(alvos) - 1)]
+    if b > a:
+        razao = (np.sqrt(5.0) - 1.0) / 2.0
+        c, d = b - razao * (b - a), a + razao * (b - a)
+        pc, pd_ = resolver_alvo(c), resolver_alvo(d)
+        for _ in range(12):
+            if sharpe(pc) > sharpe(pd_):
+                b, d, pd_ = d, c, pc
+                c = b - razao * (b - a)
+                pc = resolver_alvo(c)
+            else:
+                a, c, pc = c, d, pd_
+                d = a + razao * (b - a)
+                pd_ = resolver_alvo(d)
+        for p in (pc, pd_):
+            if sharpe(p) > sharpe(melhor):
+                melhor = p
+
+    return {
+        'fronteira': fronteira,
+        'min_variancia': fronteira[0],
+        'max_sharpe': melhor,
+        'iteracoes': iteracoes,
+        'nao_convergidos': sum(1 for p in fronteira if not p['convergiu']),
+    }
@@ -0,0 +1,118 @@
+"""
+Painel de um FII ou ação: cadastro, histórico e proventos numa única resposta.
+
+O código é resolvido uma vez e as seções (uma consulta cada, pelo id já resolvido) rodam em
+paralelo com asyncio.gather sobre sync_to_async, cada uma numa thread com sua própria conexão.
+O payload inteiro é cacheado por (código, janelas, versão dos dados); as variantes assíncronas
+(`apainel_fii`/`apainel_ativo`, usadas pelas views ASGI) compartilham as mesmas chaves de cache.
+"""
+import asyncio
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from .cache import CACHE_TTL, chave_versionada, obter_ou_calcular
+from .models import Ativo, HistoricoAtivo, FundoImobiliario, FIIHistoricoPreco, FIIRendimento, FIIDividendYield
+from .serializer import AtivoSerializer, FIISerializer
+from .series import series_por_chave
+
+# Janela padrão de cada seção, em dias até hoje; `<secao>_inicio`/`<secao>_fim` na URL substituem
+JANELAS_FII = {'historico': 365, 'rendimentos': 5 * 365, 'dy': 365}
+JANELAS_ATIVO = {'historico': 365}
+
+
+def janelas(params: Mapping[str, str], padroes: Dict[str, int]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """(data_inicio, data_fim) de cada seção a partir dos parâmetros da requisição."""
+    hoje = date.today()
+    return {
+        secao: (
+            params.get(f'{secao}_inicio') or (hoje - timedelta(days=dias)).isoformat(),
+            params.get(f'{secao}_fim') or None,
+        )
+        for secao, dias in padroes.items()
+    }
+
+
+def _em_thread(funcao: Callable[[], Any]) -> Callable[[], Any]:
+    def executar():
+        try:
+            return funcao()
+        finally:
+            # a thread do executor não passa pelo ciclo de requisição que fecha conexões
+            close_old_connections()
+    return executar
+
+
+async def _reunir(secoes: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    resultados = await asyncio.gather(*(
+        sync_to_async(_em_thread(funcao), thread_sensitive=False)() for funcao in secoes.values()
+    ))
+    return dict(zip(secoes, resultados))
+
+
+def executar_secoes(secoes: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    """Executa as funções (síncronas, com ORM) em paralelo e devolve {nome: resultado}."""
+    return async_to_sync(_reunir)(secoes)
+
+
+def _secao(model, fk: str, campos: Tuple[str, ...], chave: int, janela: Tuple[str, Optional[str]]):
+    vazia = {'data': [], **{campo: [] for campo in campos}}
+    return lambda: series_por_chave(model, fk, campos, [chave], *janela).get(chave, vazia)
+
+
+def _secoes_fii(fii: FundoImobiliario, janelas_secoes) -> Dict[str, Callable[[], Any]]:
+    return {
+        'historico': _secao(FIIHistoricoPreco, 'fii_id', ('preco_fechamento', 'volume'), fii.id,
+                            janelas_secoes['historico']),
+        'rendimentos': _secao(FIIRendimento, 'fii_id', ('valor_rendimento',), fii.id,
+                              janelas_secoes['rendimentos']),
+        'dy': _secao(FIIDividendYield, 'fii_id', ('dy',), fii.id, janelas_secoes['dy']),
+    }
+
+
+def _secoes_ativo(ativo: Ativo, janelas_secoes) -> Dict[str, Callable[[], Any]]:
+    return {
+        'historico': _secao(HistoricoAtivo, 'ativo_id', ('preco_fechamento', 'volume'), ativo.id,
+                            janelas_secoes['historico']),
+    }
+
+
+def painel_fii(codigo: str, janelas_secoes: Dict[str, Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+    def calcular():
+        fii = get_object_or_404(FundoImobiliario.objects.select_related('segmento'), codigo=codigo)
+        secoes = executar_secoes(_secoes_fii(fii, janelas_secoes))
+        return {'fii': FIISerializer(fii).data, 'janelas': janelas_secoes, **secoes}
+    return obter_ou_calcular('painel_fii', (codigo, sorted(janelas_secoes.items())), calcular)
+
+
+def painel_ativo(codigo: str, janelas_secoes: Dict[str, Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+    def calcular():
+        ativo = get_object_or_404(Ativo.objects.select_related('setor', 'segmento'), codigo=codigo)
+        secoes = executar_secoes(_secoes_ativo(ativo, janelas_secoes))
+        return {'ativo': AtivoSerializer(ativo).data, 'janelas': janelas_secoes, **secoes}
+    return obter_ou_calcular('painel_ativo', (codigo, sorted(janelas_secoes.items())), calcular)
+
+
+async def _apainel(prefixo: str, codigo: str, janelas_secoes, queryset, secoes, serializer, chave_saida: str):
+    chave = await sync_to_async(chave_versionada)(prefixo, codigo, sorted(janelas_secoes.items()))
+    dados = await cache.aget(chave)
+    if dados is None:
+        objeto = await aget_object_or_404(queryset, codigo=codigo)
+        resultados = await _reunir(secoes(objeto, janelas_secoes))
+        dados = {chave_saida: serializer(objeto).data, 'janelas': janelas_secoes, **resultados}
+        await cache.aset(chave, dados, CACHE_TTL)
+    return dados
+
+
+async def apainel_fii(codigo: str, janelas_secoes: Dict[str, Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+    return await _apainel('painel_fii', codigo, janelas_secoes, FundoImobiliario.objects.select_related('segmento'),
+                          _secoes_fii, FIISerializer, 'fii')
+
+
+async def apainel_ativo(codigo: str, janelas_secoes: Dict[str, Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+    return await _apainel('painel_ativo', codigo, janelas_secoes, Ativo.objects.select_related('setor', 'segmento'),
+                          _secoes_ativo, AtivoSerializer, 'ativo')
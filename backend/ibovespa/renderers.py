@@ -0,0 +1,111 @@
+"""
+Renderizadores binários negociados pelo Accept (ou ?format=): MessagePack e Arrow IPC stream.
+
+msgpack e pyarrow são dependências opcionais: cada renderizador só é oferecido pelas views se
+o pacote correspondente estiver instalado (`pip install msgpack pyarrow`).
+
+As listagens do caminho rápido (`renderizacao`) entregam os decimais já como float64 ou como
+inteiros escalados (?decimais=escalado); a escala de cada coluna vai no cabeçalho
+X-Decimais-Escala e, no Arrow, também nos metadados do campo ('escala'), para o cliente
+reconstruir valor = inteiro / 10^escala sem passar por strings.
+"""
+import datetime
+import decimal
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+
+class Colunar(NamedTuple):
+    """Dados de uma listagem em colunas, com o tipo lógico e a escala de cada coluna."""
+    colunas: Dict[str, List[Any]]
+    tipos: Dict[str, str]
+    escalas: Dict[str, int]
+
+
+def _padrao_msgpack(valor):
+    # o que sobra fora do caminho rápido (respostas de serializers ou das análises)
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo não serializável em MessagePack: {type(valor).__name__}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_padrao_msgpack, use_bin_type=True)
+
+
+def _tipo_arrow(tipo: str, escala: Optional[int]):
+    if tipo == 'decimal':
+        return pyarrow.int64() if escala is not None else pyarrow.float64()
+    return {
+        'data': pyarrow.date32(),
+        'datahora': pyarrow.timestamp('us', tz='UTC'),
+        'inteiro': pyarrow.int64(),
+        'float': pyarrow.float64(),
+        'booleano': pyarrow.bool_(),
+    }.get(tipo, pyarrow.string())
+
+
+def _tabela_arrow(data):
+    if isinstance(data, Colunar):
+        campos = [
+            pyarrow.field(nome, _tipo_arrow(data.tipos[nome], data.escalas.get(nome)),
+                          metadata={'escala': str(data.escalas[nome])} if nome in data.escalas else None)
+            for nome in data.colunas
+        ]
+        schema = pyarrow.schema(campos)
+        return pyarrow.table([data.colunas[c.name] for c in campos], schema=schema)
+    # fora do caminho rápido (ou respostas de erro): linhas de dicts planos, tipos inferidos
+    linhas = [data] if isinstance(data, dict) else list(data)
+    return pyarrow.Table.from_pylist([
+        {k: str(v) if isinstance(v, (dict, list, decimal.Decimal)) else v for k, v in linha.items()}
+        for linha in linhas
+    ])
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        tabela = _tabela_arrow(data)
+        saida = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(saida, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        return saida.getvalue().to_pybytes()
+
+
+def renderizadores(colunar: bool = False) -> list:
+    """Renderizadores padrão do DRF mais os binários disponíveis (Arrow só em listagens colunares)."""
+    classes = list(api_settings.DEFAULT_RENDERER_CLASSES)
+    if msgpack is not None:
+        classes.append(MessagePackRenderer)
+    if colunar and pyarrow is not None:
+        classes.append(ArrowStreamRenderer)
+    return classes
@@ -0,0 +1,185 @@
+"""
+Caminho rápido de leitura: monta o JSON das listagens direto de `values_list()`.
+
+Os campos do serializer (já reduzidos por ?fields=/?omit=) são compilados uma vez em
+(nome, coluna, conversor); cada linha vira um dict sem passar pelo `to_representation` de cada
+campo do DRF. Os conversores reproduzem o DRF (decimais quantizados como string, datas ISO 8601,
+'Z' em datetimes UTC, chave omitida quando uma relação intermediária de `source` é nula) e o
+JSON sai com orjson quando instalado, nos mesmos bytes do JSONRenderer. Campos que o
+compilador não conhece fazem a view voltar ao serializer normal.
+
+Para os formatos binários (`renderers`) o mesmo plano troca os conversores: decimais viram float64
+ou inteiros escalados por 10^decimal_places (?decimais=float|escalado) e, no Arrow, datas seguem nativas.
+"""
+import decimal
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from django.utils.http import parse_header_parameters
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import ISO_8601, api_settings
+
+try:
+    import orjson
+except ImportError:  # opcional: sem ele usa json da biblioteca padrão
+    orjson = None
+
+
+MODOS = ('json', 'msgpack', 'arrow')
+DECIMAIS = ('float', 'escalado')
+
+
+class Coluna(NamedTuple):
+    nome: str
+    indice: int
+    converter: Optional[Callable[[Any], Any]]
+    # colunas das relações intermediárias (ex.: setor_id em 'setor.nome'); nula => chave omitida
+    relacoes: Tuple[int, ...]
+    # tipo lógico (decimal, data, datahora, inteiro, float, booleano, texto) e casas dos decimais
+    tipo: str = 'texto'
+    escala: Optional[int] = None
+
+
+class Plano(NamedTuple):
+    caminhos: Tuple[str, ...]
+    colunas: Tuple[Coluna, ...]
+
+    def linha(self, valores: tuple) -> Dict[str, Any]:
+        item = {}
+        for nome, indice, converter, relacoes, *_ in self.colunas:
+            if relacoes and any(valores[r] is None for r in relacoes):
+                continue
+            valor = valores[indice]
+            item[nome] = valor if valor is None or converter is None else converter(valor)
+        return item
+
+    def linhas(self, queryset) -> List[Dict[str, Any]]:
+        linha = self.linha
+        return [linha(valores) for valores in queryset.values_list(*self.caminhos)]
+
+    async def alinhas(self, queryset) -> List[Dict[str, Any]]:
+        """`linhas` com a iteração assíncrona do ORM (a consulta inteira numa só ida ao executor)."""
+        linha = self.linha
+        return [linha(valores) async for valores in queryset.values_list(*self.caminhos)]
+
+    def colunas_valores(self, queryset) -> Dict[str, List[Any]]:
+        """Mesmo conteúdo de `linhas`, em colunas; chaves omitidas viram None."""
+        saida: Dict[str, List[Any]] = {coluna.nome: [] for coluna in self.colunas}
+        for valores in queryset.values_list(*self.caminhos):
+            for nome, indice, converter, relacoes, *_ in self.colunas:
+                valor = None if relacoes and any(valores[r] is None for r in relacoes) else valores[indice]
+                saida[nome].append(valor if valor is None or converter is None else converter(valor))
+        return saida
+
+    def escalas(self) -> Dict[str, int]:
+        return {c.nome: c.escala for c in self.colunas if c.tipo == 'decimal' and c.escala is not None}
+
+
+def _conversor_decimal(campo: serializers.DecimalField, modo: str, decimais: str):
+    if modo != 'json':
+        if decimais == 'float':
+            return float
+        if campo.decimal_places is None:
+            return empty
+        casas = campo.decimal_places
+        return lambda valor: int(decimal.Decimal(valor).scaleb(casas).to_integral_value())
+    if campo.localize or campo.normalize_output or not getattr(campo, 'coerce_to_string', True):
+        return empty
+    if campo.decimal_places is None:
+        return '{:f}'.format
+    contexto = decimal.getcontext().copy()
+    if campo.max_digits is not None:
+        contexto.prec = campo.max_digits
+    expoente = decimal.Decimal('.1') ** campo.decimal_places
+    arredondamento = campo.rounding
+
+    def converter(valor):
+        if not isinstance(valor, decimal.Decimal):
+            valor = decimal.Decimal(str(valor).strip())
+        return '{:f}'.format(valor.quantize(expoente, rounding=arredondamento, context=contexto))
+    return converter
+
+
+def _conversor_datetime(campo: serializers.DateTimeField):
+    formato = getattr(campo, 'format', api_settings.DATETIME_FORMAT)
+    if formato is None or formato.lower() != ISO_8601:
+        return empty
+
+    def converter(valor):
+        texto = campo.enforce_timezone(valor).isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    return converter
+
+
+def _conversor(campo: serializers.Field, modo: str = 'json', decimais: str = 'float') -> Tuple[Any, str]:
+    """(conversor equivalente ao to_representation do campo, tipo lógico); conversor `empty` se não houver."""
+    if isinstance(campo, serializers.DecimalField):
+        return _conversor_decimal(campo, modo, decimais), 'decimal'
+    if isinstance(campo, serializers.DateTimeField):
+        if modo == 'arrow':
+            return campo.enforce_timezone, 'datahora'
+        return _conversor_datetime(campo), 'datahora'
+    if isinstance(campo, serializers.DateField):
+        if modo == 'arrow':
+            return None, 'data'
+        formato = getattr(campo, 'format', api_settings.DATE_FORMAT)
+        return ((lambda valor: valor.isoformat()) if formato and formato.lower() == ISO_8601 else empty), 'data'
+    if isinstance(campo, serializers.ChoiceField):
+        mapa = campo.choice_strings_to_values
+        return (lambda valor: mapa.get(str(valor), valor)), 'texto'
+    if isinstance(campo, serializers.BooleanField):
+        return None, 'booleano'
+    if isinstance(campo, serializers.IntegerField):
+        return int, 'inteiro'
+    if isinstance(campo, serializers.FloatField):
+        return float, 'float'
+    if isinstance(campo, serializers.CharField):
+        return str, 'texto'
+    if isinstance(campo, serializers.PrimaryKeyRelatedField) and campo.pk_field is None:
+        return None, 'inteiro'
+    return empty, 'texto'
+
+
+def compilar(serializer: serializers.Serializer, modo: str = 'json', decimais: str = 'float') -> Optional[Plano]:
+    """Plano de leitura para os campos do serializer; None se algum campo não for suportado."""
+    caminhos: List[str] = []
+    colunas: List[Coluna] = []
+
+    def indice(caminho: str) -> int:
+        if caminho not in caminhos:
+            caminhos.append(caminho)
+        return caminhos.index(caminho)
+
+    for nome, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+        converter, tipo = _conversor(campo, modo, decimais)
+        if converter is empty or campo.source == '*':
+            return None
+        partes = campo.source.split('.')
+        if len(partes) > 1 and (campo.allow_null or campo.default is not empty or campo.required):
+            return None
+        relacoes = tuple(indice('__'.join(partes[:i])) for i in range(1, len(partes)))
+        escala = getattr(campo, 'decimal_places', None) if decimais == 'escalado' else None
+        colunas.append(Coluna(nome, indice('__'.join(partes)), converter, relacoes, tipo, escala))
+    return Plano(tuple(caminhos), tuple(colunas))
+
+
+def aceita_caminho_rapido(request) -> bool:
+    """Só o JSONRenderer padrão, sem indentação pedida no Accept, tem saída reproduzível aqui."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    if type(renderer) is not JSONRenderer or not (renderer.compact and not renderer.ensure_ascii):
+        return False
+    return 'indent' not in parse_header_parameters(request.accepted_media_type or '')[1]
+
+
+def codificar(dados: Any) -> bytes:
+    """Mesmos bytes do JSONRenderer (compacto, UTF-8, \\u2028/\\u2029 escapados)."""
+    if orjson is not None:
+        conteudo = orjson.dumps(dados)
+    else:
+        conteudo = json.dumps(dados, ensure_ascii=False, allow_nan=not api_settings.STRICT_JSON,
+                              separators=(',', ':')).encode()
+    return conteudo.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
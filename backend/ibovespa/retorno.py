@@ -0,0 +1,183 @@
+"""
+Índice de retorno total (proventos reinvestidos) para FIIs e ações.
+
+O índice parte de `base` na primeira data disponível e, a cada pregão, acumula
+(preço + proventos do dia) / preço anterior. Proventos em datas sem pregão são
+reinvestidos no primeiro pregão seguinte. Todas as colunas são processadas juntas.
+
+Para ações o histórico de HistoricoAtivo vem do yfinance com preços já ajustados por
+proventos (auto_adjust), então o índice é calculado sem proventos para não contá-los duas vezes.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backtest import DIAS_UTEIS_ANO
+from .cache import obter_ou_calcular
+from .models import Ativo, FundoImobiliario
+from .series import precos_ativos, precos_fiis, rendimentos_fiis
+
+
+def alinhar_proventos(precos: pd.DataFrame, proventos: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Reposiciona os proventos no primeiro pregão em ou após a data de pagamento."""
+    if proventos is None or proventos.empty:
+        return pd.DataFrame(0.0, index=precos.index, columns=precos.columns)
+    proventos = proventos.reindex(columns=precos.columns).fillna(0.0)
+    pos = precos.index.searchsorted(proventos.index)
+    dentro = pos < len(precos.index)
+    alinhados = proventos[dentro].groupby(pos[dentro]).sum()
+    alinhados = alinhados.reindex(range(len(precos.index)), fill_value=0.0)
+    alinhados.index = precos.index
+    return alinhados
+
+
+def indice_retorno_total(precos: pd.DataFrame, proventos: Optional[pd.DataFrame] = None,
+                         base: float = 100.0) -> pd.DataFrame:
+    """Retorna o índice de retorno total (data x coluna); NaN antes do início de cada série."""
+    if precos.empty:
+        return precos
+    precos = precos.ffill()
+    prov = alinhar_proventos(precos, proventos)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fator = (precos + prov) / precos.shift(1)
+    fator = fator.where(precos.shift(1).notna(), 1.0).where(precos.notna())
+    return fator.fillna(1.0).cumprod().where(precos.notna()) * base
+
+
+def _resumo(indice: pd.Series, precos: pd.Series) -> Dict[str, Any]:
+    validos = indice.dropna()
+    if validos.empty:
+        return {'data_inicio': None, 'data_fim': None, 'retorno_total': None, 'retorno_preco': None}
+    p = precos.dropna()
+    return {
+        'data_inicio': validos.index[0].date().isoformat(),
+        'data_fim': validos.index[-1].date().isoformat(),
+        'retorno_total': round(float(validos.iloc[-1] / validos.iloc[0] - 1.0), 6),
+        'retorno_preco': round(float(p.iloc[-1] / p.iloc[0] - 1.0), 6),
+    }
+
+
+def _serie(codigo: str, indice: pd.Series, precos: pd.Series) -> Dict[str, Any]:
+    validos = indice.dropna()
+    return {
+        'codigo': codigo,
+        **_resumo(indice, precos),
+        'datas': [d.isoformat() for d in validos.index.date],
+        'indice': [round(float(v), 6) for v in validos.to_numpy()],
+    }
+
+
+def retorno_total_fii(fii: FundoImobiliario, data_inicio: Optional[str] = None,
+                      data_fim: Optional[str] = None) -> Dict[str, Any]:
+    def calcular():
+        precos = precos_fiis([fii.id], data_inicio, data_fim)
+        if precos.empty:
+            return _serie(fii.codigo, pd.Series(dtype='float64'), pd.Series(dtype='float64'))
+        indice = indice_retorno_total(precos, rendimentos_fiis([fii.id], data_inicio, data_fim))
+        return _serie(fii.codigo, indice[fii.id], precos[fii.id])
+    return obter_ou_calcular('retorno_total_fii', (fii.id, data_inicio, data_fim), calcular)
+
+
+def retorno_total_ativo(ativo: Ativo, data_inicio: Optional[str] = None,
+                        data_fim: Optional[str] = None) -> Dict[str, Any]:
+    def calcular():
+        precos = precos_ativos([ativo.id], data_inicio, data_fim)
+        if precos.empty:
+            return _serie(ativo.codigo, pd.Series(dtype='float64'), pd.Series(dtype='float64'))
+        indice = indice_retorno_total(precos)
+        return _serie(ativo.codigo, indice[ativo.id], precos[ativo.id])
+    return obter_ou_calcular('retorno_total_ativo', (ativo.id, data_inicio, data_fim), calcular)
+
+
+def _ranking(codigos: Dict[int, str], precos: pd.DataFrame, indice: pd.DataFrame) -> List[Dict[str, Any]]:
+    resultado = []
+    for chave in indice.columns:
+        resultado.append({'codigo': codigos[chave], **_resumo(indice[chave], precos[chave])})
+    resultado.sort(key=lambda r: (r['retorno_total'] is None, -(r['retorno_total'] or 0.0)))
+    return resultado
+
+
+def ranking_retorno_total_fiis(data_inicio: Optional[str] = None, data_fim: Optional[str] = None,
+                               segmento: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Retorno total de todos os FIIs numa única passada (uma consulta por série)."""
+    def calcular():
+        qs = FundoImobiliario.objects.all()
+        if segmento:
+            qs = qs.filter(segmento__nome__iexact=segmento)
+        codigos = dict(qs.values_list('id', 'codigo'))
+        precos = precos_fiis(codigos, data_inicio, data_fim)
+        if precos.empty:
+            return []
+        indice = indice_retorno_total(precos, rendimentos_fiis(codigos, data_inicio, data_fim))
+        return _ranking(codigos, precos, indice)
+    return obter_ou_calcular('ranking_retorno_fiis', (data_inicio, data_fim, segmento), calcular)
+
+
+def ranking_retorno_total_ativos(data_inicio: Optional[str] = None, data_fim: Optional[str] = None,
+                                 setor: Optional[str] = None) -> List[Dict[str, Any]]:
+    def calcular():
+        qs = Ativo.objects.all()
+        if setor:
+            qs = qs.filter(setor__nome__iexact=setor)
+        codigos = dict(qs.values_list('id', 'codigo'))
+        precos = precos_ativos(codigos, data_inicio, data_fim)
+        if precos.empty:
+            return []
+        return _ranking(codigos, precos, indice_retorno_total(precos))
+    return obter_ou_calcular('ranking_retorno_ativos', (data_inicio, data_fim, setor), calcular)
+
+
+def resolver_codigos(codigos: List[str]) -> Tuple[Dict[int, str], Dict[int, str]]:
+    """Resolve códigos de ações e FIIs em uma consulta por tabela; erro se algum não existir."""
+    ativos = dict(Ativo.objects.filter(codigo__in=codigos).values_list('id', 'codigo'))
+    fiis = dict(FundoImobiliario.objects.filter(codigo__in=codigos).values_list('id', 'codigo'))
+    faltando = set(codigos) - set(ativos.values()) - set(fiis.values())
+    if faltando:
+        raise ValueError(f"Códigos não encontrados: {', '.join(sorted(faltando))}")
+    return ativos, fiis
+
+
+def matriz_retorno_total(codigos: List[str], data_inicio: Optional[str] = None,
+                         data_fim: Optional[str] = None, reinvestir: bool = True) -> pd.DataFrame:
+    """Índice de retorno total (data x código) de ações e FIIs, restrito às datas em que todos têm preço."""
+    ativos, fiis = resolver_codigos(codigos)
+    partes = []
+    if ativos:
+        partes.append(indice_retorno_total(precos_ativos(ativos, data_inicio, data_fim)).rename(columns=ativos))
+    if fiis:
+        precos = precos_fiis(fiis, data_inicio, data_fim)
+        proventos = rendimentos_fiis(fiis, data_inicio, data_fim) if reinvestir else None
+        partes.append(indice_retorno_total(precos, proventos).rename(columns=fiis))
+    matriz = pd.concat(partes, axis=1).sort_index().ffill().dropna()
+    return matriz.reindex(columns=[c for c in codigos if c in matriz.columns])
+
+
+def estimativas_media_covariancia(codigos: List[str], data_inicio: Optional[str] = None,
+                                  data_fim: Optional[str] = None, reinvestir: bool = True) -> Dict[str, Any]:
+    """Retorno médio e covariância anualizados dos retornos diários de retorno total.
+
+    Cacheado por (conjunto de códigos, janela, versão dos dados); os códigos saem em ordem alfabética.
+    """
+    ordenados = sorted(set(codigos))
+
+    def calcular():
+        matriz = matriz_retorno_total(ordenados, data_inicio, data_fim, reinvestir=reinvestir)
+        diarios = matriz.pct_change().iloc[1:].to_numpy()
+        return {
+            'codigos': ordenados,
+            'mu': diarios.mean(axis=0) * DIAS_UTEIS_ANO,
+            'cov': np.cov(diarios, rowvar=False, ddof=1).reshape(len(ordenados), len(ordenados)) * DIAS_UTEIS_ANO,
+            'observacoes': len(diarios),
+            'data_inicio': matriz.index[0].date().isoformat() if len(matriz) else None,
+            'data_fim': matriz.index[-1].date().isoformat() if len(matriz) else None,
+        }
+    return obter_ou_calcular('covariancia', (tuple(ordenados), data_inicio, data_fim, reinvestir), calcular)
+
+
+def grupos_codigos(codigos: List[str], agrupar_por: str = 'setor') -> Dict[str, Optional[str]]:
+    """Nome do setor (ou segmento) de cada código; FIIs só têm segmento."""
+    campo = 'setor__nome' if agrupar_por == 'setor' else 'segmento__nome'
+    grupos = dict(Ativo.objects.filter(codigo__in=codigos).values_list('codigo', campo))
+    grupos.update(FundoImobiliario.objects.filter(codigo__in=codigos).values_list('codigo', 'segmento__nome'))
+    return grupos
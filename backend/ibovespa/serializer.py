@@ -1,3 +1,6 @@
+from typing import Iterable, List, Optional, Set, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
 from .models import (
     Ativo,
@@ -8,8 +11,61 @@ from .models import (
     FIIHistoricoPreco,
     FIIRendimento,
     FIIDividendYield,
+    FIIIndicadorMensal,
+    ExecucaoIngestao,
 )
 
+def campos_pedidos(params, disponiveis: Iterable[str]) -> List[str]:
+    """Campos a manter segundo ?fields=a,b (só estes) e ?omit=c (todos menos estes)."""
+    disponiveis = list(disponiveis)
+    fields = [c.strip() for c in params.get('fields', '').split(',') if c.strip()]
+    omit = {c.strip() for c in params.get('omit', '').split(',') if c.strip()}
+    if fields:
+        disponiveis = [c for c in disponiveis if c in fields]
+    return [c for c in disponiveis if c not in omit]
+
+
+class CamposDinamicosMixin:
+    """Limita os campos serializados por ?fields= / ?omit= da requisição do contexto."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        manter = set(campos_pedidos(request.query_params, self.fields.keys()))
+        for nome in list(self.fields):
+            if nome not in manter:
+                self.fields.pop(nome)
+
+
+def colunas_do_serializer(serializer, model) -> Optional[Tuple[Set[str], Set[str]]]:
+    """(campos para .only(), relações para .select_related()) que cobrem os campos do serializer.
+
+    None quando algum campo não corresponde a uma coluna do modelo (ex.: SerializerMethodField).
+    """
+    only: Set[str] = set()
+    relacoes: Set[str] = set()
+    for campo in serializer.fields.values():
+        if isinstance(campo, serializers.SerializerMethodField) or campo.source == '*':
+            return None
+        partes = campo.source.split('.')
+        try:
+            model._meta.get_field(partes[0])
+        except FieldDoesNotExist:
+            return None
+        caminho = '__'.join(partes)
+        if isinstance(campo, serializers.BaseSerializer):
+            relacoes.add(caminho)
+            only.update(f"{caminho}__{sub.source.replace('.', '__')}" for sub in campo.fields.values())
+        elif len(partes) > 1:
+            relacoes.add('__'.join(partes[:-1]))
+            only.add(caminho)
+        else:
+            only.add(caminho)
+    return only, relacoes
+
+
 class SetorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Setor
@@ -20,7 +76,7 @@ class SegmentoSerializer(serializers.ModelSerializer):
         model = Segmento
         fields = ['id', 'nome']
 
-class AtivoSerializer(serializers.ModelSerializer):
+class AtivoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     setor = SetorSerializer(read_only=True)
     segmento = SegmentoSerializer(read_only=True)
 
@@ -28,7 +84,7 @@ class AtivoSerializer(serializers.ModelSerializer):
         model = Ativo
         fields = '__all__'
 
-class AtivoListSerializer(serializers.ModelSerializer):
+class AtivoListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     setor = serializers.CharField(source='setor.nome', read_only=True)
     segmento = serializers.CharField(source='segmento.nome', read_only=True)
 
@@ -36,7 +92,16 @@ class AtivoListSerializer(serializers.ModelSerializer):
         model = Ativo
         fields = ['id', 'codigo', 'nome', 'setor', 'segmento', 'preco_atual', 'variacao', 'dividendo_valor', 'dividendo_percentual']
 
-class HistoricoAtivoSerializer(serializers.ModelSerializer):
+class AtivoCotacaoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Só a cotação: para telas de preço e watchlists que não precisam do cadastro."""
+    class Meta:
+        model = Ativo
+        fields = [
+            'codigo', 'preco_atual', 'variacao', 'fechamento_anterior', 'baixa_do_dia', 'alta_do_dia',
+            'volume', 'data_atualizacao',
+        ]
+
+class HistoricoAtivoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = HistoricoAtivo
         fields = '__all__'
@@ -49,7 +114,7 @@ class FIISegmentoField(serializers.CharField):
         return value or None
 
 
-class FIISerializer(serializers.ModelSerializer):
+class FIISerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     segmento = serializers.CharField(source='segmento.nome', read_only=True)
 
     class Meta:
@@ -64,7 +129,7 @@ class FIISerializer(serializers.ModelSerializer):
         ]
 
 
-class FIIListSerializer(serializers.ModelSerializer):
+class FIIListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     segmento = serializers.CharField(source='segmento.nome', read_only=True)
 
     class Meta:
@@ -75,19 +140,62 @@ class FIIListSerializer(serializers.ModelSerializer):
         ]
 
 
-class FIIHistoricoPrecoSerializer(serializers.ModelSerializer):
+class FIICotacaoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Só a cotação e os indicadores de preço do FII."""
+    class Meta:
+        model = FundoImobiliario
+        fields = ['codigo', 'cotacao_atual', 'dividend_yield_percent', 'p_vp', 'data_atualizacao']
+
+
+class FIIHistoricoPrecoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = FIIHistoricoPreco
         fields = ['id', 'fii', 'data', 'preco_fechamento', 'volume']
 
 
-class FIIRendimentoSerializer(serializers.ModelSerializer):
+class FIIRendimentoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = FIIRendimento
         fields = ['id', 'fii', 'data', 'valor_rendimento']
 
 
-class FIIDividendYieldSerializer(serializers.ModelSerializer):
+class FIIDividendYieldSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = FIIDividendYield
         fields = ['id', 'fii', 'data', 'dy']
+
+
+class FIIIndicadorMensalSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    class Meta:
+        model = FIIIndicadorMensal
+        fields = [
+            'id', 'fii', 'data', 'rendimento', 'rendimento_12m', 'preco_fechamento',
+            'dy_12m', 'yield_on_cost', 'crescimento_rendimento',
+        ]
+
+
+class FIIRankingSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    codigo = serializers.CharField(source='fii.codigo', read_only=True)
+    nome = serializers.CharField(source='fii.nome', read_only=True)
+    segmento = serializers.CharField(source='fii.segmento.nome', read_only=True)
+
+    class Meta:
+        model = FIIIndicadorMensal
+        fields = [
+            'codigo', 'nome', 'segmento', 'data', 'rendimento', 'rendimento_12m', 'preco_fechamento',
+            'dy_12m', 'yield_on_cost', 'crescimento_rendimento',
+        ]
+
+
+class ExecucaoIngestaoSerializer(serializers.ModelSerializer):
+    codigos_por_segundo = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExecucaoIngestao
+        fields = [
+            'id', 'comando', 'inicio', 'fim', 'duracao_segundos', 'status', 'mensagem',
+            'codigos', 'codigos_por_segundo', 'etapas', 'contadores', 'mais_lentos',
+        ]
+
+    def get_codigos_por_segundo(self, obj):
+        return round(obj.codigos / obj.duracao_segundos, 3) if obj.duracao_segundos else None
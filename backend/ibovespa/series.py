@@ -0,0 +1,77 @@
+"""
+Carregamento de séries históricas do banco em matrizes pandas (data x ativo).
+
+Cada função faz uma única consulta por lote de ids, ordenada por (fk, data), e devolve um
+DataFrame com índice de datas (DatetimeIndex) e uma coluna por id de Ativo/FundoImobiliario.
+"""
+from decimal import Decimal
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from .models import HistoricoAtivo, FIIHistoricoPreco, FIIRendimento
+
+# Limite de ids por cláusula IN (SQLite aceita no máximo ~32k variáveis por consulta)
+LOTE_IDS = 500
+
+
+def _matriz(rows: List[tuple]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=['chave', 'data', 'valor'])
+    if df.empty:
+        return pd.DataFrame(dtype='float64')
+    df['data'] = pd.to_datetime(df['data'])
+    df['valor'] = df['valor'].astype('float64')
+    return df.pivot_table(index='data', columns='chave', values='valor', aggfunc='last').sort_index()
+
+
+def _carregar(model, fk: str, campo: str, ids: Iterable[int],
+              data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> pd.DataFrame:
+    ids = list(ids)
+    rows: List[tuple] = []
+    for i in range(0, len(ids), LOTE_IDS):
+        qs = model.objects.filter(**{f'{fk}__in': ids[i:i + LOTE_IDS]})
+        if data_inicio:
+            qs = qs.filter(data__gte=data_inicio)
+        if data_fim:
+            qs = qs.filter(data__lte=data_fim)
+        rows.extend(qs.order_by(fk, 'data').values_list(fk, 'data', campo))
+    return _matriz(rows)
+
+
+def precos_ativos(ativo_ids: Iterable[int], data_inicio: Optional[str] = None,
+                  data_fim: Optional[str] = None) -> pd.DataFrame:
+    return _carregar(HistoricoAtivo, 'ativo_id', 'preco_fechamento', ativo_ids, data_inicio, data_fim)
+
+
+def precos_fiis(fii_ids: Iterable[int], data_inicio: Optional[str] = None,
+                data_fim: Optional[str] = None) -> pd.DataFrame:
+    return _carregar(FIIHistoricoPreco, 'fii_id', 'preco_fechamento', fii_ids, data_inicio, data_fim)
+
+
+def rendimentos_fiis(fii_ids: Iterable[int], data_inicio: Optional[str] = None,
+                     data_fim: Optional[str] = None) -> pd.DataFrame:
+    return _carregar(FIIRendimento, 'fii_id', 'valor_rendimento', fii_ids, data_inicio, data_fim)
+
+
+def series_por_chave(model, fk: str, campos: Sequence[str], ids: Iterable[int],
+                     data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> Dict[int, Dict[str, List[Any]]]:
+    """Séries em formato de colunas ({id: {'data': [...], campo: [...]}}), uma consulta por lote de ids."""
+    ids = list(ids)
+    resultado: Dict[int, Dict[str, List[Any]]] = {}
+    for i in range(0, len(ids), LOTE_IDS):
+        qs = model.objects.filter(**{f'{fk}__in': ids[i:i + LOTE_IDS]})
+        if data_inicio:
+            qs = qs.filter(data__gte=data_inicio)
+        if data_fim:
+            qs = qs.filter(data__lte=data_fim)
+        linhas = qs.order_by(fk, 'data').values_list(fk, 'data', *campos)
+        for chave, grupo in groupby(linhas, key=lambda linha: linha[0]):
+            colunas = list(zip(*grupo))
+            resultado[chave] = {
+                'data': [d.isoformat() for d in colunas[1]],
+                # decimais como string, igual aos serializers do DRF
+                **{campo: [str(v) if isinstance(v, Decimal) else v for v in valores]
+                   for campo, valores in zip(campos, colunas[2:])},
+            }
+    return resultado
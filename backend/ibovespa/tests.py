@@ -1,3 +1,858 @@
-from django.test import TestCase
+import gzip
+import json
+import math
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from statistics import NormalDist
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from . import ao_vivo, backtest, coleta, graficos, indicadores, metricas, middleware, montecarlo, otimizacao, views, views_async
+from .ingestao import DiarioIngestao, FilaIngestao
+from .management.commands import atualizar_tudo, baixar_base_b3
+from .management.commands.baixar_log_fii import _normalize_points, gravar_serie, historico_vetorizado
+from .cache import registrar_alteracao, versao_dados
+from .models import (
+    ConcessaoIngestao, ExecucaoIngestao, FIIDividendYield, FIIHistoricoPreco, FIIIndicadorFonte, FIIIndicadorMensal,
+    Ativo, FIIRendimento, FundoImobiliario, RegistroIngestao, RodadaIngestao, Segmento, Setor,
+)
+
+
+class VersaoDadosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fii = FundoImobiliario.objects.create(codigo='TEST11', nome='Teste')
+        FIIDividendYield.objects.create(fii=self.fii, data=date(2024, 1, 31), dy=Decimal('0.0100'))
+
+    def test_atualizacao_no_lugar_muda_a_versao(self):
+        antes = versao_dados()
+        linha = FIIDividendYield.objects.get(fii=self.fii)
+        linha.dy = Decimal('0.0200')
+        FIIDividendYield.objects.bulk_update([linha], ['dy'])
+        registrar_alteracao()
+        self.assertNotEqual(versao_dados(), antes)
+
+    def test_exclusao_muda_a_versao(self):
+        antes = versao_dados()
+        FIIDividendYield.objects.filter(fii=self.fii).delete()
+        registrar_alteracao()
+        self.assertNotEqual(versao_dados(), antes)
+
+
+class ParametrosCarteiraTests(TestCase):
+    def test_booleano_de_formulario(self):
+        self.assertFalse(views._booleano({'reinvestir': 'false'}, 'reinvestir', True))
+        self.assertFalse(views._booleano({'reinvestir': '0'}, 'reinvestir', True))
+        self.assertTrue(views._booleano({}, 'reinvestir', True))
+        with self.assertRaises(ValidationError):
+            views._booleano({'reinvestir': 'talvez'}, 'reinvestir', True)
+
+    def test_variantes_invalidas_retornam_400(self):
+        usuario = get_user_model().objects.create_user('teste', email='teste@example.com', password='x')
+        for variantes in ([1], 'mensal', [{'custo_bps': 5}, None]):
+            requisicao = APIRequestFactory().post(
+                '/api/ibovespa/backtest/', {'codigos': ['TEST11'], 'variantes': variantes}, format='json',
+            )
+            force_authenticate(requisicao, user=usuario)
+            resposta = views.BacktestAPIView.as_view()(requisicao)
+            self.assertEqual(resposta.status_code, 400, variantes)
+            self.assertIn('variantes', resposta.data)
+
+
+class SimularBacktestTests(TestCase):
+    """Valores calculados à mão para dois ativos meio a meio."""
+    retornos = np.array([[0.0, 0.0], [0.10, -0.05], [0.20, 0.10], [-0.10, 0.05]])
+    pesos = np.array([0.5, 0.5])
+    datas = np.array(['2024-01-30', '2024-01-31', '2024-02-01', '2024-02-02'], dtype='datetime64[D]')
+
+    def test_buy_and_hold(self):
+        inicios = backtest.mascara_rebalanceamento(self.datas, 'nenhum')
+        valores = backtest.simular(self.retornos, self.pesos, inicios)
+        # 0.5 * (1, 1.1, 1.32, 1.188) + 0.5 * (1, 0.95, 1.045, 1.09725)
+        np.testing.assert_allclose(valores, [1.0, 1.025, 1.1825, 1.142625])
+
+    def test_rebalanceamento_mensal(self):
+        inicios = backtest.mascara_rebalanceamento(self.datas, 'mensal')
+        self.assertEqual(inicios.tolist(), [True, False, True, False])
+        valores = backtest.simular(self.retornos, self.pesos, inicios)
+        # volta a 50/50 em 1/fev: 1.025 * (0.5 * 1.2 + 0.5 * 1.1) e 1.025 * (0.5 * 1.08 + 0.5 * 1.155)
+        np.testing.assert_allclose(valores, [1.0, 1.025, 1.17875, 1.1454375])
+
+    def test_custo_de_rebalanceamento(self):
+        inicios = backtest.mascara_rebalanceamento(self.datas, 'mensal')
+        valores = backtest.simular(self.retornos, self.pesos, inicios, custo_bps=100)
+        # pesos à deriva (0.55, 0.475) / 1.025: giro 0.075 / 1.025; custo de 1% sobre ele
+        fim_segmento = 1.025 * (1 - 0.075 / 1.025 * 0.01)
+        self.assertAlmostEqual(fim_segmento, 1.02425)
+        np.testing.assert_allclose(valores, [1.0, 1.025, fim_segmento * 1.15, fim_segmento * 1.1175])
+
+
+class FronteiraEficienteTests(TestCase):
+    """Sem limites ativos o ADMM tem que bater com as soluções fechadas de Markowitz."""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        n = 6
+        fatores = rng.normal(0, 0.2, (n, n))
+        self.cov = fatores @ fatores.T / n + 0.01 * np.eye(n)
+        self.mu = rng.uniform(0.02, 0.15, n)
+        self.grupos = [None] * n
+        self.taxa_livre = 0.03
+        self.inv = np.linalg.inv(self.cov)
+
+    def _fronteira(self):
+        return otimizacao.fronteira_eficiente(
+            self.mu, self.cov, self.grupos, peso_min=-10.0, peso_max=10.0, pontos=20, taxa_livre=self.taxa_livre,
+        )
+
+    def test_minima_variancia(self):
+        um = np.ones(len(self.mu))
+        esperado = self.inv @ um / (um @ self.inv @ um)
+        resultado = self._fronteira()
+        self.assertTrue(resultado['min_variancia']['convergiu'])
+        np.testing.assert_allclose(resultado['min_variancia']['pesos'], esperado, atol=1e-6)
+
+    def test_carteira_tangente(self):
+        esperado = self.inv @ (self.mu - self.taxa_livre)
+        esperado /= esperado.sum()
+        sharpe = (self.mu @ esperado - self.taxa_livre) / np.sqrt(esperado @ self.cov @ esperado)
+        resultado = self._fronteira()
+        self.assertTrue(resultado['max_sharpe']['convergiu'])
+        self.assertEqual(resultado['nao_convergidos'], 0)
+        # o Sharpe é plano no ótimo: a busca no retorno-alvo acerta ele bem antes dos pesos
+        self.assertAlmostEqual(resultado['max_sharpe']['sharpe'], sharpe, places=6)
+        np.testing.assert_allclose(resultado['max_sharpe']['pesos'], esperado, atol=2e-3)
+
+    def test_sem_convergencia_e_sinalizada(self):
+        with mock.patch.object(otimizacao, 'MAX_ITERACOES', 10):
+            resultado = self._fronteira()
+        self.assertFalse(resultado['min_variancia']['convergiu'])
+        self.assertGreater(resultado['nao_convergidos'], 0)
+
+
+class ExportacaoTests(TestCase):
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(
+            get_user_model().objects.create_user('exporta', email='exporta@example.com', password='x')
+        )
+        fii = FundoImobiliario.objects.create(codigo='TEST11', nome='Teste')
+        FIIDividendYield.objects.create(fii=fii, data=date(2024, 1, 31), dy=Decimal('0.0100'))
+
+    def test_data_invalida_retorna_400_antes_do_streaming(self):
+        for valor in ('notadate', '2024-13-45'):
+            resposta = self.cliente.get('/api/ibovespa/exportar/dy_fiis/', {'data_inicio': valor})
+            self.assertEqual(resposta.status_code, 400, valor)
+            self.assertIn('data_inicio', resposta.json())
+
+    def test_gzip_sai_como_arquivo_gz(self):
+        resposta = self.cliente.get('/api/ibovespa/exportar/dy_fiis/', {'gzip': '1', 'data_inicio': '2024-01-01'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/gzip')
+        self.assertNotIn('Content-Encoding', resposta)
+        self.assertIn('dy_fiis.ndjson.gz', resposta['Content-Disposition'])
+        linhas = gzip.decompress(b''.join(resposta.streaming_content)).decode().splitlines()
+        self.assertEqual(linhas, ['{"codigo":"TEST11","data":"2024-01-31","dy":"0.010000"}'])
+
+
+class CompressaoTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser('admin', email='admin@example.com', password='x')
+        for _ in range(5):
+            ExecucaoIngestao.objects.create(comando='baixar_log_fii', inicio=timezone.now(), fim=timezone.now(),
+                                            duracao_segundos=1.0, status='ok')
+
+    def test_api_json_e_comprimida(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        resposta = cliente.get('/api/ibovespa/ingestao/execucoes/', HTTP_ACCEPT='application/json',
+                               HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resposta['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(resposta.content).startswith(b'['))
+
+    def test_resposta_grande_nao_vai_para_o_cache(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        with mock.patch.object(middleware, 'TAMANHO_MAXIMO_CACHE', 300), \
+                mock.patch.object(middleware.cache, 'set') as guardar:
+            resposta = cliente.get('/api/ibovespa/ingestao/execucoes/', HTTP_ACCEPT='application/json',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resposta['Content-Encoding'], 'gzip')
+        guardar.assert_not_called()
+
+    def test_html_com_csrf_nao_e_comprimido(self):
+        self.client.force_login(self.admin)
+        resposta = self.client.get('/admin/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('Content-Encoding', resposta)
+
+        # API navegável do DRF: HTML com formulário e token CSRF
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        resposta = cliente.get('/api/ibovespa/ingestao/execucoes/', HTTP_ACCEPT='text/html',
+                               HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('Content-Encoding', resposta)
+
+
+class TicketAoVivoTests(TestCase):
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user('sse', email='sse@example.com', password='x')
+
+    def _autenticar(self, ticket):
+        requisicao = RequestFactory().get('/api/ibovespa/async/cotacoes/stream/', {'ativos': 'PETR4', 'ticket': ticket})
+        return views_async.CotacoesAoVivoAsyncView().autenticar(requisicao)
+
+    def test_ticket_emitido_pela_api_abre_o_stream(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        resposta = cliente.post('/api/ibovespa/cotacoes/stream/ticket/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(ao_vivo.usuario_do_ticket(resposta.data['ticket']), self.usuario.pk)
+
+    async def test_ticket_valido_autentica(self):
+        usuario = await self._autenticar(ao_vivo.emitir_ticket(self.usuario))
+        self.assertEqual(usuario.pk, self.usuario.pk)
+
+    async def test_ticket_adulterado_ou_vencido_e_recusado(self):
+        ticket = ao_vivo.emitir_ticket(self.usuario)
+        with self.assertRaises(AuthenticationFailed):
+            await self._autenticar(ticket + 'x')
+        with mock.patch.object(ao_vivo, 'VALIDADE_TICKET', -1), self.assertRaises(AuthenticationFailed):
+            await self._autenticar(ticket)
+
+
+class ColetaTests(TestCase):
+    class _Erro(Exception):
+        def __init__(self, mensagem, status=None):
+            super().__init__(mensagem)
+            self.response = mock.Mock(status_code=status) if status else None
+
+    def test_limite_so_pelo_status_ou_tipo(self):
+        self.assertTrue(coleta.eh_limite_taxa(self._Erro('qualquer', status=429)))
+        self.assertFalse(coleta.eh_limite_taxa(self._Erro('404 Client Error: PETR4 id=14290', status=404)))
+        self.assertFalse(coleta.eh_limite_taxa(ValueError('volume 1429 inválido')))
+
+    def test_aviso_de_limitacao_sai_na_thread_consumidora(self):
+        tentativas, threads_aviso = {}, []
+
+        def funcao(item):
+            tentativas[item] = tentativas.get(item, 0) + 1
+            if item == 'B' and tentativas[item] == 1:
+                raise self._Erro('Too Many Requests', status=429)
+            return item.lower()
+
+        limitador = coleta.LimitadorTaxa(0)
+        with mock.patch.object(coleta.LimitadorTaxa, 'penalizar', return_value=0.0):
+            resultados = list(coleta.coletar_em_paralelo(
+                funcao, ['A', 'B', 'C'], limitador, workers=3,
+                ao_limitar=lambda item, pausa: threads_aviso.append((item, threading.current_thread())),
+            ))
+        self.assertEqual(sorted(r for _, r, _ in resultados), ['a', 'b', 'c'])
+        self.assertEqual(threads_aviso, [('B', threading.current_thread())])
+
+
+class DiarioIngestaoTests(TestCase):
+    codigos = ['AAAA11', 'BBBB11', 'XXXX11']
+
+    def test_resume_continua_so_a_execucao_interrompida(self):
+        ontem = DiarioIngestao('baixar_log_fii')
+        for codigo in self.codigos:
+            ontem.concluir(codigo, codigo)
+        ontem.encerrar()
+        # hoje: interrompida antes de XXXX11
+        hoje = DiarioIngestao('baixar_log_fii')
+        hoje.concluir('AAAA11', 'a')
+        hoje.falhar('BBBB11', ValueError('timeout'))
+
+        retomada = DiarioIngestao('baixar_log_fii', retomar=True)
+        self.assertTrue(retomada.retomada)
+        self.assertEqual(retomada.rodada, hoje.rodada)
+        self.assertEqual(retomada.pendentes(self.codigos), ['BBBB11', 'XXXX11'])
+
+    def test_resume_sem_execucao_interrompida_comeca_do_zero(self):
+        anterior = DiarioIngestao('baixar_log_fii')
+        anterior.concluir('AAAA11', 'a')
+        anterior.encerrar()
+        nova = DiarioIngestao('baixar_log_fii', retomar=True)
+        self.assertFalse(nova.retomada)
+        self.assertEqual(nova.pendentes(self.codigos), self.codigos)
+
+    def test_particoes_e_registros_por_execucao(self):
+        shard = DiarioIngestao('baixar_log_fii', particao_='shard 0/2')
+        shard.concluir('AAAA11', 'a')
+        self.assertFalse(DiarioIngestao('baixar_log_fii', retomar=True, particao_='shard 1/2').retomada)
+
+        DiarioIngestao('baixar_log_fii').concluir('AAAA11', 'b')
+        assinaturas = set(RegistroIngestao.objects.filter(codigo='AAAA11').values_list('assinatura', flat=True))
+        self.assertEqual(len(assinaturas), 2)
+        self.assertEqual(RodadaIngestao.objects.filter(comando='baixar_log_fii').count(), 3)
+
+
+    def test_limpeza_nao_apaga_a_rodada_interrompida(self):
+        interrompida = DiarioIngestao('baixar_log_fii')
+        interrompida.concluir('AAAA11', 'a')
+        with mock.patch('ibovespa.ingestao.RODADAS_GUARDADAS', 2):
+            for _ in range(3):
+                DiarioIngestao('baixar_log_fii', particao_='shard 0/2').encerrar()
+            for _ in range(3):
+                DiarioIngestao('baixar_log_fii').encerrar()
+            retomada = DiarioIngestao('baixar_log_fii', retomar=True)
+        self.assertEqual(retomada.rodada, interrompida.rodada)
+        self.assertEqual(retomada.pendentes(self.codigos), ['BBBB11', 'XXXX11'])
+        # guardadas por partição: 2 completas de cada, além da interrompida
+        self.assertEqual(RodadaIngestao.objects.filter(particao='shard 0/2').count(), 2)
+        self.assertEqual(RodadaIngestao.objects.filter(particao='', fim__isnull=False).count(), 2)
+
+
+class FilaIngestaoTests(TestCase):
+    def setUp(self):
+        self.a = FilaIngestao('baixar_log_fii', 'r1', segundos=60)
+        self.b = FilaIngestao('baixar_log_fii', 'r1', segundos=60)
+        self.a.dono, self.b.dono = 'host:1', 'host:2'
+        self.a.abastecer(['AAAA11', 'BBBB11'])
+        self.b.abastecer(['AAAA11', 'BBBB11'])
+
+    def _depois(self, segundos):
+        return mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=segundos))
+
+    def test_concessao_exclusiva(self):
+        primeiro, segundo = self.a.pegar(), self.b.pegar()
+        self.assertEqual({primeiro, segundo}, {'AAAA11', 'BBBB11'})
+        self.assertIsNone(self.a.pegar())
+        self.assertIsNone(self.b.pegar())
+
+    def test_concessao_expirada_passa_para_outro(self):
+        codigo = self.a.pegar()
+        self.b.finalizar(self.b.pegar())
+        with self._depois(61):
+            self.assertEqual(self.b.pegar(), codigo)
+            self.assertFalse(self.a.renovar(codigo))
+            # quem perdeu a concessão não finaliza o código do outro
+            self.assertFalse(self.a.finalizar(codigo))
+            self.assertTrue(self.b.finalizar(codigo))
+        self.assertIsNotNone(ConcessaoIngestao.objects.get(rodada='r1', codigo=codigo).finalizado_em)
+
+    def test_renovar_impede_a_tomada(self):
+        codigo = self.a.pegar()
+        self.b.finalizar(self.b.pegar())
+        with self._depois(50):
+            self.assertTrue(self.a.renovar(codigo))
+        with self._depois(100):
+            self.assertIsNone(self.b.pegar())
+
+    def test_iteracao_finaliza_e_renova_o_atual(self):
+        vistos = []
+        for codigo in self.a:
+            self.assertEqual(self.a.atual, codigo)
+            self.assertTrue(self.a.renovar())
+            vistos.append(codigo)
+        self.assertEqual(sorted(vistos), ['AAAA11', 'BBBB11'])
+        self.assertIsNone(self.a.atual)
+        self.assertFalse(ConcessaoIngestao.objects.filter(rodada='r1', finalizado_em__isnull=True).exists())
+        self.assertEqual(list(self.b), [])
+
+
+class HistoricoVetorizadoTests(TestCase):
+    # um payload por formato aceito pelo cot_hist
+    payloads = {
+        'lista_ms': [[1704153600000, 10.5], [1704240000000, 10.75]],
+        'lista_ms_volume': [[1704153600000, 10.5, 1000], [1704240000000, 10.75, 2500.0]],
+        'dict_data': {'data': [[1704153600000, '10,50', '1.000']]},
+        'dict_br': [{'Data': '02/01/2024', 'Preco': '10,50', 'Volume': '1.000'},
+                    {'Data': '03/01/2024', 'Preco': '1.234,56', 'Volume': '12.345.678'}],
+        'dict_iso': [{'date': '2024-01-02', 'close': '10.5', 'volume': '1000'},
+                     {'date': '2024-01-03', 'close': 10.75, 'volume': 7}],
+        'dict_epoch_texto': [{'x': '1704153600', 'y': '10,5', 'v': '1.500'}],
+        'volume_misto': [{'Data': '02/01/2024', 'Preco': '10,50', 'Volume': 1500.0},
+                         {'Data': '03/01/2024', 'Preco': '10,60', 'Volume': '2.000'}],
+    }
+
+    def _vetorizado(self, payload):
+        df = historico_vetorizado(payload)
+        return [(d, Decimal(str(p)), None if pd.isna(v) else int(v))
+                for d, p, v in df[['data', 'preco', 'volume']].itertuples(index=False)]
+
+    def test_igual_ao_ponto_a_ponto_em_cada_formato(self):
+        for nome, payload in self.payloads.items():
+            with self.subTest(nome):
+                pontos = _normalize_points(payload)
+                self.assertTrue(pontos)
+                self.assertEqual(self._vetorizado(payload), pontos)
+
+    def test_volume_com_ponto_de_milhar(self):
+        payload = [{'Data': '02/01/2024', 'Preco': '10,50', 'Volume': '1.000'}]
+        self.assertEqual(_normalize_points(payload), [(date(2024, 1, 2), Decimal('10.50'), 1000)])
+        self.assertEqual(self._vetorizado(payload), [(date(2024, 1, 2), Decimal('10.5'), 1000)])
+
+
+class ExtrairSeriesTests(TestCase):
+    # trecho real da fii_graficos.php, com o bloco de DY depois do código de cada caso
+    dy = 'var dataSerieDividendYield = [[1704153600000, 0.85], [1706745600000, 0.9]];\n'
+    pushes = 'labelsRendimento.push(1704153600000);\ndataSerieRendimento.push(0.1);\n'
+
+    def _confere(self, antes):
+        series = graficos.extrair_series('<script>\n' + antes + '\n' + self.dy + self.pushes + '</script>')
+        self.assertEqual(series['dataSerieDividendYield'].textos, ['0.85', '0.9'])
+        self.assertEqual(series['dataSerieDividendYield'].datas.tolist(),
+                         [date(2024, 1, 2), date(2024, 2, 1)])
+        self.assertEqual(series['dataSerieRendimento'].textos, ['0.1'])
+        self.assertEqual(series['labelsRendimento'].textos, ['1704153600000'])
+        return series
+
+    def test_comparacoes_nao_abrem_bloco(self):
+        for trecho in ('if (a.length == [].length) {}', 'var x = d >= [1][0] ? 1 : 0;'):
+            with self.subTest(trecho):
+                series = self._confere(trecho)
+                self.assertEqual(set(series), {'dataSerieDividendYield', 'dataSerieRendimento', 'labelsRendimento'})
+
+    def test_array_sem_ponto_e_virgula_termina_no_proprio_colchete(self):
+        series = self._confere('var eixo = [0, 1]')
+        self.assertNotIn('eixo', series)
+
+    def test_colchete_em_string_e_blocos_aninhados(self):
+        series = self._confere('var rotulos = ["]", \'[\', [[1704153600000, 5]]]')
+        self.assertEqual(series['rotulos'].textos, ['5'])
+
+    def test_date_utc_soltos(self):
+        series = self._confere('data: [[Date.UTC(2024, 0, 2), 10.5], [Date.UTC(2024, 1, 1), 11]]')
+        self.assertEqual(series[graficos.SERIE_DATE_UTC].textos, ['10.5', '11'])
+        self.assertEqual(series[graficos.SERIE_DATE_UTC].datas.tolist(), [date(2024, 1, 2), date(2024, 2, 1)])
+
+
+class ViewsAsyncTests(TestCase):
+    def test_views_concretas_implementam_os_ganchos(self):
+        bases = (views_async.LeituraAsyncView, views_async.JsonAsyncView)
+        for nome in dir(views_async):
+            classe = getattr(views_async, nome)
+            if isinstance(classe, type) and issubclass(classe, bases[0]) and nome.endswith('AsyncView'):
+                with self.subTest(nome):
+                    if classe in bases:
+                        self.assertTrue(classe.__abstractmethods__)
+                    else:
+                        self.assertFalse(classe.__abstractmethods__)
+
+
+class MonteCarloTests(TestCase):
+    def setUp(self):
+        self.retornos = np.random.default_rng(7).normal(0.0005, 0.01, size=(500, 2))
+        self.pesos = np.array([0.6, 0.4])
+
+    def test_mesma_semente_mesmo_resultado_com_qualquer_numero_de_processos(self):
+        # lotes de 500 caminhos: 10 lotes repartidos entre os processos
+        with mock.patch.object(montecarlo, 'MAX_ELEMENTOS_LOTE', 50_000):
+            resultados = [
+                montecarlo.simular_carteira(self.retornos, self.pesos, 100, 5000, semente=42, processos=processos)
+                for processos in (1, 2, 3)
+            ]
+        self.assertEqual([r['processos'] for r in resultados], [1, 2, 3])
+        for resultado in resultados[1:]:
+            self.assertEqual(resultado['percentis'], resultados[0]['percentis'])
+            self.assertEqual(resultado['prob_perda'], resultados[0]['prob_perda'])
+            np.testing.assert_allclose(resultado['media'], resultados[0]['media'], rtol=1e-12)
+
+    def test_percentis_normal_batem_com_a_lognormal(self):
+        horizonte = 20
+        resultado = montecarlo.simular_carteira(self.retornos, self.pesos, horizonte, 200_000,
+                                                metodo='normal', semente=1)
+        log_hist = np.log1p(self.retornos @ self.pesos)
+        media, desvio = log_hist.mean(), log_hist.std(ddof=1)
+        largura = (montecarlo.LOG_MAX - montecarlo.LOG_MIN) / montecarlo.BINS
+        for q, serie in resultado['percentis'].items():
+            z = NormalDist().inv_cdf(float(q) / 100)
+            for passo, valor in zip(resultado['passos'], serie):
+                esperado = passo * media + math.sqrt(passo) * desvio * z
+                self.assertLessEqual(abs(math.log(valor) - esperado), largura, (q, passo))
+
+    def test_perda_total_num_dia_levanta_erro(self):
+        retornos = self.retornos.copy()
+        retornos[10] = [-0.5, 0.2]
+        with self.assertRaises(ValueError):
+            montecarlo.simular_carteira(retornos, np.array([3.0, -2.0]), 10, 100, semente=1)
+
+    def test_limites_da_requisicao(self):
+        usuario = get_user_model().objects.create_user('simula', email='simula@example.com', password='x')
+        base = {'codigos': ['TEST11'], 'pesos': [1]}
+        for extra, campo in (({'caminhos': 1_000_000, 'horizonte': 252 * 30}, 'caminhos'),
+                             ({'valor_inicial': 'nan'}, 'valor_inicial'),
+                             ({'valor_inicial': 'inf'}, 'valor_inicial'),
+                             ({'valor_inicial': 0}, 'valor_inicial')):
+            requisicao = APIRequestFactory().post('/api/ibovespa/simulacao/', {**base, **extra}, format='json')
+            force_authenticate(requisicao, user=usuario)
+            resposta = views.SimulacaoAPIView.as_view()(requisicao)
+            self.assertEqual(resposta.status_code, 400, extra)
+            self.assertIn(campo, resposta.data)
+
+
+class IndicadoresFIITests(TestCase):
+    """Rendimento de 1,00 por mês em 2023 e 1,20 em jan/2024; preço 100 até dez/2023 e 120 em jan/2024."""
+    meses = pd.period_range('2023-01', '2024-01', freq='M')
+
+    def _series(self, fii_id=1):
+        rend = pd.DataFrame({'fii_id': fii_id, 'data': [m.start_time + pd.Timedelta(days=14) for m in self.meses],
+                             'valor': [1.0] * 12 + [1.2]})
+        precos = pd.DataFrame({'fii_id': fii_id, 'data': [m.end_time.normalize() for m in self.meses],
+                               'valor': [100.0] * 12 + [120.0]})
+        return rend, precos
+
+    def test_calcular_indicadores(self):
+        df = indicadores.calcular_indicadores(*self._series()).set_index('data')
+        self.assertEqual(len(df), 13)
+        self.assertTrue(df.loc[date(2023, 11, 30), ['rendimento_12m', 'dy_12m', 'yield_on_cost']].isna().all())
+        dezembro = df.loc[date(2023, 12, 31)]
+        self.assertAlmostEqual(dezembro['rendimento_12m'], 12.0)
+        self.assertAlmostEqual(dezembro['dy_12m'], 0.12)
+        self.assertTrue(np.isnan(dezembro['yield_on_cost']))  # sem preço de dez/2022
+        self.assertAlmostEqual(dezembro['crescimento_rendimento'], 0.0)
+        janeiro = df.loc[date(2024, 1, 31)]
+        self.assertAlmostEqual(janeiro['rendimento_12m'], 12.2)
+        self.assertAlmostEqual(janeiro['dy_12m'], 12.2 / 120)
+        self.assertAlmostEqual(janeiro['yield_on_cost'], 12.2 / 100)
+        self.assertAlmostEqual(janeiro['crescimento_rendimento'], 0.2)
+
+    def test_fii_sem_linhas_de_origem_perde_os_indicadores(self):
+        fii = FundoImobiliario.objects.create(codigo='TEST11', nome='Teste')
+        rend, precos = self._series(fii.pk)
+        FIIRendimento.objects.bulk_create(
+            FIIRendimento(fii=fii, data=d.date(), valor_rendimento=Decimal(str(v))) for d, v in zip(rend['data'], rend['valor'])
+        )
+        FIIHistoricoPreco.objects.bulk_create(
+            FIIHistoricoPreco(fii=fii, data=d.date(), preco_fechamento=Decimal(str(v)))
+            for d, v in zip(precos['data'], precos['valor'])
+        )
+        self.assertEqual(indicadores.atualizar_indicadores(), (1, 13))
+        self.assertEqual(indicadores.atualizar_indicadores(), (0, 0))
+
+        FIIRendimento.objects.filter(fii=fii).delete()
+        FIIHistoricoPreco.objects.filter(fii=fii).delete()
+        self.assertEqual(indicadores.atualizar_indicadores(), (1, 0))
+        self.assertFalse(FIIIndicadorMensal.objects.filter(fii=fii).exists())
+        self.assertFalse(FIIIndicadorFonte.objects.filter(fii=fii).exists())
+        self.assertEqual(indicadores.atualizar_indicadores(), (0, 0))
+
+
+class FiltrosDeDataTests(TestCase):
+    def setUp(self):
+        usuario = get_user_model().objects.create_user('datas', email='datas@example.com', password='x')
+        # token de verdade: as views assíncronas não passam pela autenticação do DRF
+        self.cliente = APIClient()
+        self.cliente.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=usuario).key}')
+        FundoImobiliario.objects.create(codigo='TEST11', nome='Teste')
+
+    def test_datas_invalidas_retornam_400(self):
+        casos = (
+            ('/api/ibovespa/historico/', {'codigos': 'PETR4', 'data_inicio': 'notadate'}, 'data_inicio'),
+            ('/api/ibovespa/fiis/historico/', {'codigos': 'TEST11', 'data_fim': '2024-13-45'}, 'data_fim'),
+            ('/api/ibovespa/fiis/retorno_total/', {'data_inicio': 'ontem'}, 'data_inicio'),
+            ('/api/ibovespa/fiis/TEST11/retorno_total/', {'data_fim': '2024-02-30'}, 'data_fim'),
+            ('/api/ibovespa/fiis/TEST11/indicadores/', {'data_inicio': 'x'}, 'data_inicio'),
+            ('/api/ibovespa/fiis/TEST11/painel/', {'dy_inicio': '31/01/2024'}, 'dy_inicio'),
+            ('/api/ibovespa/async/fiis/TEST11/painel/', {'historico_fim': 'x'}, 'historico_fim'),
+        )
+        for url, params, campo in casos:
+            with self.subTest(url):
+                resposta = self.cliente.get(url, params)
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn(campo, resposta.json())
+
+    def test_datas_invalidas_no_corpo(self):
+        for url in ('/api/ibovespa/backtest/', '/api/ibovespa/simulacao/', '/api/ibovespa/fronteira/'):
+            with self.subTest(url):
+                resposta = self.cliente.post(url, {'codigos': ['TEST11', 'XPTO11'], 'data_inicio': 20240101},
+                                             format='json')
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn('data_inicio', resposta.json())
+
+    def test_data_valida(self):
+        resposta = self.cliente.get('/api/ibovespa/fiis/historico/', {'codigos': 'TEST11', 'data_inicio': '2024-01-01'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['series']['TEST11']['data'], [])
+
+
+class ComandoDeTeste(metricas.ComandoComMetricas):
+    def add_arguments(self, parser):
+        parser.add_argument('--grava', action='store_true')
+        parser.add_argument('--falha', action='store_true')
+
+    def handle(self, *args, **options):
+        with self.metricas.medir('http', 'AAAA11'):
+            pass
+        self.metricas.contar('codigos_ok')
+        if options['grava']:
+            self.marcar_dados_alterados()
+        if options['falha']:
+            raise ValueError('sem conexão')
+
+
+class MetricasTests(TestCase):
+    def test_totais_por_etapa_e_por_codigo(self):
+        m = metricas.Metricas('baixar_log_fii')
+        m.registrar('http', 1.0, 'AAAA11')
+        m.registrar('http', 2.0, 'BBBB11')
+        m.registrar('banco', 0.5, 'AAAA11')
+        m.contar('linhas_gravadas', 10)
+        m.contar('linhas_gravadas', 5)
+        resumo = m.resumo()
+        self.assertEqual(resumo['etapas'], {
+            'banco': {'segundos': 0.5, 'chamadas': 1, 'maior_segundos': 0.5},
+            'http': {'segundos': 3.0, 'chamadas': 2, 'maior_segundos': 2.0},
+        })
+        self.assertEqual(resumo['codigos'], 2)
+        self.assertEqual(resumo['contadores'], {'linhas_gravadas': 15})
+        self.assertEqual(resumo['mais_lentos'], [['BBBB11', 2.0], ['AAAA11', 1.5]])
+
+    def test_execucao_com_sucesso(self):
+        versao = versao_dados()
+        call_command(ComandoDeTeste())
+        execucao = ExecucaoIngestao.objects.get()
+        self.assertEqual((execucao.comando, execucao.status, execucao.mensagem), ('tests', 'ok', ''))
+        self.assertEqual(execucao.codigos, 1)
+        self.assertEqual(execucao.contadores, {'codigos_ok': 1})
+        self.assertEqual(execucao.etapas['http']['chamadas'], 1)
+        # não gravou nada: o cache das respostas continua valendo
+        self.assertEqual(versao_dados(), versao)
+
+        call_command(ComandoDeTeste(), grava=True)
+        self.assertNotEqual(versao_dados(), versao)
+
+    def test_execucao_com_erro(self):
+        with self.assertRaises(ValueError):
+            call_command(ComandoDeTeste(), falha=True)
+        execucao = ExecucaoIngestao.objects.get()
+        self.assertEqual(execucao.status, 'erro')
+        self.assertEqual(execucao.mensagem, 'ValueError: sem conexão')
+
+    def test_exportacao_prom_e_json(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            prom, js = os.path.join(pasta, 'ingestao.prom'), os.path.join(pasta, 'ingestao.json')
+            call_command(ComandoDeTeste(), metricas=prom)
+            with self.assertRaises(ValueError):
+                call_command(ComandoDeTeste(), metricas=js, falha=True)
+            with open(prom, encoding='utf-8') as arquivo:
+                linhas = arquivo.read().splitlines()
+            with open(js, encoding='utf-8') as arquivo:
+                resumo = json.load(arquivo)
+            self.assertEqual(sorted(os.listdir(pasta)), ['ingestao.json', 'ingestao.prom'])
+        self.assertIn('ibovespa_ingestao_sucesso{comando="tests"} 1', linhas)
+        self.assertIn('ibovespa_ingestao_etapa_chamadas{comando="tests",etapa="http"} 1', linhas)
+        self.assertIn('ibovespa_ingestao_contador{comando="tests",nome="codigos_ok"} 1', linhas)
+        self.assertEqual(resumo['status'], 'erro')
+        self.assertEqual(resumo['contadores'], {'codigos_ok': 1})
+        self.assertEqual(resumo['mais_lentos'][0][0], 'AAAA11')
+
+
+def _bloco_b3(*registros):
+    return pd.DataFrame.from_records(registros, columns=baixar_base_b3.COLUNAS).astype(baixar_base_b3.TIPOS_NUMERICOS)
+
+
+class SalvarBaseB3Tests(TestCase):
+    def setUp(self):
+        energia = Setor.objects.create(nome='Energia')
+        Ativo.objects.create(codigo='PETR4.SA', nome='Antigo', preco_atual=Decimal('10'), volume=5, setor=energia)
+        self.antes = timezone.now() - timedelta(days=1)
+        Ativo.objects.filter(codigo='PETR4.SA').update(data_atualizacao=self.antes)
+
+    def test_upsert_em_lote(self):
+        bloco = _bloco_b3(
+            {'Codigo': 'PETR4.SA', 'Nome': 'Petrobras', 'Preco_atual': 38.5, 'Setor': 'Oil & Gas Integrated',
+             'Segmento': 'Energy', 'Volume': float('nan')},
+            {'Codigo': 'VALE3.SA', 'Nome': 'Vale', 'Setor': '', 'Segmento': '', 'Funcionarios': 1000},
+        )
+        self.assertEqual(baixar_base_b3.Command().salvar_no_banco(bloco), 2)
+
+        petr = Ativo.objects.select_related('setor', 'segmento').get(codigo='PETR4.SA')
+        self.assertEqual(petr.nome, 'Petrobras')
+        self.assertEqual(petr.preco_atual, Decimal('38.5'))
+        self.assertIsNone(petr.volume)  # NaN -> NULL, também sobre um valor existente
+        self.assertEqual((petr.setor.nome, petr.segmento.nome), ('Oil & Gas Integrated', 'Energy'))
+        self.assertGreater(petr.data_atualizacao, self.antes)
+
+        vale = Ativo.objects.get(codigo='VALE3.SA')
+        self.assertEqual(vale.funcionarios, 1000)
+        self.assertIsNone(vale.preco_atual)
+        self.assertEqual(vale.descricao, '')  # texto ausente vira '' (campo não nulo)
+        self.assertIsNone(vale.setor_id)
+        self.assertIsNone(vale.segmento_id)
+        self.assertFalse(Setor.objects.filter(nome='').exists())
+        self.assertFalse(Segmento.objects.filter(nome='').exists())
+        self.assertEqual(Setor.objects.count(), 2)
+
+
+class LerStagingTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = pasta.name
+
+    def _verificar_tipos(self, bloco):
+        self.assertEqual(list(bloco.columns), baixar_base_b3.COLUNAS)
+        self.assertEqual(str(bloco['Funcionarios'].dtype), 'Int64')
+        self.assertEqual(str(bloco['Volume'].dtype), 'Int64')
+        self.assertEqual(str(bloco['Preco_atual'].dtype), 'float64')
+        self.assertEqual(bloco['Codigo'].dtype, object)
+
+    def test_ndjson_com_ultima_linha_truncada(self):
+        caminho = os.path.join(self.pasta, 'dados_b3.ndjson')
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps({'Codigo': 'PETR4.SA', 'Preco_atual': 38.5, 'Funcionarios': 45000}) + '\n')
+            arquivo.write(json.dumps({'Codigo': 'VALE3.SA', 'Volume': 123}) + '\n')
+            arquivo.write('{"Codigo": "ITUB4.SA", "Preco_at')
+        blocos = list(baixar_base_b3.ler_staging(caminho, linhas_por_bloco=1))
+        self.assertEqual(len(blocos), 2)
+        for bloco in blocos:
+            self._verificar_tipos(bloco)
+        bloco = pd.concat(blocos, ignore_index=True)
+        self.assertEqual(bloco['Codigo'].tolist(), ['PETR4.SA', 'VALE3.SA'])
+        self.assertEqual(bloco['Funcionarios'].tolist(), [45000, pd.NA])
+        self.assertEqual(bloco['Volume'].tolist(), [pd.NA, 123])
+
+    def test_csv_legado(self):
+        caminho = os.path.join(self.pasta, 'dados_b3.csv')
+        pd.DataFrame.from_records(
+            [{'Codigo': 'PETR4.SA', 'Nome': 'Petrobras', 'Preco_atual': 38.5, 'Funcionarios': 45000, 'Sobre': '123'},
+             {'Codigo': 'VALE3.SA', 'Nome': 'Vale', 'Volume': 10}],
+            columns=baixar_base_b3.COLUNAS,
+        ).to_csv(caminho, sep=';', index=False)
+        [bloco] = list(baixar_base_b3.ler_staging(caminho))
+        self._verificar_tipos(bloco)
+        self.assertEqual(bloco['Codigo'].tolist(), ['PETR4.SA', 'VALE3.SA'])
+        self.assertEqual(bloco['Sobre'].iloc[0], '123')  # texto continua texto
+        self.assertEqual(bloco['Preco_atual'].iloc[0], 38.5)
+        self.assertEqual(bloco['Funcionarios'].tolist(), [45000, pd.NA])
+
+
+class GravarSerieTests(TestCase):
+    def setUp(self):
+        self.fii = FundoImobiliario.objects.create(codigo='TEST11', nome='Teste')
+
+    def _serie(self, valores):
+        return pd.Series([Decimal(v) for v in valores.values()], index=list(valores), dtype=object)
+
+    def test_insere_datas_novas(self):
+        serie = self._serie({date(2024, 1, 31): '0.85', date(2024, 2, 29): '0.9'})
+        self.assertEqual(gravar_serie(FIIRendimento, 'valor_rendimento', self.fii, serie), (2, 0))
+        self.assertEqual(
+            list(FIIRendimento.objects.filter(fii=self.fii).order_by('data').values_list('valor_rendimento', flat=True)),
+            [Decimal('0.85'), Decimal('0.9')],
+        )
+
+    def test_valor_igual_nao_e_gravado(self):
+        FIIDividendYield.objects.create(fii=self.fii, data=date(2024, 1, 31), dy=Decimal('0.0085'))
+        # mais casas que o campo: a comparação é na precisão gravada
+        serie = self._serie({date(2024, 1, 31): '0.00850000001'})
+        with mock.patch.object(FIIDividendYield.objects, 'bulk_update') as atualizar:
+            self.assertEqual(gravar_serie(FIIDividendYield, 'dy', self.fii, serie), (0, 0))
+        atualizar.assert_called_once_with([], ['dy'], batch_size=500)
+
+    def test_valor_alterado_vai_por_bulk_update(self):
+        existente = FIIDividendYield.objects.create(fii=self.fii, data=date(2024, 1, 31), dy=Decimal('0.0085'))
+        serie = self._serie({date(2024, 1, 31): '0.0091', date(2024, 2, 29): '0.0088'})
+        with mock.patch.object(FIIDividendYield.objects, 'bulk_update',
+                               wraps=FIIDividendYield.objects.bulk_update) as atualizar:
+            self.assertEqual(gravar_serie(FIIDividendYield, 'dy', self.fii, serie), (1, 1))
+        [alterados, campos] = atualizar.call_args.args
+        self.assertEqual(([a.pk for a in alterados], campos), ([existente.pk], ['dy']))
+        existente.refresh_from_db()
+        self.assertEqual(existente.dy, Decimal('0.0091'))
+        self.assertEqual(FIIDividendYield.objects.filter(fii=self.fii).count(), 2)
+
+
+class AgendadorAtualizacaoTests(TestCase):
+    # etapas fictícias: o agendador não olha o comando, só nomes, dependências e fontes
+    ETAPAS = (
+        atualizar_tudo.Etapa('a_base', ('a_base',), fonte='a'),
+        atualizar_tudo.Etapa('a_log', ('a_log',), depende=('a_base',), fonte='a'),
+        atualizar_tudo.Etapa('b_base', ('b_base',), fonte='b'),
+        atualizar_tudo.Etapa('b_log', ('b_log',), depende=('b_base',), fonte='b'),
+        atualizar_tudo.Etapa('calculo', ('calculo',), depende=('b_log',)),
+    )
+
+    def setUp(self):
+        self.comando = atualizar_tudo.Command(stdout=StringIO())
+        self.comando._saida = threading.Lock()
+
+    def _execucoes(self, *nomes, **status):
+        etapas = [e for e in self.ETAPAS if not nomes or e.nome in nomes]
+        execucoes = {e.nome: atualizar_tudo.Execucao(e) for e in atualizar_tudo.ordenar(etapas)}
+        for nome, valor in status.items():
+            execucoes[nome].status = valor
+        return execucoes
+
+    def test_ordenar_poe_dependencias_antes(self):
+        ordem = [e.nome for e in atualizar_tudo.ordenar(list(reversed(self.ETAPAS)))]
+        for etapa in self.ETAPAS:
+            for dep in etapa.depende:
+                self.assertLess(ordem.index(dep), ordem.index(etapa.nome))
+        # dependência fora da seleção não entra na ordem
+        self.assertEqual([e.nome for e in atualizar_tudo.ordenar(self.ETAPAS[3:])], ['b_log', 'calculo'])
+
+    def test_ordenar_recusa_ciclo(self):
+        ciclo = [atualizar_tudo.Etapa('x', ('x',), depende=('y',)), atualizar_tudo.Etapa('y', ('y',), depende=('x',))]
+        with self.assertRaises(CommandError):
+            atualizar_tudo.ordenar(ciclo)
+
+    def _prontas(self, execucoes, limites, paralelo):
+        rodando = [e for e in execucoes.values() if e.status == 'rodando']
+        return [e.etapa.nome for e in self.comando._prontas(execucoes, rodando, limites, paralelo)]
+
+    def test_prontas_so_com_dependencias_ok(self):
+        self.assertEqual(self._prontas(self._execucoes(), {}, 5), ['a_base', 'b_base'])
+        execucoes = self._execucoes(a_base='ok', b_base='ok', b_log='rodando')
+        self.assertEqual(self._prontas(execucoes, {}, 5), ['a_log'])
+
+    def test_limite_por_fonte(self):
+        etapas = [
+            atualizar_tudo.Etapa('a1', ('a1',), fonte='a'),
+            atualizar_tudo.Etapa('a2', ('a2',), fonte='a'),
+            atualizar_tudo.Etapa('b1', ('b1',), fonte='b'),
+            atualizar_tudo.Etapa('livre', ('livre',)),
+        ]
+        execucoes = {e.nome: atualizar_tudo.Execucao(e) for e in etapas}
+        self.assertEqual(self._prontas(execucoes, {'a': 1, 'b': 1}, 4), ['a1', 'b1', 'livre'])
+        self.assertEqual(self._prontas(execucoes, {'a': 2, 'b': 1}, 4), ['a1', 'a2', 'b1', 'livre'])
+        # fonte sem limite configurado fica só sujeita ao --paralelo
+        self.assertEqual(self._prontas(execucoes, {}, 4), ['a1', 'a2', 'b1', 'livre'])
+        execucoes['a1'].status = 'rodando'
+        self.assertEqual(self._prontas(execucoes, {'a': 1, 'b': 1}, 4), ['b1', 'livre'])
+        # o total também respeita o --paralelo, contando as que já estão rodando
+        self.assertEqual(self._prontas(execucoes, {'a': 2, 'b': 1}, 2), ['a2'])
+
+    def test_falha_pula_os_dependentes(self):
+        execucoes = self._execucoes(b_base='falhou')
+        self.comando._pular_dependentes_de_falhas(execucoes)
+        self.assertEqual(
+            {nome: e.status for nome, e in execucoes.items()},
+            {'a_base': 'pendente', 'a_log': 'pendente', 'b_base': 'falhou', 'b_log': 'pulada', 'calculo': 'pulada'},
+        )
+        self.assertEqual(self._prontas(execucoes, {}, 5), ['a_base'])
+
+    def test_execucao_completa_com_etapas_stub(self):
+        iniciadas = []
+
+        def rodar(comando, execucao, options, futuro):
+            iniciadas.append(execucao.etapa.nome)
+            futuro.set_result(1 if execucao.etapa.nome == 'b_base' else 0)
+
+        saida = StringIO()
+        with mock.patch.object(atualizar_tudo, 'ETAPAS', self.ETAPAS), \
+                mock.patch.object(atualizar_tudo.Command, '_rodar', rodar):
+            with self.assertRaisesMessage(CommandError, 'b_base, b_log, calculo'):
+                call_command(atualizar_tudo.Command(), '--paralelo', '3', stdout=saida)
+        self.assertCountEqual(iniciadas, ['a_base', 'a_log', 'b_base'])
+        self.assertLess(iniciadas.index('a_base'), iniciadas.index('a_log'))
+        self.assertIn('[calculo] pulada', saida.getvalue())
@@ -2,18 +2,61 @@ from django.urls import path
 from .views import (
     AtivoListAPIView, SetorListAPIView, SegmentoListAPIView, AtivoDetailAPIView, HistoricoAtivoListAPIView,
     FIIListAPIView, FIIReadonlyAPIView, FIIHistoricoPrecoListAPIView, FIIRendimentoListAPIView, FIIDividendYieldListAPIView,
+    FIIIndicadorMensalListAPIView, FIIRankingListAPIView,
+    AtivoRetornoTotalAPIView, AtivoRetornoTotalRankingAPIView, FIIRetornoTotalAPIView, FIIRetornoTotalRankingAPIView,
+    BacktestAPIView, SimulacaoAPIView, FronteiraEficienteAPIView,
+    ExportacaoAPIView, HistoricoMultiploAPIView, FIIHistoricoMultiploAPIView,
+    AtivoPainelAPIView, FIIPainelAPIView, AtivoCotacaoListAPIView, FIICotacaoListAPIView,
+    ExecucaoIngestaoListAPIView, TicketCotacoesAoVivoAPIView,
 )
+from . import views_async
 
 urlpatterns = [
     path('ativos/', AtivoListAPIView.as_view(), name='api-ativos-list'),
     path('setor/', SetorListAPIView.as_view(), name='api-setor-list'),
     path('segmento/', SegmentoListAPIView.as_view(), name='api-segmento-list'),
+    path('historico/', HistoricoMultiploAPIView.as_view(), name='api-historico-multiplo'),
+    path('ativos/cotacoes/', AtivoCotacaoListAPIView.as_view(), name='api-ativos-cotacoes'),
+    path('ativos/retorno_total/', AtivoRetornoTotalRankingAPIView.as_view(), name='api-ativos-retorno-total'),
     path('ativos/<str:codigo>/', AtivoDetailAPIView.as_view(), name='api-ativo-detail'),
     path('ativos/<str:codigo>/historico/', HistoricoAtivoListAPIView.as_view(), name='api-ativo-historico'),
+    path('ativos/<str:codigo>/retorno_total/', AtivoRetornoTotalAPIView.as_view(), name='api-ativo-retorno-total'),
+    path('ativos/<str:codigo>/painel/', AtivoPainelAPIView.as_view(), name='api-ativo-painel'),
     # FII endpoints
     path('fiis/', FIIListAPIView.as_view(), name='api-fii-list'),
+    path('fiis/ranking/', FIIRankingListAPIView.as_view(), name='api-fii-ranking'),
+    path('fiis/historico/', FIIHistoricoMultiploAPIView.as_view(), name='api-fii-historico-multiplo'),
+    path('fiis/cotacoes/', FIICotacaoListAPIView.as_view(), name='api-fiis-cotacoes'),
+    path('fiis/retorno_total/', FIIRetornoTotalRankingAPIView.as_view(), name='api-fiis-retorno-total'),
     path('fiis/<str:codigo>/', FIIReadonlyAPIView.as_view(), name='api-fii-detail'),
     path('fiis/<str:codigo>/historico/', FIIHistoricoPrecoListAPIView.as_view(), name='api-fii-historico'),
     path('fiis/<str:codigo>/rendimentos/', FIIRendimentoListAPIView.as_view(), name='api-fii-rendimentos'),
     path('fiis/<str:codigo>/dy/', FIIDividendYieldListAPIView.as_view(), name='api-fii-dy'),
-]
\ No newline at end of file
+    path('fiis/<str:codigo>/retorno_total/', FIIRetornoTotalAPIView.as_view(), name='api-fii-retorno-total'),
+    path('fiis/<str:codigo>/indicadores/', FIIIndicadorMensalListAPIView.as_view(), name='api-fii-indicadores'),
+    path('fiis/<str:codigo>/painel/', FIIPainelAPIView.as_view(), name='api-fii-painel'),
+    # Análises
+    path('backtest/', BacktestAPIView.as_view(), name='api-backtest'),
+    path('simulacao/', SimulacaoAPIView.as_view(), name='api-simulacao'),
+    path('fronteira/', FronteiraEficienteAPIView.as_view(), name='api-fronteira'),
+    # Exportação
+    path('exportar/<str:tabela>/', ExportacaoAPIView.as_view(), name='api-exportar'),
+    # Operação
+    path('ingestao/execucoes/', ExecucaoIngestaoListAPIView.as_view(), name='api-ingestao-execucoes'),
+    # Leituras assíncronas (ASGI)
+    path('async/ativos/', views_async.AtivoListAsyncView.as_view(), name='api-async-ativos-list'),
+    path('async/ativos/<str:codigo>/', views_async.AtivoDetailAsyncView.as_view(), name='api-async-ativo-detail'),
+    path('async/ativos/<str:codigo>/historico/', views_async.HistoricoAtivoListAsyncView.as_view(),
+         name='api-async-ativo-historico'),
+    path('async/ativos/<str:codigo>/painel/', views_async.AtivoPainelAsyncView.as_view(), name='api-async-ativo-painel'),
+    path('async/fiis/', views_async.FIIListAsyncView.as_view(), name='api-async-fii-list'),
+    path('async/fiis/<str:codigo>/', views_async.FIIDetailAsyncView.as_view(), name='api-async-fii-detail'),
+    path('async/fiis/<str:codigo>/historico/', views_async.FIIHistoricoPrecoListAsyncView.as_view(),
+         name='api-async-fii-historico'),
+    path('async/fiis/<str:codigo>/rendimentos/', views_async.FIIRendimentoListAsyncView.as_view(),
+         name='api-async-fii-rendimentos'),
+    path('async/fiis/<str:codigo>/dy/', views_async.FIIDividendYieldListAsyncView.as_view(), name='api-async-fii-dy'),
+    path('async/fiis/<str:codigo>/painel/', views_async.FIIPainelAsyncView.as_view(), name='api-async-fii-painel'),
+    path('async/cotacoes/stream/', views_async.CotacoesAoVivoAsyncView.as_view(), name='api-async-cotacoes-stream'),
+    path('cotacoes/stream/ticket/', TicketCotacoesAoVivoAPIView.as_view(), name='api-cotacoes-stream-ticket'),
+]
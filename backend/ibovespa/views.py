@@ -1,18 +1,118 @@
-from django.db.models import Q
+import numpy as np
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
 from rest_framework import generics
 from rest_framework import filters
+from rest_framework import serializers
+from rest_framework.permissions import IsAdminUser
+from rest_framework.exceptions import ValidationError
 from .models import (
     Ativo, Setor, Segmento, HistoricoAtivo,
-    FundoImobiliario, FIIHistoricoPreco, FIIRendimento, FIIDividendYield,
+    FundoImobiliario, FIIHistoricoPreco, FIIRendimento, FIIDividendYield, FIIIndicadorMensal, ExecucaoIngestao,
 )
 from .serializer import (
     AtivoListSerializer, SetorSerializer, SegmentoSerializer, AtivoSerializer, HistoricoAtivoSerializer,
     FIIListSerializer, FIISerializer, FIIHistoricoPrecoSerializer, FIIRendimentoSerializer, FIIDividendYieldSerializer,
+    FIIIndicadorMensalSerializer, FIIRankingSerializer, AtivoCotacaoSerializer, FIICotacaoSerializer,
+    ExecucaoIngestaoSerializer, colunas_do_serializer,
 )
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from .retorno import (
+    retorno_total_ativo, retorno_total_fii, ranking_retorno_total_ativos, ranking_retorno_total_fiis,
+    matriz_retorno_total, estimativas_media_covariancia, grupos_codigos,
+)
+from .backtest import REBALANCEAMENTOS, executar_variantes
+from .montecarlo import METODOS, simular_carteira
+from .otimizacao import fronteira_eficiente
+from .series import series_por_chave
+from .painel import JANELAS_ATIVO, JANELAS_FII, janelas, painel_ativo, painel_fii
+from . import ao_vivo, exportacao, renderizacao
+from .renderers import ArrowStreamRenderer, Colunar, MessagePackRenderer, renderizadores
+
+# JSON e API navegável do DRF mais MessagePack (se instalado); as listagens também oferecem Arrow
+RENDERIZADORES = renderizadores()
+
+
+def _data(params, campo: str):
+    """Data de um parâmetro (query string ou corpo) ou None; 400 se não for AAAA-MM-DD válida."""
+    texto = params.get(campo)
+    if texto is None or texto == '':
+        return None
+    try:
+        valor = parse_date(texto) if isinstance(texto, str) else None
+    except ValueError:  # formato certo, data inexistente (2024-13-45)
+        valor = None
+    if valor is None:
+        raise ValidationError({campo: 'Informe uma data válida (AAAA-MM-DD).'})
+    return valor
+
+
+def _janelas(params, padroes):
+    """`janelas` do painel, com `<secao>_inicio`/`<secao>_fim` validados."""
+    for secao in padroes:
+        _data(params, f'{secao}_inicio')
+        _data(params, f'{secao}_fim')
+    return janelas(params, padroes)
+
+
+class RenderizacaoRapidaMixin:
+    """Listagens montadas de values_list() sem o to_representation do DRF.
+
+    Vale para o JSONRenderer (mesmos bytes do DRF) e para MessagePack/Arrow, em que os decimais
+    saem como float64 ou inteiros escalados (?decimais=float|escalado). Sem paginação e com campos
+    que `renderizacao` sabe converter; nos demais casos (API navegável, campos calculados) usa o list() normal.
+    """
+    renderizacao_rapida = True
+    renderer_classes = renderizadores(colunar=True)
 
-class AtivoListAPIView(generics.ListAPIView):
+    def list(self, request, *args, **kwargs):
+        binario = isinstance(request.accepted_renderer, (MessagePackRenderer, ArrowStreamRenderer))
+        if not self.renderizacao_rapida or not (binario or renderizacao.aceita_caminho_rapido(request)):
+            return super().list(request, *args, **kwargs)
+        decimais = request.query_params.get('decimais', 'float')
+        if decimais not in renderizacao.DECIMAIS:
+            raise ValidationError({'decimais': f"Use um de {', '.join(renderizacao.DECIMAIS)}."})
+        modo = request.accepted_renderer.format if binario else 'json'
+        plano = renderizacao.compilar(self.get_serializer(), modo, decimais)
+        if plano is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if modo == 'json':
+            return HttpResponse(renderizacao.codificar(plano.linhas(queryset)), content_type='application/json')
+        if modo == 'arrow':
+            dados = Colunar(plano.colunas_valores(queryset), {c.nome: c.tipo for c in plano.colunas}, plano.escalas())
+        else:
+            dados = plano.linhas(queryset)
+        resposta = Response(dados)
+        if plano.escalas():
+            resposta['X-Decimais-Escala'] = ','.join(f'{nome}={escala}' for nome, escala in plano.escalas().items())
+        return resposta
+
+
+class ColunasSerializerMixin:
+    """Carrega do banco só as colunas usadas pelo serializer (já reduzido por ?fields=/?omit=).
+
+    Entra em filter_queryset, usado tanto em list quanto em get_object, para não depender do
+    get_queryset de cada view.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        colunas = colunas_do_serializer(self.get_serializer(), queryset.model)
+        if colunas is None:
+            return queryset
+        only, relacoes = colunas
+        queryset = queryset.select_related(None)
+        if relacoes:
+            queryset = queryset.select_related(*relacoes)
+        return queryset.only(*only)
+
+
+class AtivoListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
     serializer_class = AtivoListSerializer
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['codigo', 'nome', 'preco_atual']
@@ -42,20 +142,57 @@ class AtivoListAPIView(generics.ListAPIView):
         queryset = queryset.filter(q_filter)
         return queryset
 
-class AtivoDetailAPIView(generics.RetrieveAPIView):
+class AtivoDetailAPIView(ColunasSerializerMixin, generics.RetrieveAPIView):
+    renderer_classes = RENDERIZADORES
     queryset = Ativo.objects.all()
     serializer_class = AtivoSerializer
     lookup_field = 'codigo'
 
+class AtivoCotacaoListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
+    """Cotações de ações sem o cadastro completo: ?codigos=A,B (todas se omitido)."""
+    serializer_class = AtivoCotacaoSerializer
+
+    def get_queryset(self):
+        queryset = Ativo.objects.order_by('codigo')
+        codigos = self.request.query_params.get('codigos')
+        if codigos:
+            queryset = queryset.filter(codigo__in=_lista_codigos(codigos))
+        return queryset
+
+class AtivoRetornoTotalAPIView(APIView):
+    renderer_classes = RENDERIZADORES
+
+    def get(self, request, codigo):
+        ativo = get_object_or_404(Ativo, codigo=codigo)
+        params = request.query_params
+        return Response(retorno_total_ativo(ativo, _data(params, 'data_inicio'), _data(params, 'data_fim')))
+
+class AtivoPainelAPIView(APIView):
+    """Cadastro e histórico da ação numa só resposta (?historico_inicio=&historico_fim=)."""
+    renderer_classes = RENDERIZADORES
+
+    def get(self, request, codigo):
+        return Response(painel_ativo(codigo, _janelas(request.query_params, JANELAS_ATIVO)))
+
+class AtivoRetornoTotalRankingAPIView(APIView):
+    renderer_classes = RENDERIZADORES
+
+    def get(self, request):
+        params = request.query_params
+        return Response(ranking_retorno_total_ativos(_data(params, 'data_inicio'), _data(params, 'data_fim'),
+                                                    params.get('setor')))
+
 class SetorListAPIView(generics.ListAPIView):
+    renderer_classes = RENDERIZADORES
     queryset = Setor.objects.all()
     serializer_class = SetorSerializer
 
 class SegmentoListAPIView(generics.ListAPIView):
+    renderer_classes = RENDERIZADORES
     queryset = Segmento.objects.all()
     serializer_class = SegmentoSerializer
 
-class HistoricoAtivoListAPIView(generics.ListAPIView):
+class HistoricoAtivoListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
     serializer_class = HistoricoAtivoSerializer
 
     def get_queryset(self):
@@ -69,7 +206,7 @@ class HistoricoAtivoListAPIView(generics.ListAPIView):
 
 # --- FII Views ---
 
-class FIIListAPIView(generics.ListAPIView):
+class FIIListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
     serializer_class = FIIListSerializer
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['codigo', 'nome', 'cotacao_atual', 'p_vp']
@@ -87,13 +224,26 @@ class FIIListAPIView(generics.ListAPIView):
         return queryset.filter(q)
 
 
-class FIIReadonlyAPIView(generics.RetrieveAPIView):
+class FIICotacaoListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
+    """Cotações de FIIs sem o cadastro completo: ?codigos=A,B (todos se omitido)."""
+    serializer_class = FIICotacaoSerializer
+
+    def get_queryset(self):
+        queryset = FundoImobiliario.objects.order_by('codigo')
+        codigos = self.request.query_params.get('codigos')
+        if codigos:
+            queryset = queryset.filter(codigo__in=_lista_codigos(codigos))
+        return queryset
+
+
+class FIIReadonlyAPIView(ColunasSerializerMixin, generics.RetrieveAPIView):
+    renderer_classes = RENDERIZADORES
     queryset = FundoImobiliario.objects.all()
     serializer_class = FIISerializer
     lookup_field = 'codigo'
 
 
-class FIIHistoricoPrecoListAPIView(generics.ListAPIView):
+class FIIHistoricoPrecoListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
     serializer_class = FIIHistoricoPrecoSerializer
 
     def get_queryset(self):
@@ -105,7 +255,7 @@ class FIIHistoricoPrecoListAPIView(generics.ListAPIView):
         return qs
 
 
-class FIIRendimentoListAPIView(generics.ListAPIView):
+class FIIRendimentoListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
     serializer_class = FIIRendimentoSerializer
 
     def get_queryset(self):
@@ -117,7 +267,7 @@ class FIIRendimentoListAPIView(generics.ListAPIView):
         return qs
 
 
-class FIIDividendYieldListAPIView(generics.ListAPIView):
+class FIIDividendYieldListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
     serializer_class = FIIDividendYieldSerializer
 
     def get_queryset(self):
@@ -128,3 +278,477 @@ class FIIDividendYieldListAPIView(generics.ListAPIView):
             qs = qs.filter(data__gte=data_inicio)
         return qs
 
+
+
+class FIIRetornoTotalAPIView(APIView):
+    renderer_classes = RENDERIZADORES
+
+    def get(self, request, codigo):
+        fii = get_object_or_404(FundoImobiliario, codigo=codigo)
+        params = request.query_params
+        return Response(retorno_total_fii(fii, _data(params, 'data_inicio'), _data(params, 'data_fim')))
+
+
+class FIIPainelAPIView(APIView):
+    """Cadastro, histórico, rendimentos e DY do FII numa só resposta.
+
+    Janelas por seção: ?historico_inicio=&rendimentos_inicio=&dy_inicio= (e os respectivos _fim).
+    """
+    renderer_classes = RENDERIZADORES
+
+    def get(self, request, codigo):
+        return Response(painel_fii(codigo, _janelas(request.query_params, JANELAS_FII)))
+
+
+class FIIRetornoTotalRankingAPIView(APIView):
+    renderer_classes = RENDERIZADORES
+
+    def get(self, request):
+        params = request.query_params
+        return Response(ranking_retorno_total_fiis(_data(params, 'data_inicio'), _data(params, 'data_fim'),
+                                                  params.get('segmento')))
+
+
+class FIIIndicadorMensalListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
+    serializer_class = FIIIndicadorMensalSerializer
+
+    def get_queryset(self):
+        codigo = self.kwargs.get('codigo')
+        qs = FIIIndicadorMensal.objects.filter(fii__codigo=codigo).order_by('data')
+        data_inicio = _data(self.request.query_params, 'data_inicio')
+        if data_inicio:
+            qs = qs.filter(data__gte=data_inicio)
+        return qs
+
+
+class FIIRankingListAPIView(RenderizacaoRapidaMixin, ColunasSerializerMixin, generics.ListAPIView):
+    """Último indicador mensal pré-calculado de cada FII, para telas de ranking."""
+    serializer_class = FIIRankingSerializer
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['dy_12m', 'yield_on_cost', 'crescimento_rendimento', 'rendimento_12m', 'fii__codigo']
+    ordering = ['-dy_12m']
+
+    def get_queryset(self):
+        ultimo_mes = (
+            FIIIndicadorMensal.objects.filter(fii=OuterRef('fii'))
+            .order_by('-data')
+            .values('data')[:1]
+        )
+        qs = (
+            FIIIndicadorMensal.objects.filter(data=Subquery(ultimo_mes))
+            .select_related('fii', 'fii__segmento')
+        )
+        segmento = self.request.query_params.get('segmento')
+        if segmento:
+            qs = qs.filter(fii__segmento__nome__iexact=segmento)
+        return qs
+
+
+
+# --- Histórico de vários códigos ---
+
+# Códigos aceitos por requisição em historico/?codigos=
+MAX_CODIGOS_HISTORICO = 100
+
+
+class HistoricoMultiploAPIView(APIView):
+    """Histórico de vários códigos numa só requisição: ?codigos=A,B,C&data_inicio=&data_fim=
+
+    Os códigos são resolvidos numa consulta e as séries vêm de uma única consulta IN ordenada
+    por (fk, data). Resposta em colunas por código: {codigo: {data: [...], preco_fechamento: [...], volume: [...]}}.
+    """
+    renderer_classes = RENDERIZADORES
+    modelo_cadastro = Ativo
+    modelo_historico = HistoricoAtivo
+    fk = 'ativo_id'
+    campos = ('preco_fechamento', 'volume')
+
+    def get(self, request):
+        params = request.query_params
+        codigos = _lista_codigos(params.get('codigos'))
+        if len(codigos) > MAX_CODIGOS_HISTORICO:
+            raise ValidationError({'codigos': f'Informe no máximo {MAX_CODIGOS_HISTORICO} códigos.'})
+        ids = dict(self.modelo_cadastro.objects.filter(codigo__in=codigos).values_list('codigo', 'id'))
+        series = series_por_chave(
+            self.modelo_historico, self.fk, self.campos, ids.values(),
+            _data(params, 'data_inicio'), _data(params, 'data_fim'),
+        )
+        vazia = {'data': [], **{campo: [] for campo in self.campos}}
+        return Response({
+            'series': {c: series.get(ids[c], vazia) for c in codigos if c in ids},
+            'nao_encontrados': [c for c in codigos if c not in ids],
+        })
+
+
+class FIIHistoricoMultiploAPIView(HistoricoMultiploAPIView):
+    modelo_cadastro = FundoImobiliario
+    modelo_historico = FIIHistoricoPreco
+    fk = 'fii_id'
+
+
+# --- Backtest ---
+
+# A partir de quantas variantes a varredura é distribuída entre processos
+MIN_VARIANTES_PROCESSOS = 16
+
+
+def _lista_codigos(valor) -> list:
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    codigos = [str(c).strip().upper() for c in (valor or []) if str(c).strip()]
+    if not codigos:
+        raise ValidationError({'codigos': 'Informe ao menos um código.'})
+    return list(dict.fromkeys(codigos))
+
+
+def _vetor_pesos(pesos, codigos: list) -> np.ndarray:
+    if pesos is None:
+        return np.full(len(codigos), 1.0 / len(codigos))
+    try:
+        if isinstance(pesos, dict):
+            vetor = np.array([float(pesos.get(c, 0.0)) for c in codigos])
+        else:
+            vetor = np.array([float(p) for p in pesos])
+    except (TypeError, ValueError):
+        raise ValidationError({'pesos': 'Pesos devem ser numéricos.'})
+    if len(vetor) != len(codigos):
+        raise ValidationError({'pesos': 'Informe um peso por código.'})
+    total = vetor.sum()
+    if not np.isfinite(total) or total <= 0:
+        raise ValidationError({'pesos': 'A soma dos pesos deve ser positiva.'})
+    return vetor / total
+
+
+def _booleano(dados, campo: str, padrao: bool) -> bool:
+    # mesma leitura do BooleanField do DRF: "false", "0", "off"... de formulários também valem
+    try:
+        return serializers.BooleanField().to_internal_value(dados.get(campo, padrao))
+    except ValidationError:
+        raise ValidationError({campo: 'Informe true ou false.'})
+
+
+def _lista_variantes(valor) -> list:
+    if not valor:
+        return [{}]
+    if not isinstance(valor, list) or not all(isinstance(v, dict) for v in valor):
+        raise ValidationError({'variantes': 'Informe uma lista de objetos.'})
+    return valor
+
+
+class BacktestAPIView(APIView):
+    """Simula carteiras sobre o histórico armazenado.
+
+    Corpo: codigos, pesos (lista ou {codigo: peso}, padrão pesos iguais), rebalanceamento
+    (nenhum, mensal, trimestral, semestral, anual), custo_bps, data_inicio, data_fim,
+    reinvestir (proventos de FIIs, padrão true), serie (inclui valores diários) e
+    variantes (lista de sobrescritas de pesos/rebalanceamento/custo_bps para varreduras).
+    """
+    renderer_classes = RENDERIZADORES
+
+    def post(self, request):
+        dados = request.data
+        codigos = _lista_codigos(dados.get('codigos'))
+        sobrescritas = _lista_variantes(dados.get('variantes'))
+        try:
+            matriz = matriz_retorno_total(
+                codigos, _data(dados, 'data_inicio'), _data(dados, 'data_fim'),
+                reinvestir=_booleano(dados, 'reinvestir', True),
+            )
+        except ValueError as exc:
+            raise ValidationError({'codigos': str(exc)})
+        if len(matriz) < 2:
+            raise ValidationError({'detail': 'Histórico insuficiente em comum para os códigos informados.'})
+
+        base = {
+            'pesos': dados.get('pesos'),
+            'rebalanceamento': dados.get('rebalanceamento', 'mensal'),
+            'custo_bps': dados.get('custo_bps', 0.0),
+            'taxa_livre': dados.get('taxa_livre', 0.0),
+        }
+        parametros = [{**base, **v} for v in sobrescritas]
+        variantes = []
+        for p in parametros:
+            if p['rebalanceamento'] not in REBALANCEAMENTOS:
+                raise ValidationError({'rebalanceamento': f"Use um de {', '.join(REBALANCEAMENTOS)}."})
+            try:
+                custo, taxa = float(p['custo_bps']), float(p['taxa_livre'])
+            except (TypeError, ValueError):
+                raise ValidationError({'custo_bps': 'custo_bps e taxa_livre devem ser numéricos.'})
+            variantes.append({
+                'pesos': _vetor_pesos(p['pesos'], codigos),
+                'rebalanceamento': p['rebalanceamento'],
+                'custo_bps': custo,
+                'taxa_livre': taxa,
+            })
+
+        processos = 1
+        if len(variantes) >= MIN_VARIANTES_PROCESSOS:
+            processos = settings.IBOVESPA_PROCESSOS_CALCULO
+
+        indice = matriz.to_numpy()
+        retornos = np.zeros_like(indice)
+        retornos[1:] = indice[1:] / indice[:-1] - 1.0
+        datas = matriz.index.to_numpy().astype('datetime64[D]')
+        incluir_serie = _booleano(dados, 'serie', False)
+        resultados = executar_variantes(retornos, datas, variantes, processos=processos, incluir_serie=incluir_serie)
+
+        for p, v, r in zip(parametros, variantes, resultados):
+            r['parametros'] = {
+                'pesos': dict(zip(codigos, np.round(v['pesos'], 6).tolist())),
+                'rebalanceamento': v['rebalanceamento'],
+                'custo_bps': v['custo_bps'],
+            }
+        resposta = {
+            'codigos': codigos,
+            'data_inicio': str(datas[0]),
+            'data_fim': str(datas[-1]),
+            'resultados': resultados,
+        }
+        if incluir_serie:
+            resposta['datas'] = [str(d) for d in datas]
+        return Response(resposta)
+
+
+
+# --- Simulação Monte Carlo ---
+
+MAX_CAMINHOS = 1_000_000
+MAX_HORIZONTE = 252 * 30
+# teto de caminhos x horizonte numa requisição (a simulação roda dentro dela)
+MAX_PASSOS_SIMULACAO = 50_000_000
+MAX_VALOR_INICIAL = 1e15
+
+
+def _inteiro(dados, campo: str, padrao: int, minimo: int, maximo: int) -> int:
+    try:
+        valor = int(dados.get(campo, padrao))
+    except (TypeError, ValueError):
+        raise ValidationError({campo: 'Informe um número inteiro.'})
+    if not minimo <= valor <= maximo:
+        raise ValidationError({campo: f'Deve estar entre {minimo} e {maximo}.'})
+    return valor
+
+
+def _numero(dados, campo: str, padrao: float, minimo: float, maximo: float) -> float:
+    try:
+        valor = float(dados.get(campo, padrao))
+    except (TypeError, ValueError):
+        raise ValidationError({campo: 'Informe um número.'})
+    if not minimo <= valor <= maximo:
+        raise ValidationError({campo: f'Deve estar entre {minimo} e {maximo}.'})
+    return valor
+
+
+class SimulacaoAPIView(APIView):
+    """Bandas de percentis do valor futuro de uma carteira por Monte Carlo.
+
+    Corpo: codigos, pesos, horizonte (dias úteis, padrão 252), caminhos (padrão 10000),
+    metodo (bootstrap ou normal), semente, data_inicio/data_fim da janela histórica,
+    valor_inicial (positivo) e reinvestir (proventos de FIIs). A simulação roda na própria
+    requisição, por isso caminhos x horizonte é limitado a MAX_PASSOS_SIMULACAO.
+    """
+    renderer_classes = RENDERIZADORES
+
+    def post(self, request):
+        dados = request.data
+        codigos = _lista_codigos(dados.get('codigos'))
+        pesos = _vetor_pesos(dados.get('pesos'), codigos)
+        horizonte = _inteiro(dados, 'horizonte', 252, 1, MAX_HORIZONTE)
+        caminhos = _inteiro(dados, 'caminhos', 10_000, 1, MAX_CAMINHOS)
+        if caminhos * horizonte > MAX_PASSOS_SIMULACAO:
+            raise ValidationError({'caminhos': f'caminhos x horizonte deve ser no máximo {MAX_PASSOS_SIMULACAO}.'})
+        metodo = dados.get('metodo', 'bootstrap')
+        if metodo not in METODOS:
+            raise ValidationError({'metodo': f"Use um de {', '.join(METODOS)}."})
+        semente = dados.get('semente')
+        if semente is not None:
+            semente = _inteiro(dados, 'semente', 0, 0, 2 ** 63 - 1)
+        # NaN e infinito também caem fora do intervalo
+        valor_inicial = _numero(dados, 'valor_inicial', 1.0, 0.0, MAX_VALOR_INICIAL)
+        if valor_inicial <= 0:
+            raise ValidationError({'valor_inicial': 'Deve ser positivo.'})
+
+        try:
+            matriz = matriz_retorno_total(
+                codigos, _data(dados, 'data_inicio'), _data(dados, 'data_fim'),
+                reinvestir=_booleano(dados, 'reinvestir', True),
+            )
+        except ValueError as exc:
+            raise ValidationError({'codigos': str(exc)})
+        if len(matriz) < 20:
+            raise ValidationError({'detail': 'Histórico insuficiente em comum para os códigos informados.'})
+
+        indice = matriz.to_numpy()
+        retornos = indice[1:] / indice[:-1] - 1.0
+        try:
+            resultado = simular_carteira(
+                retornos, pesos, horizonte, caminhos, metodo=metodo, semente=semente,
+                processos=settings.IBOVESPA_PROCESSOS_CALCULO,
+            )
+        except ValueError as exc:
+            raise ValidationError({'pesos': str(exc)})
+        if valor_inicial != 1.0:
+            resultado['media'] = [round(v * valor_inicial, 6) for v in resultado['media']]
+            resultado['percentis'] = {
+                q: [round(v * valor_inicial, 6) for v in serie] for q, serie in resultado['percentis'].items()
+            }
+        return Response({
+            'codigos': codigos,
+            'pesos': dict(zip(codigos, np.round(pesos, 6).tolist())),
+            'janela_inicio': str(matriz.index[0].date()),
+            'janela_fim': str(matriz.index[-1].date()),
+            'valor_inicial': valor_inicial,
+            **resultado,
+        })
+
+
+# --- Fronteira eficiente ---
+
+class FronteiraEficienteAPIView(APIView):
+    """Fronteira eficiente e carteira de máximo Sharpe para os códigos informados.
+
+    Corpo: codigos, data_inicio/data_fim da janela, pontos (padrão 20), peso_min (negativo
+    permite venda a descoberto), peso_max, agrupar_por (setor ou segmento), limites_grupo
+    ({nome: teto} ou um teto único para todos os grupos), taxa_livre (anual) e reinvestir.
+    Cada carteira traz `convergiu`; as que o solver não resolveu na tolerância geram um aviso.
+    """
+    renderer_classes = RENDERIZADORES
+
+    def post(self, request):
+        dados = request.data
+        codigos = _lista_codigos(dados.get('codigos'))
+        if len(codigos) < 2:
+            raise ValidationError({'codigos': 'Informe ao menos dois códigos.'})
+        pontos = _inteiro(dados, 'pontos', 20, 2, 100)
+        peso_min = _numero(dados, 'peso_min', 0.0, -10.0, 1.0)
+        peso_max = _numero(dados, 'peso_max', 1.0, 0.0, 10.0)
+        taxa_livre = _numero(dados, 'taxa_livre', 0.0, -1.0, 1.0)
+        agrupar_por = dados.get('agrupar_por', 'setor')
+        if agrupar_por not in ('setor', 'segmento'):
+            raise ValidationError({'agrupar_por': 'Use setor ou segmento.'})
+
+        try:
+            est = estimativas_media_covariancia(
+                codigos, _data(dados, 'data_inicio'), _data(dados, 'data_fim'),
+                reinvestir=_booleano(dados, 'reinvestir', True),
+            )
+        except ValueError as exc:
+            raise ValidationError({'codigos': str(exc)})
+        if est['observacoes'] < 20:
+            raise ValidationError({'detail': 'Histórico insuficiente em comum para os códigos informados.'})
+
+        ordem = est['codigos']
+        grupos_por_codigo = grupos_codigos(ordem, agrupar_por)
+        grupos = [grupos_por_codigo.get(c) for c in ordem]
+        limites_grupo = dados.get('limites_grupo') or {}
+        try:
+            if isinstance(limites_grupo, dict):
+                limites = {str(k): float(v) for k, v in limites_grupo.items()}
+            else:
+                limites = {g: float(limites_grupo) for g in set(grupos) if g}
+        except (TypeError, ValueError):
+            raise ValidationError({'limites_grupo': 'Tetos de grupo devem ser numéricos.'})
+
+        try:
+            resultado = fronteira_eficiente(
+                est['mu'], est['cov'], grupos, peso_min=peso_min, peso_max=peso_max,
+                limites=limites, pontos=pontos, taxa_livre=taxa_livre,
+            )
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+
+        def ponto(p):
+            return {
+                'retorno': round(p['retorno'], 6),
+                'volatilidade': round(p['volatilidade'], 6),
+                'sharpe': None if p['sharpe'] is None else round(p['sharpe'], 6),
+                'pesos': dict(zip(ordem, np.round(p['pesos'], 6).tolist())),
+                'convergiu': p['convergiu'],
+            }
+
+        avisos = []
+        carteiras = {id(p): p for p in resultado['fronteira'] + [resultado['max_sharpe']]}
+        sem_convergir = [p for p in carteiras.values() if not p['convergiu']]
+        if sem_convergir:
+            avisos.append(
+                f'O otimizador não convergiu em {len(sem_convergir)} carteira(s) (convergiu=false); '
+                'os pesos delas são aproximados.'
+            )
+        return Response({
+            'codigos': ordem,
+            'grupos': grupos_por_codigo,
+            'janela_inicio': est['data_inicio'],
+            'janela_fim': est['data_fim'],
+            'min_variancia': ponto(resultado['min_variancia']),
+            'max_sharpe': ponto(resultado['max_sharpe']),
+            'fronteira': [ponto(p) for p in resultado['fronteira']],
+            'avisos': avisos,
+        })
+
+
+# --- Exportação ---
+
+class ExportacaoAPIView(APIView):
+    """Exporta uma tabela inteira em streaming.
+
+    GET exportar/<tabela>/?formato=ndjson|csv&codigos=A,B&data_inicio=&data_fim=&gzip=1
+    Tabelas: ativos, fiis, historico_ativos, historico_fiis, rendimentos_fiis, dy_fiis, indicadores_fiis.
+    """
+
+    def get(self, request, tabela):
+        if tabela not in exportacao.TABELAS:
+            raise ValidationError({'tabela': f"Use uma de {', '.join(exportacao.TABELAS)}."})
+        params = request.query_params
+        formato = params.get('formato', 'ndjson')
+        if formato not in exportacao.FORMATOS:
+            raise ValidationError({'formato': f"Use um de {', '.join(exportacao.FORMATOS)}."})
+        compactar = params.get('gzip', '').lower() in ('1', 'true', 'sim')
+        codigos = [c.strip() for c in params.get('codigos', '').split(',') if c.strip()]
+        # erros de filtro viram 400 aqui; dentro do streaming o cliente só veria um corpo truncado
+        linhas = exportacao.consulta(
+            tabela, codigos=codigos, data_inicio=_data(params, 'data_inicio'), data_fim=_data(params, 'data_fim'),
+        )
+
+        resposta = StreamingHttpResponse(
+            exportacao.gerar(tabela, linhas, formato, compactar),
+            content_type=exportacao.TIPO_GZIP if compactar else exportacao.TIPOS_CONTEUDO[formato],
+        )
+        resposta['Content-Disposition'] = (
+            f'attachment; filename="{exportacao.nome_arquivo(tabela, formato, compactar)}"'
+        )
+        return resposta
+
+
+# --- Cotações ao vivo ---
+
+class TicketCotacoesAoVivoAPIView(APIView):
+    """Ticket curto para abrir async/cotacoes/stream/?ticket= pelo EventSource, que não envia o token."""
+
+    def post(self, request):
+        return Response({'ticket': ao_vivo.emitir_ticket(request.user), 'validade_segundos': ao_vivo.VALIDADE_TICKET})
+
+
+# --- Execuções da ingestão ---
+
+# Execuções devolvidas por padrão e no máximo em ingestao/execucoes/?limite=
+LIMITE_EXECUCOES = 50
+MAX_EXECUCOES = 500
+
+
+class ExecucaoIngestaoListAPIView(generics.ListAPIView):
+    """Execuções recentes dos comandos de ingestão, mais novas primeiro: ?comando=&status=&limite=50
+
+    Tempo por etapa, contadores e códigos mais lentos de cada execução, para acompanhar a
+    vazão dia a dia e achar regressões. Só administradores.
+    """
+    serializer_class = ExecucaoIngestaoSerializer
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        qs = ExecucaoIngestao.objects.order_by('-inicio')
+        if params.get('comando'):
+            qs = qs.filter(comando=params['comando'])
+        if params.get('status'):
+            qs = qs.filter(status=params['status'])
+        return qs[:_inteiro(params, 'limite', LIMITE_EXECUCOES, 1, MAX_EXECUCOES)]
@@ -0,0 +1,211 @@
+"""
+Versões assíncronas (ASGI) das leituras mais usadas, em /api/async/...
+
+Mesma saída JSON das views DRF correspondentes: cada view assíncrona instancia a view DRF
+equivalente só para reaproveitar get_queryset, filtros (?ordering=, ?fields=/?omit=) e
+serializer, que são preguiçosos e não tocam o banco; as consultas vão pelo ORM assíncrono
+(`async for`, `aget`) e o token é validado com `Token.objects.aget`. Sob ASGI a requisição não
+ocupa um worker enquanto espera o banco; no painel as seções seguem em paralelo em threads.
+
+Só JSON (o caminho rápido de `renderizacao`); API navegável, MessagePack e Arrow ficam nas views DRF.
+As cotações ao vivo (SSE) também ficam aqui: a conexão aberta só pesa um assinante no hub de `ao_vivo`.
+"""
+import abc
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, ValidationError
+from rest_framework.request import Request
+
+from . import ao_vivo, renderizacao, views
+from .painel import JANELAS_ATIVO, JANELAS_FII, apainel_ativo, apainel_fii
+
+
+def _json(dados, status: int = 200) -> HttpResponse:
+    return HttpResponse(renderizacao.codificar(dados), status=status, content_type='application/json')
+
+
+async def autenticar_token(request):
+    """Usuário do cabeçalho `Authorization: Token <chave>`, com as mesmas regras do TokenAuthentication."""
+    partes = request.headers.get('Authorization', '').split()
+    if not partes or partes[0].lower() != 'token':
+        raise NotAuthenticated()
+    if len(partes) == 1:
+        raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+    if len(partes) > 2:
+        raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+    try:
+        token = await Token.objects.select_related('user').aget(key=partes[1])
+    except Token.DoesNotExist:
+        raise AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise AuthenticationFailed(_('User inactive or deleted.'))
+    return token.user
+
+
+class LeituraAsyncView(View, metaclass=abc.ABCMeta):
+    """Autenticação por token e erros da API no formato do DRF; a subclasse monta a `resposta`."""
+    http_method_names = ['get', 'head', 'options']
+    # view DRF cujo queryset/serializer é reaproveitado
+    view_drf = None
+
+    async def get(self, request, **kwargs):
+        try:
+            request.user = await self.autenticar(request)
+            return await self.resposta(request, **kwargs)
+        except Http404 as exc:
+            return _json({'detail': str(exc)}, status=404)
+        except APIException as exc:
+            resposta = _json(exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail},
+                             status=exc.status_code)
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                resposta['WWW-Authenticate'] = 'Token'
+            return resposta
+
+    async def autenticar(self, request):
+        return await autenticar_token(request)
+
+    def view_drf_para(self, request, kwargs):
+        view = self.view_drf(request=Request(request), args=(), kwargs=kwargs, format_kwarg=None)
+        view.request.user = request.user
+        return view
+
+    @abc.abstractmethod
+    async def resposta(self, request, **kwargs) -> HttpResponse:
+        ...
+
+
+class JsonAsyncView(LeituraAsyncView):
+    """Resposta JSON dos `dados` que a subclasse devolve."""
+
+    async def resposta(self, request, **kwargs) -> HttpResponse:
+        return _json(await self.dados(request, **kwargs))
+
+    @abc.abstractmethod
+    async def dados(self, request, **kwargs):
+        ...
+
+
+class ListaAsyncView(JsonAsyncView):
+    async def dados(self, request, **kwargs):
+        view = self.view_drf_para(request, kwargs)
+        queryset = view.filter_queryset(view.get_queryset())
+        plano = renderizacao.compilar(view.get_serializer())
+        if plano is None:
+            return await sync_to_async(lambda: view.get_serializer(queryset, many=True).data)()
+        return await plano.alinhas(queryset)
+
+
+class DetalheAsyncView(JsonAsyncView):
+    async def dados(self, request, **kwargs):
+        view = self.view_drf_para(request, kwargs)
+        queryset = view.filter_queryset(view.get_queryset())
+        objeto = await aget_object_or_404(queryset, **{view.lookup_field: kwargs[view.lookup_field]})
+        # relações fora do select_related ainda podem consultar o banco ao serializar
+        return await sync_to_async(lambda: view.get_serializer(objeto).data)()
+
+
+class AtivoListAsyncView(ListaAsyncView):
+    view_drf = views.AtivoListAPIView
+
+
+class AtivoDetailAsyncView(DetalheAsyncView):
+    view_drf = views.AtivoDetailAPIView
+
+
+class HistoricoAtivoListAsyncView(ListaAsyncView):
+    view_drf = views.HistoricoAtivoListAPIView
+
+
+class FIIListAsyncView(ListaAsyncView):
+    view_drf = views.FIIListAPIView
+
+
+class FIIDetailAsyncView(DetalheAsyncView):
+    view_drf = views.FIIReadonlyAPIView
+
+
+class FIIHistoricoPrecoListAsyncView(ListaAsyncView):
+    view_drf = views.FIIHistoricoPrecoListAPIView
+
+
+class FIIRendimentoListAsyncView(ListaAsyncView):
+    view_drf = views.FIIRendimentoListAPIView
+
+
+class FIIDividendYieldListAsyncView(ListaAsyncView):
+    view_drf = views.FIIDividendYieldListAPIView
+
+
+class AtivoPainelAsyncView(JsonAsyncView):
+    async def dados(self, request, codigo):
+        return await apainel_ativo(codigo, views._janelas(request.GET, JANELAS_ATIVO))
+
+
+class FIIPainelAsyncView(JsonAsyncView):
+    async def dados(self, request, codigo):
+        return await apainel_fii(codigo, views._janelas(request.GET, JANELAS_FII))
+
+
+def _evento_sse(nome: str, dados) -> bytes:
+    return b'event: ' + nome.encode() + b'\ndata: ' + renderizacao.codificar(dados) + b'\n\n'
+
+
+async def _eventos(hub: ao_vivo.Hub, assinante: ao_vivo.Assinante):
+    try:
+        yield b'retry: 5000\n\n'
+        while True:
+            try:
+                await asyncio.wait_for(assinante.evento.wait(), ao_vivo.INTERVALO_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # comentário SSE: mantém proxies e o EventSource com a conexão aberta
+                yield b': keepalive\n\n'
+                continue
+            yield _evento_sse('cotacoes', assinante.retirar())
+    finally:
+        hub.cancelar(assinante)
+
+
+class CotacoesAoVivoAsyncView(LeituraAsyncView):
+    """Cotações que mudaram, por Server-Sent Events: ?ativos=A,B&fiis=X,Y[&ticket=...]
+
+    O primeiro evento traz a cotação atual de todos os códigos pedidos; os seguintes, só os que
+    mudaram desde o anterior (`{"ativos": [...], "fiis": [...]}`, campos de */cotacoes/).
+    No navegador: `new EventSource(url + '&ticket=' + ticket)`, com o ticket de POST
+    cotacoes/stream/ticket/; se a conexão cair depois da validade, peça outro ticket.
+    """
+    hub = ao_vivo.HUB
+
+    async def autenticar(self, request):
+        ticket = request.GET.get('ticket')
+        if ticket is None:
+            return await super().autenticar(request)
+        pk = ao_vivo.usuario_do_ticket(ticket)
+        if pk is None:
+            raise AuthenticationFailed('Ticket inválido ou expirado.')
+        usuario = await get_user_model().objects.filter(pk=pk, is_active=True).afirst()
+        if usuario is None:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return usuario
+
+    async def resposta(self, request, **kwargs):
+        codigos = {
+            tipo: frozenset(views._lista_codigos(request.GET[tipo]))
+            for tipo in ao_vivo.FONTES if request.GET.get(tipo)
+        }
+        if not codigos:
+            raise ValidationError({'ativos': 'Informe ?ativos= e/ou ?fiis=.'})
+        if sum(map(len, codigos.values())) > ao_vivo.MAX_CODIGOS_AO_VIVO:
+            raise ValidationError({'ativos': f'No máximo {ao_vivo.MAX_CODIGOS_AO_VIVO} códigos por conexão.'})
+        assinante = await self.hub.assinar(codigos)
+        resposta = StreamingHttpResponse(_eventos(self.hub, assinante), content_type='text/event-stream')
+        resposta['Cache-Control'] = 'no-cache'
+        # nginx: não acumular o stream no buffer do proxy
+        resposta['X-Accel-Buffering'] = 'no'
+        return resposta